@@ -0,0 +1,172 @@
+import glob
+import json
+import os
+import threading
+from concurrent.futures import as_completed
+from typing import Callable, Dict, List, Tuple
+
+from llm import BATCH, ContextThreadPoolExecutor, priority
+from pipeline import run_pipeline
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.txt', '.md')
+MANIFEST_NAME = 'manifest.json'
+# Presentation data written by `run` (pptx_data.json) and `batch` (<name>.pptx_data.json)
+DECK_DATA_SUFFIX = 'pptx_data.json'
+# Files a batch run writes next to each other; never picked up as inputs
+OUTPUT_SUFFIXES = ('.summary.md', '.pptx', '.' + DECK_DATA_SUFFIX)
+
+
+def discover_inputs(source: str, extensions: Tuple[str, ...] = SUPPORTED_EXTENSIONS, exclude_dir: str = None,
+                    skip_suffixes: Tuple[str, ...] = OUTPUT_SUFFIXES) -> Tuple[str, List[str]]:
+    """
+    Resolve a directory or glob pattern to ``(root, files)``. ``root`` is
+    the directory output paths are mirrored against. Files under
+    ``exclude_dir`` (the output tree, when it sits inside the source) and
+    files ending in ``skip_suffixes`` (outputs of earlier runs) are left out.
+    """
+    if os.path.isdir(source):
+        root = source
+        files = [os.path.join(dirpath, name)
+                 for dirpath, _, names in os.walk(source)
+                 for name in names]
+    else:
+        files = glob.glob(source, recursive=True)
+        # Mirror against the part of the pattern before the first wildcard.
+        parts = []
+        for part in source.replace('\\', '/').split('/'):
+            if glob.has_magic(part):
+                break
+            parts.append(part)
+        root = '/'.join(parts) or '.'
+    files = sorted(os.path.abspath(f) for f in files
+                   if os.path.isfile(f) and f.lower().endswith(extensions)
+                   and not (skip_suffixes and f.lower().endswith(skip_suffixes)))
+    root = os.path.abspath(root)
+    if exclude_dir:
+        excluded = os.path.abspath(exclude_dir)
+        # Only a tree nested inside the source is dropped; outputs written
+        # next to the inputs are already caught by their suffixes
+        if excluded != root and os.path.commonpath([excluded, root]) == root:
+            files = [f for f in files if os.path.commonpath([f, excluded]) != excluded]
+    return root, files
+
+
+def output_paths(root: str, input_path: str, output_dir: str) -> Dict[str, str]:
+    """Mirror ``input_path`` (relative to ``root``) into ``output_dir``"""
+    stem = os.path.splitext(os.path.relpath(input_path, root))[0]
+    base = os.path.join(output_dir, stem)
+    return {
+        'summary': base + '.summary.md',
+        'ppt': base + '.pptx',
+        'data': base + '.pptx_data.json'
+    }
+
+
+def render_jobs(source: str, output_dir: str = None) -> List[Tuple[str, str]]:
+    """
+    Pair each presentation data file under ``source`` (a JSON file,
+    directory or glob) with the deck it renders to: next to it, or in a
+    tree under ``output_dir`` that mirrors the source tree.
+    """
+    if os.path.isfile(source):
+        files = [os.path.abspath(source)]
+        root = os.path.dirname(files[0])
+    else:
+        root, files = discover_inputs(source, (DECK_DATA_SUFFIX,), skip_suffixes=())
+    jobs = []
+    for data_path in files:
+        name = os.path.basename(data_path)
+        if name.endswith(DECK_DATA_SUFFIX):
+            stem = name[:-len(DECK_DATA_SUFFIX)].rstrip('.') or 'deck'
+        else:
+            stem = os.path.splitext(name)[0]
+        directory = os.path.dirname(data_path)
+        if output_dir:
+            directory = os.path.join(output_dir, os.path.relpath(directory, root))
+        jobs.append((data_path, os.path.normpath(os.path.join(directory, stem + '.pptx'))))
+    return jobs
+
+
+class BatchManifest:
+    """
+    Resumable record of a batch run, stored as JSON next to the outputs.
+
+    Each input is keyed by its path relative to the batch root and records
+    its status plus a size/mtime fingerprint, so a restarted batch skips
+    files that finished and have not changed since.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f).get('files', {})
+
+    @staticmethod
+    def fingerprint(input_path: str) -> str:
+        stat = os.stat(input_path)
+        return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+    def is_done(self, key: str, input_path: str) -> bool:
+        entry = self.entries.get(key)
+        return bool(entry and entry.get('status') == 'done'
+                    and entry.get('fingerprint') == self.fingerprint(input_path))
+
+    def update(self, key: str, **fields):
+        with self._lock:
+            self.entries.setdefault(key, {}).update(fields)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'files': self.entries}, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+
+def run_batch(source: str, output_dir: str, workers: int = 4,
+              on_result: Callable[[str, str, str], None] = None) -> Dict[str, int]:
+    """
+    Process every CIM under ``source`` with a bounded pool of ``workers``
+    files in flight, writing outputs to a tree under ``output_dir`` that
+    mirrors the input tree. Files already completed in the manifest are
+    skipped. LLM calls run at BATCH priority so interactive work in the
+    same process is scheduled first. ``on_result(key, status, detail)`` is
+    called as files finish.
+    """
+    root, files = discover_inputs(source, exclude_dir=output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = BatchManifest(os.path.join(output_dir, MANIFEST_NAME))
+    counts = {'done': 0, 'failed': 0, 'skipped': 0}
+
+    def process(input_path):
+        key = os.path.relpath(input_path, root)
+        paths = output_paths(root, input_path, output_dir)
+        os.makedirs(os.path.dirname(paths['summary']), exist_ok=True)
+        manifest.update(key, status='running', fingerprint=manifest.fingerprint(input_path), **paths)
+        try:
+            with priority(BATCH):
+                run_pipeline(input_path, paths['summary'], paths['ppt'], paths['data'])
+        except Exception as e:
+            manifest.update(key, status='failed', error=str(e))
+            return key, 'failed', str(e)
+        manifest.update(key, status='done', error=None)
+        return key, 'done', paths['ppt']
+
+    pending = []
+    for input_path in files:
+        key = os.path.relpath(input_path, root)
+        if manifest.is_done(key, input_path):
+            counts['skipped'] += 1
+            if on_result:
+                on_result(key, 'skipped', '')
+        else:
+            pending.append(input_path)
+
+    with ContextThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for future in as_completed([pool.submit(process, path) for path in pending]):
+            key, status, detail = future.result()
+            counts[status] += 1
+            if on_result:
+                on_result(key, status, detail)
+
+    return counts
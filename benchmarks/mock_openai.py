@@ -0,0 +1,214 @@
+"""
+Local stand-in for the OpenAI chat completions endpoint.
+
+Answers POST /v1/chat/completions with canned responses shaped like the
+ones each pipeline prompt expects, after a configurable delay. Supports
+streaming (SSE) and optional injected 429s so the retry path can be
+exercised. Point the pipeline at it with OPENAI_BASE_URL.
+
+    python benchmarks/mock_openai.py --port 8089 --latency-ms 300
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SECTIONS = {
+    "Company Overview": "Acme Holdings is a leading provider of industrial services headquartered in Chicago, Illinois, "
+                        "serving more than 2,000 customers across North America.",
+    "Financials": "Revenue grew from $310.2 million in FY2022 to $352.8 million in FY2023, revenue growth of 13.7%. "
+                  "Adjusted EBITDA was $71.4 million in FY2023, an EBITDA margin of 20.2%.",
+    "Market Opportunity": "The total addressable market is estimated at $18.5 billion, growing at 6.1% annually, "
+                          "with the top five competitors holding less than 20% share.",
+    "Risks": "Customer concentration, exposure to cyclical end markets and integration risk from recent acquisitions."
+}
+
+FACTS = {
+    "company_info": {"name": "Acme Holdings", "sector": "Industrial services", "location": "Chicago, Illinois",
+                     "business_model": "Recurring maintenance contracts for industrial facilities."},
+    "market_info": {"market_size": "$18.5B", "growth_rate": "6.1%",
+                    "competition": "Fragmented market; top five players hold under 20% share."},
+    "financial_metrics": {"revenue": "FY2023: $352.8M", "revenue_growth": "FY2023: 13.7%",
+                          "ebitda": "FY2023: $71.4M", "ebitda_margin": "FY2023: 20.2%"},
+    "key_highlights": ["Market leader in a fragmented $18.5B market", "13.7% revenue growth in FY2023",
+                       "20.2% EBITDA margin", "Recurring contract revenue", "Proven acquisition platform"]
+}
+
+SUMMARY = ("**Summary**\n\n1. The business shows consistent growth and strong margins.\n"
+           "2. Competitive position is supported by recurring contracts.\n"
+           "3. Key risks are customer concentration and cyclicality.")
+
+HIGHLIGHTS = "\n".join(f"{i}. {h}" for i, h in enumerate(FACTS["key_highlights"], 1))
+
+
+def canned_content(body):
+    """Pick a response matching the prompt the pipeline sent"""
+    prompt = " ".join(str(m.get("content", "")) for m in body.get("messages", []))
+    wants_json = (body.get("response_format") or {}).get("type") == "json_object"
+
+    if "split it into the following sections" in prompt or "Assign its content to these sections" in prompt:
+        return json.dumps(SECTIONS)
+    if "company_info:" in prompt:
+        return json.dumps(FACTS)
+    if "Extract the following financial metrics" in prompt or "Extract key financial metrics" in prompt:
+        return json.dumps(FACTS["financial_metrics"])
+    if "Extract key company information" in prompt:
+        return json.dumps(FACTS["company_info"])
+    if "company_name" in prompt:
+        return json.dumps({"company_name": "Acme Holdings", "location": "Chicago, Illinois",
+                           "industry": "Industrial services"})
+    if "Extract key market information" in prompt:
+        return json.dumps(FACTS["market_info"])
+    if "investment highlights" in prompt:
+        return HIGHLIGHTS
+    if wants_json:
+        return json.dumps({})
+    return SUMMARY
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "MockOpenAI/1.0"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+        length = int(self.headers.get("Content-Length", "0"))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        server = self.server
+        server.record_request()
+
+        if server.error_rate and random.random() < server.error_rate:
+            self._send_json(429, {"error": {"message": "Rate limit reached", "type": "requests"}},
+                            headers={"retry-after-ms": str(server.retry_after_ms)})
+            return
+
+        latency = max(0.0, random.gauss(server.latency, server.latency * server.jitter))
+        content = canned_content(body)
+        prompt_tokens = sum(len(str(m.get("content", ""))) for m in body.get("messages", [])) // 4
+        completion_tokens = server.completion_tokens or max(1, len(content) // 4)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        model = body.get("model", "gpt-4.1")
+
+        if body.get("stream"):
+            self._stream(body, content, latency, completion_id, model, prompt_tokens, completion_tokens)
+            return
+
+        time.sleep(latency)
+        self._send_json(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens}
+        })
+
+    def _stream(self, body, content, latency, completion_id, model, prompt_tokens, completion_tokens):
+        """Send the content as SSE chunks: first token after the latency, the rest paced evenly"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def event(delta, finish_reason=None, usage=None):
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+            if usage is not None:
+                chunk["choices"] = []
+                chunk["usage"] = usage
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        time.sleep(latency)
+        pieces = [content[i:i + 16] for i in range(0, len(content), 16)] or [""]
+        event({"role": "assistant", "content": ""})
+        for piece in pieces:
+            event({"content": piece})
+            time.sleep(self.server.token_interval)
+        event({}, finish_reason="stop")
+        if (body.get("stream_options") or {}).get("include_usage"):
+            event({}, usage={"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                             "total_tokens": prompt_tokens + completion_tokens})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+class MockOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency_ms=200.0, jitter=0.2, completion_tokens=0, error_rate=0.0,
+                 retry_after_ms=200, token_interval_ms=5.0, verbose=False):
+        super().__init__(address, MockOpenAIHandler)
+        self.latency = latency_ms / 1000.0
+        self.jitter = jitter
+        self.completion_tokens = completion_tokens
+        self.error_rate = error_rate
+        self.retry_after_ms = retry_after_ms
+        self.token_interval = token_interval_ms / 1000.0
+        self.verbose = verbose
+        self.request_count = 0
+        self._lock = threading.Lock()
+
+    def record_request(self):
+        with self._lock:
+            self.request_count += 1
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+
+def start_server(port=0, **options):
+    """Start the mock server on a background thread and return it (see server.base_url)"""
+    server = MockOpenAIServer(("127.0.0.1", port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="Mean time to first byte")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Latency standard deviation as a fraction of the mean")
+    parser.add_argument("--completion-tokens", type=int, default=0, help="Reported completion tokens (0 = from content length)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--token-interval-ms", type=float, default=5.0, help="Delay between streamed chunks")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    server = MockOpenAIServer(("127.0.0.1", args.port), latency_ms=args.latency_ms, jitter=args.jitter,
+                              completion_tokens=args.completion_tokens, error_rate=args.error_rate,
+                              token_interval_ms=args.token_interval_ms, verbose=args.verbose)
+    print(f"Mock OpenAI listening on {server.base_url} (export OPENAI_BASE_URL={server.base_url})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Offline end-to-end benchmarks for the CIM pipeline.
+
+Starts the mock chat completions server, points the OpenAI client at it,
+generates synthetic CIMs of several sizes and times each pipeline stage
+(ingest_file, parse_sections, summarize_sections, process_for_presentation,
+generate_ppt) separately. Reports mean, p50 and p95 latency, pages per
+second, LLM requests per run and peak traced memory per stage.
+
+    python benchmarks/run_benchmarks.py --pages 5,50,500 --formats pdf,txt --repeat 3
+    python benchmarks/run_benchmarks.py --latency-ms 0 --json-out bench.json
+"""
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+STAGES = ['ingest', 'parse', 'summarize', 'present', 'render']
+# Which earlier outputs each stage consumes ('input' is the CIM path); a
+# stage with several is given them as a tuple
+STAGE_INPUTS = {'ingest': 'input', 'parse': 'ingest', 'summarize': 'parse', 'present': ('parse', 'ingest'),
+                'render': 'present'}
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def configure_environment(base_url, work_dir, warm_cache):
+    """
+    Point the pipeline at the mock server and at throwaway caches.
+
+    Must run before any pipeline module is imported: the client, caches and
+    rate limits read their settings at import time.
+    """
+    os.environ['OPENAI_BASE_URL'] = base_url
+    os.environ.setdefault('OPENAI_API_KEY', 'sk-benchmark')
+    os.environ['LLM_CACHE_PATH'] = os.path.join(work_dir, 'llm_cache.sqlite3')
+    os.environ['PAGE_CACHE_PATH'] = os.path.join(work_dir, 'page_cache.sqlite3')
+    os.environ['NEAR_DUP_PATH'] = os.path.join(work_dir, 'near_duplicates.sqlite3')
+    os.environ['LLM_CACHE_BYPASS'] = '0' if warm_cache else '1'
+    os.environ['NEAR_DUP_BYPASS'] = '0' if warm_cache else '1'
+    os.environ['LLM_RPM_LIMIT'] = str(10 ** 6)
+    os.environ['LLM_TPM_LIMIT'] = str(10 ** 9)
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+
+
+def stage_functions(work_dir):
+    """Map stage name -> (fn(input) -> output); imported lazily after configure_environment"""
+    from ingestion import ingest_file
+    from parsing import parse_sections
+    from ppt_generator import generate_ppt
+    from summarization import process_for_presentation, summarize_sections
+
+    def render(presentation_data):
+        generate_ppt(presentation_data, os.path.join(work_dir, 'bench.pptx'))
+
+    return {
+        'ingest': ingest_file,
+        'parse': parse_sections,
+        'summarize': summarize_sections,
+        'present': lambda inputs: process_for_presentation(inputs[0], pages=inputs[1].pages),
+        'render': render,
+    }
+
+
+def reset_caches(warm_cache):
+    """Cold runs start every iteration with empty page and response caches"""
+    if warm_cache:
+        return
+    from llm_cache import cache
+    from page_cache import page_cache
+    cache.clear()
+    page_cache.clear()
+
+
+def measure(fn, arg, repeat, server, warm_cache):
+    """Time ``repeat`` calls, then one extra call under tracemalloc for peak memory"""
+    if warm_cache:
+        fn(arg)
+    timings = []
+    requests = []
+    output = None
+    for _ in range(repeat):
+        reset_caches(warm_cache)
+        gc.collect()
+        before = server.request_count
+        start = time.perf_counter()
+        output = fn(arg)
+        timings.append(time.perf_counter() - start)
+        requests.append(server.request_count - before)
+
+    reset_caches(warm_cache)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn(arg)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return output, timings, requests, peak
+
+
+def run_scenario(path, pages, fmt, stages, functions, repeat, server, warm_cache):
+    """Run every stage in order, feeding each the output of the stage it depends on"""
+    results = []
+    outputs = {'input': path}
+    for stage in STAGES:
+        fn = functions[stage]
+        inputs = STAGE_INPUTS[stage]
+        value = tuple(outputs[name] for name in inputs) if isinstance(inputs, tuple) else outputs[inputs]
+        if stage not in stages:
+            reset_caches(warm_cache)
+            outputs[stage] = fn(value)
+            continue
+        outputs[stage], timings, requests, peak = measure(fn, value, repeat, server, warm_cache)
+        mean = statistics.mean(timings)
+        results.append({
+            'format': fmt,
+            'pages': pages,
+            'stage': stage,
+            'runs': repeat,
+            'mean_seconds': round(mean, 4),
+            'p50_seconds': round(_percentile(timings, 0.5), 4),
+            'p95_seconds': round(_percentile(timings, 0.95), 4),
+            'pages_per_second': round(pages / mean, 2) if mean else None,
+            'llm_requests': round(statistics.mean(requests), 1),
+            'peak_memory_mb': round(peak / (1024 * 1024), 2),
+        })
+    return results
+
+
+def print_table(results):
+    header = (f"{'format':<6} {'pages':>5} {'stage':<10} {'mean s':>8} {'p50 s':>8} {'p95 s':>8} "
+              f"{'pages/s':>9} {'llm req':>8} {'peak MB':>8}")
+    print(header)
+    print('-' * len(header))
+    for r in results:
+        print(f"{r['format']:<6} {r['pages']:>5} {r['stage']:<10} {r['mean_seconds']:>8.3f} "
+              f"{r['p50_seconds']:>8.3f} {r['p95_seconds']:>8.3f} {r['pages_per_second'] or 0:>9.1f} "
+              f"{r['llm_requests']:>8.1f} {r['peak_memory_mb']:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pages', default='5,50,500', help='Comma-separated page counts')
+    parser.add_argument('--formats', default='pdf,txt', help='Comma-separated input formats (pdf, txt)')
+    parser.add_argument('--stages', default=','.join(STAGES), help='Comma-separated stages to time')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per stage')
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='Mock server time to first byte')
+    parser.add_argument('--jitter', type=float, default=0.2)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of mock requests answered with 429')
+    parser.add_argument('--warm-cache', action='store_true',
+                        help='Keep the LLM and page caches between runs (measures the cached path)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json-out', help='Also write the results as JSON')
+    args = parser.parse_args()
+
+    sys.path.insert(0, BENCH_DIR)
+    from mock_openai import start_server
+    from synthetic_cim import make_cim
+
+    stages = [s.strip() for s in args.stages.split(',') if s.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+
+    server = start_server(latency_ms=args.latency_ms, jitter=args.jitter, error_rate=args.error_rate)
+    results = []
+    with tempfile.TemporaryDirectory(prefix='cim-bench-') as work_dir:
+        configure_environment(server.base_url, work_dir, args.warm_cache)
+        functions = stage_functions(work_dir)
+        for fmt in [f.strip() for f in args.formats.split(',') if f.strip()]:
+            for pages in [int(p) for p in args.pages.split(',') if p.strip()]:
+                path = make_cim(os.path.join(work_dir, f'cim_{pages}.{fmt}'), pages, args.seed)
+                print(f"Benchmarking {fmt} x {pages} pages...", file=sys.stderr)
+                results += run_scenario(path, pages, fmt, stages, functions, args.repeat, server,
+                                        args.warm_cache)
+        from llm import close
+        close()
+    server.shutdown()
+
+    print_table(results)
+    if args.json_out:
+        with open(args.json_out, 'w', encoding='utf-8') as f:
+            json.dump({
+                'settings': {k: v for k, v in vars(args).items() if k != 'json_out'},
+                'results': results
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Startup-time regression check for the CLI.
+
+Runs `python -X importtime main.py <args> --help` and fails (exit code 1)
+when the imports attributable to the CLI exceed the budget or when a heavy
+dependency that should only load inside a pipeline stage is imported.
+
+    python benchmarks/startup_budget.py --budget-ms 75
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BUDGET_MS = 75
+FORBIDDEN_MODULES = ['openai', 'httpx', 'PyPDF2', 'pptx', 'rich', 'dotenv', 'ingestion', 'parsing',
+                     'summarization', 'ppt_generator', 'llm', 'pipeline']
+COMMANDS = [[], ['run'], ['batch']]
+
+
+def import_times(args):
+    """Return {top-level module: cumulative microseconds} for a python invocation"""
+    result = subprocess.run([sys.executable, '-X', 'importtime'] + args, cwd=REPO_ROOT,
+                            capture_output=True, text=True, check=False)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if name.startswith(' ') and not name.startswith('  '):
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def all_imported(args):
+    result = subprocess.run([sys.executable, '-X', 'importtime'] + args, cwd=REPO_ROOT,
+                            capture_output=True, text=True, check=False)
+    return {line.rsplit('|', 1)[-1].strip() for line in result.stderr.splitlines() if line.startswith('import time:')}
+
+
+def check(budget_ms):
+    baseline = import_times(['-c', 'pass'])
+    failures = []
+    for command in COMMANDS:
+        args = ['main.py'] + command + ['--help']
+        times = import_times(args)
+        cli_us = sum(us for name, us in times.items() if name not in baseline)
+        loaded = sorted(m for m in all_imported(args) if m.split('.')[0] in FORBIDDEN_MODULES)
+        label = ' '.join(args)
+        print(f"{label:<28} {cli_us / 1000:7.1f} ms of CLI imports (budget {budget_ms} ms)")
+        if cli_us / 1000 > budget_ms:
+            failures.append(f"{label}: {cli_us / 1000:.1f} ms exceeds the {budget_ms} ms budget")
+        if loaded:
+            failures.append(f"{label}: imports {', '.join(loaded[:5])} at startup")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS)
+    args = parser.parse_args()
+
+    failures = check(args.budget_ms)
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""
+Generate synthetic CIMs (PDF or text) of a given page count.
+
+Pages cycle through the four sections the pipeline looks for, with
+headings, financial sentences containing figures and years, and the
+page furniture (confidentiality notices, page numbers) real CIMs carry.
+Output is deterministic for a given seed. The PDF writer is hand-rolled
+so no extra dependency is needed.
+
+    python benchmarks/synthetic_cim.py --pages 50 --format pdf --output /tmp/cim_50.pdf
+"""
+import argparse
+import random
+
+SECTION_PLAN = [
+    ("1. Company Overview", [
+        "{company} is a leading provider of {sector} headquartered in {city}.",
+        "Founded in {founded}, the company serves more than {customers:,} customers across North America.",
+        "The business operates through {segments} segments with {employees:,} employees.",
+        "Recurring maintenance contracts account for {recurring}% of total revenue.",
+    ]),
+    ("2. Financial Performance", [
+        "Revenue was ${revenue_prev:.1f} million in FY{year_prev} and ${revenue:.1f} million in FY{year}.",
+        "Revenue growth of {growth:.1f}% in FY{year} was driven by new contract wins.",
+        "Adjusted EBITDA was ${ebitda:.1f} million in FY{year}, an EBITDA margin of {margin:.1f}%.",
+        "Capital expenditure remained below {capex:.1f}% of revenue over the period.",
+    ]),
+    ("3. Market Opportunity", [
+        "The total addressable market is estimated at ${tam:.1f} billion.",
+        "The market is growing at {market_growth:.1f}% annually, supported by outsourcing trends.",
+        "The top five competitors hold less than {share}% combined market share.",
+        "Management sees whitespace in {regions} adjacent regions.",
+    ]),
+    ("4. Investment Risks", [
+        "The top ten customers represent {concentration}% of revenue.",
+        "Demand is exposed to cyclical industrial end markets.",
+        "Integration of recent acquisitions may divert management attention.",
+        "Labor availability could constrain growth in peak seasons.",
+    ]),
+]
+
+FILLER = [
+    "This discussion is based on management estimates and unaudited figures.",
+    "The company continues to invest in technology, training and safety programs.",
+    "Customer retention has remained consistently high throughout the period.",
+    "Operations are organised into regional hubs with shared back-office functions.",
+]
+
+CONFIDENTIAL = "Strictly Private and Confidential - Not for Distribution"
+LINES_PER_PAGE = 40
+
+
+def facts(seed: int) -> dict:
+    rng = random.Random(seed)
+    revenue_prev = rng.uniform(80, 900)
+    growth = rng.uniform(3, 25)
+    revenue = revenue_prev * (1 + growth / 100)
+    margin = rng.uniform(10, 35)
+    return {
+        "company": rng.choice(["Acme Holdings", "Northwind Services", "Granite Industrial", "Bluewater Logistics"]),
+        "sector": rng.choice(["industrial services", "logistics software", "specialty distribution"]),
+        "city": rng.choice(["Chicago, Illinois", "Dallas, Texas", "Columbus, Ohio"]),
+        "founded": rng.randint(1960, 2010),
+        "customers": rng.randint(500, 20000),
+        "segments": rng.randint(2, 5),
+        "employees": rng.randint(300, 12000),
+        "recurring": rng.randint(40, 90),
+        "year_prev": 2022,
+        "year": 2023,
+        "revenue_prev": revenue_prev,
+        "revenue": revenue,
+        "growth": growth,
+        "ebitda": revenue * margin / 100,
+        "margin": margin,
+        "capex": rng.uniform(1, 6),
+        "tam": rng.uniform(2, 60),
+        "market_growth": rng.uniform(2, 12),
+        "share": rng.randint(10, 40),
+        "regions": rng.randint(2, 6),
+        "concentration": rng.randint(10, 45),
+    }
+
+
+def generate_pages(pages: int, seed: int = 0):
+    """Return a list of page texts for a synthetic CIM of ``pages`` pages"""
+    rng = random.Random(seed)
+    values = facts(seed)
+    sections_per_page = max(1, pages // len(SECTION_PLAN))
+    result = []
+    for number in range(pages):
+        heading, sentences = SECTION_PLAN[min(len(SECTION_PLAN) - 1, number // sections_per_page)]
+        lines = [CONFIDENTIAL, ""]
+        if number % sections_per_page == 0:
+            lines += [heading, ""]
+        while len(lines) < LINES_PER_PAGE - 2:
+            pool = sentences if rng.random() < 0.6 else FILLER
+            lines.append(rng.choice(pool).format(**values))
+        lines += ["", f"Page {number + 1}"]
+        result.append("\n".join(lines))
+    return result
+
+
+def _pdf_escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, pages):
+    """Write one Helvetica text page per entry in ``pages``"""
+    count = len(pages)
+    kids = " ".join(f"{4 + 2 * i} 0 R" for i in range(count))
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{kids}] /Count {count} >>",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i, text in enumerate(pages):
+        body = " ".join(f"({_pdf_escape(line)}) Tj T*" for line in text.split("\n"))
+        stream = f"BT /F1 10 Tf 12 TL 54 750 Td {body} ET"
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>")
+        objects.append(f"<< /Length {len(stream.encode('latin-1'))} >>\nstream\n{stream}\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{obj}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def write_text(path: str, pages):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n\n".join(pages))
+
+
+def make_cim(path: str, pages: int, seed: int = 0) -> str:
+    """Write a synthetic CIM to ``path``; the format follows the extension (.pdf, otherwise text)"""
+    texts = generate_pages(pages, seed)
+    if path.lower().endswith(".pdf"):
+        write_pdf(path, texts)
+    else:
+        write_text(path, texts)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--format", choices=["pdf", "txt"], default="pdf")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", required=True)
+    args = parser.parse_args()
+
+    path = args.output
+    if not path.lower().endswith(f".{args.format}"):
+        path = f"{path}.{args.format}"
+    make_cim(path, args.pages, args.seed)
+    print(f"Wrote {args.pages}-page synthetic CIM to {path}")
+
+
+if __name__ == "__main__":
+    main()
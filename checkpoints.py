@@ -0,0 +1,112 @@
+import hashlib
+import importlib.util
+import json
+import os
+import threading
+import time
+from typing import Any, Iterable, Optional
+
+import config
+from sqlite_store import open_database
+
+CHECKPOINT_PATH = config.get("CHECKPOINT_PATH", os.path.join(".cim_cache", "checkpoints.sqlite3"))
+CHECKPOINT_MAX_AGE_DAYS = config.get_float("CHECKPOINT_MAX_AGE_DAYS", 30)
+CHECKPOINT_BYPASS = config.get_bool("CHECKPOINT_BYPASS")
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_digest(modules: Iterable[str]) -> str:
+    """
+    Hash the source of ``modules`` without importing them. Prompts, model
+    names and extraction rules live in the source, so any edit to them
+    changes the digest.
+    """
+    digest = hashlib.sha256()
+    for name in sorted(modules):
+        spec = importlib.util.find_spec(name)
+        digest.update(name.encode('utf-8'))
+        if spec is not None and spec.origin and os.path.exists(spec.origin):
+            with open(spec.origin, 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+class CheckpointStore:
+    """
+    Content-addressed store for pipeline stage outputs.
+
+    Each artifact is keyed on a hash of everything that determines it (the
+    input file, the outputs of the stages it depends on, and the source and
+    settings of the code that produces it), so a rerun can reuse every
+    stage whose inputs and implementation are unchanged. Outputs are stored
+    as JSON in SQLite; entries unused for ``max_age_days`` are pruned when
+    the store opens.
+    """
+
+    def __init__(self, path: str = CHECKPOINT_PATH, max_age_days: float = CHECKPOINT_MAX_AGE_DAYS,
+                 bypass: bool = CHECKPOINT_BYPASS):
+        self.path = path
+        self.max_age = max_age_days * 86400
+        self.bypass = bypass
+        self.stats = {'hits': 0, 'misses': 0}
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = open_database(self.path, [
+                "CREATE TABLE IF NOT EXISTS artifacts ("
+                "key TEXT PRIMARY KEY, stage TEXT NOT NULL, payload TEXT NOT NULL, "
+                "created REAL NOT NULL, last_used REAL NOT NULL)",
+            ], prune=["DELETE FROM artifacts WHERE last_used < ?"], max_age=self.max_age)
+        return self._conn
+
+    @staticmethod
+    def make_key(stage: str, **parts) -> str:
+        blob = json.dumps({'stage': stage, **parts}, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the stored output for ``key``, or None"""
+        if self.bypass:
+            return None
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT payload FROM artifacts WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats['misses'] += 1
+                return None
+            conn.execute("UPDATE artifacts SET last_used = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+        self.stats['hits'] += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, stage: str, value: Any):
+        if self.bypass:
+            return
+        payload = json.dumps(value)
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO artifacts (key, stage, payload, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, stage, payload, now, now)
+            )
+            conn.commit()
+
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM artifacts")
+            conn.commit()
+
+
+checkpoints = CheckpointStore()
@@ -0,0 +1,32 @@
+import os
+
+_loaded = False
+
+
+def load_env():
+    """Load .env into os.environ once per process"""
+    global _loaded
+    if not _loaded:
+        _loaded = True
+        from dotenv import load_dotenv
+        load_dotenv()
+
+
+def get(name: str, default: str = None) -> str:
+    load_env()
+    return os.getenv(name, default)
+
+
+def get_int(name: str, default: int) -> int:
+    return int(get(name, str(default)))
+
+
+def get_float(name: str, default: float) -> float:
+    return float(get(name, str(default)))
+
+
+def get_bool(name: str, default: bool = False) -> bool:
+    value = get(name)
+    if value is None:
+        return default
+    return value.lower() in ("1", "true", "yes")
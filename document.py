@@ -0,0 +1,161 @@
+import hashlib
+import mmap
+import os
+from array import array
+from typing import Any, Dict, Iterator, List, Sequence
+
+# Pages are stored back to back in one UTF-8 buffer, separated by a single
+# byte: "\n" between extracted PDF pages (so ``text`` reads as before) and
+# the form feed that marks page breaks in text exports.
+PDF_PAGE_SEPARATOR = b"\n"
+TEXT_PAGE_SEPARATOR = b"\f"
+
+
+class PageView(Sequence[str]):
+    """Read-only sequence of a document's pages, each decoded only when accessed"""
+
+    __slots__ = ('_document',)
+
+    def __init__(self, document: 'Document'):
+        self._document = document
+
+    def __len__(self) -> int:
+        return self._document.page_count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._document.page(i) for i in range(*index.indices(len(self)))]
+        return self._document.page(index)
+
+    def __iter__(self) -> Iterator[str]:
+        for index in range(len(self)):
+            yield self._document.page(index)
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def digest(self) -> str:
+        """Hash of the pages' bytes and boundaries, computed without decoding them"""
+        document = self._document
+        digest = hashlib.sha256(document._buffer)
+        digest.update(document._offsets.tobytes())
+        return digest.hexdigest()
+
+
+class Document:
+    """
+    The text of one input file, PDF or text, as a single UTF-8 buffer with
+    page start offsets.
+
+    Text files are memory-mapped rather than read, and PDF pages are kept
+    encoded once instead of as a page list plus a joined copy. ``pages``
+    and ``page(n)`` decode a single page on demand; ``span`` and
+    ``page_span`` return zero-copy memoryviews of the underlying bytes.
+    ``facts`` holds what ingestion extracted ('analysis',
+    'financial_metrics', 'sources', 'page_hashes'), empty for text files.
+    """
+
+    __slots__ = ('path', 'kind', 'facts', '_buffer', '_offsets')
+
+    def __init__(self, path: str, kind: str, buffer, offsets: array, facts: Dict[str, Any] = None):
+        self.path = path
+        self.kind = kind
+        self.facts = facts or {}
+        self._buffer = buffer
+        # One start offset per page plus a sentinel one separator past the end
+        self._offsets = offsets
+
+    @classmethod
+    def from_pages(cls, path: str, pages: List[str], facts: Dict[str, Any] = None) -> 'Document':
+        offsets = array('q')
+        position = 0
+        encoded = []
+        for page in pages:
+            data = page.encode('utf-8')
+            offsets.append(position)
+            position += len(data) + len(PDF_PAGE_SEPARATOR)
+            encoded.append(data)
+        offsets.append(position)
+        return cls(path, 'pdf', PDF_PAGE_SEPARATOR.join(encoded), offsets, facts)
+
+    @classmethod
+    def open_text(cls, path: str) -> 'Document':
+        """Memory-map a UTF-8 text file; form feeds split it into pages"""
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        offsets = array('q', [0])
+        position = buffer.find(TEXT_PAGE_SEPARATOR)
+        while position != -1:
+            offsets.append(position + 1)
+            position = buffer.find(TEXT_PAGE_SEPARATOR, position + 1)
+        offsets.append(len(buffer) + 1)
+        return cls(path, 'text', buffer, offsets)
+
+    @property
+    def page_count(self) -> int:
+        return len(self._offsets) - 1
+
+    def __len__(self) -> int:
+        """Size of the text in bytes"""
+        return len(self._buffer)
+
+    @property
+    def pages(self) -> PageView:
+        return PageView(self)
+
+    @property
+    def text(self) -> str:
+        """The whole text, decoded on each access (hold on to it rather than re-reading)"""
+        return str(memoryview(self._buffer), 'utf-8')
+
+    def page_span(self, number: int) -> memoryview:
+        """Bytes of page ``number`` (0-based) without copying"""
+        if number < 0:
+            number += self.page_count
+        if not 0 <= number < self.page_count:
+            raise IndexError("page index out of range")
+        return self.span(self._offsets[number], self._offsets[number + 1] - 1)
+
+    def page(self, number: int) -> str:
+        return str(self.page_span(number), 'utf-8')
+
+    def span(self, start: int, end: int) -> memoryview:
+        """Bytes [start, end) of the buffer without copying"""
+        return memoryview(self._buffer)[start:end]
+
+    def digest(self) -> str:
+        return hashlib.sha256(self._buffer).hexdigest()
+
+    def close(self):
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Checkpoint form. Text files are stored by digest only and reopened
+        from the run's input path on load; PDFs keep their page texts since
+        re-extracting them is the expensive part.
+        """
+        data = {'kind': self.kind, 'path': self.path, 'facts': self.facts}
+        if self.kind == 'text':
+            data['sha256'] = self.digest()
+        else:
+            data['pages'] = list(self.pages)
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], path: str = None) -> 'Document':
+        """
+        Rebuild a checkpointed Document for the input at ``path`` (default:
+        the path it was stored from). A text file is reopened and must still
+        match the stored digest, otherwise ValueError is raised.
+        """
+        path = path or data['path']
+        if data['kind'] != 'text':
+            return cls.from_pages(path, data['pages'], data['facts'])
+        document = cls.open_text(path)
+        if document.digest() != data.get('sha256'):
+            document.close()
+            raise ValueError(f"{path} no longer matches its checkpoint")
+        return document
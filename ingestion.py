@@ -1,18 +1,21 @@
 import os
-from PyPDF2 import PdfReader
-# import pytesseract
-# from pdf2image import convert_from_path
-import openai
-from dotenv import load_dotenv
 import json
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Iterator, List, Tuple
+import config
+from llm import chat
+from page_cache import page_cache, page_content_hash
+from metric_extraction import extract_metrics, fill_missing, is_confident
+from tokens import fit_prompt_text
+from page_index import index_for
+from ocr import fill_scanned_pages
+from document import Document
+from metrics import metrics as run_metrics
 
-load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
+PDF_WORKERS = config.get_int("PDF_WORKERS", min(4, os.cpu_count() or 1))
+PAGES_PER_WORKER_TASK = 25
 
 class PDFProcessor:
-    def __init__(self):
-        self.client = openai.OpenAI()
-        
     def extract_financial_metrics_ai(self, text: str) -> dict:
         """Extract financial metrics using AI"""
         prompt = """Extract the following financial metrics from the text. Return ONLY a JSON object with these keys:
@@ -30,11 +33,11 @@ class PDFProcessor:
         """
         
         try:
-            response = self.client.chat.completions.create(
+            response = chat(
                 model="gpt-4.1",
                 messages=[
                     {"role": "system", "content": "You are a financial analyst extracting key metrics from business documents. Return response in valid JSON format."},
-                    {"role": "user", "content": prompt.format(text=text)}
+                    {"role": "user", "content": prompt.format(text=fit_prompt_text('financial_metrics', text))}
                 ],
                 temperature=0
             )
@@ -43,98 +46,192 @@ class PDFProcessor:
             return json.loads(content)
         except Exception as e:
             print(f"AI extraction failed: {e}")
+            run_metrics.record_failure("financial_metrics")
             return self._fallback_metric_extraction(text)
             
     def _fallback_metric_extraction(self, text):
         """Fallback to regex-based extraction if AI fails"""
-        patterns = {
-            'revenue': r'(?:revenue|sales).*?\$?\s*([\d,.]+)\s*(?:million|m|billion|b)?',
-            'ebitda': r'ebitda.*?\$?\s*([\d,.]+)\s*(?:million|m|billion|b)?',
-            'revenue_growth': r'(?:revenue growth|sales growth).*?(\d+(?:\.\d+)?)\s*%',
-            'ebitda_margin': r'(?:ebitda margin).*?(\d+(?:\.\d+)?)\s*%',
-            'market_size': r'(?:market size|tam|total addressable market).*?\$?\s*([\d,.]+)\s*(?:million|m|billion|b)?'
-        }
-
-    # def extract_text_with_ocr(self, pdf_path):
-    #     """Extract text from PDF pages using OCR"""
-    #     images = convert_from_path(pdf_path)
-    #     text = ""
-    #     for image in images:
-    #         img = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-    #         text += pytesseract.image_to_string(img) + "\n"
-    #     return text
+        metrics, _ = extract_metrics(text)
+        return metrics
 
     def analyze_text_with_ai(self, text: str) -> dict:
         """Analyze text content using AI to extract structured information"""
-        prompt = """Analyze this business document and extract the following information in JSON format:
+        prompt = """Analyze this business document and extract the following information. Return ONLY a JSON object with these keys:
         1. company_info:
            - name: Company name
            - sector: Industry sector
            - location: Headquarters location
-           - business_model: Brief description of business model
-        2. financial_metrics: Latest financial metrics
-        3. market_info:
-           - market_size: Total addressable market size
-           - growth_rate: Market growth rate
-           - competition: Key competitive position
-        4. key_highlights: List of 3-5 most important investment highlights
+           - business_model: 1-2 sentence description of the core business model
+        2. market_info:
+           - market_size: Total addressable market size (with unit)
+           - growth_rate: Market growth rate (as percentage)
+           - competition: 1-2 sentence overview of the competitive position
+        3. financial_metrics:
+           - revenue: Latest revenue figure (with unit like M or B)
+           - revenue_growth: Latest revenue growth rate (as percentage)
+           - ebitda: Latest EBITDA figure (with unit)
+           - ebitda_margin: Latest EBITDA margin (as percentage)
+        4. key_highlights: List of the 5 most important investment highlights, each 1-2 sentences
+        
+        If a value is not found, set it to null.
         
         Text to analyze:
         {text}
         """
         
         try:
-            response = self.client.chat.completions.create(
+            response = chat(
                 model="gpt-4.1",
                 messages=[
                     {"role": "system", "content": "You are a financial analyst extracting key information from business documents. Return response in valid JSON format."},
-                    {"role": "user", "content": prompt.format(text=text)}
+                    {"role": "user", "content": prompt.format(text=fit_prompt_text('document_analysis', text))}
                 ],
-                temperature=0
+                temperature=0,
+                response_format={"type": "json_object"}
             )
             content = response.choices[0].message.content.strip()
             return json.loads(content)
         except Exception as e:
             print(f"AI analysis failed: {e}")
+            run_metrics.record_failure("document_analysis")
             return {}
 
     def extract_financial_metrics(self, text):
-        """Extract financial metrics using AI with regex fallback"""
+        """Extract financial metrics with the regex engine, asking the AI only when it is unsure"""
+        metrics, confidence = extract_metrics(text)
+        if is_confident(confidence):
+            return metrics
         try:
-            return self.extract_financial_metrics_ai(text)
+            return fill_missing(self.extract_financial_metrics_ai(text), metrics, confidence)
         except Exception as e:
             print(f"Falling back to regex extraction: {e}")
-            return self._fallback_metric_extraction(text)
+            run_metrics.record_failure("financial_metrics")
+            return metrics
 
-def ingest_file(filepath):
-    """Main function to process PDF files"""
+def ingest_file(filepath) -> Document:
+    """Load a PDF or text file as a Document (PDFs also get their facts extracted)"""
     ext = os.path.splitext(filepath)[-1].lower()
     if ext == '.pdf':
         return process_pdf(filepath)
     elif ext in ['.txt', '.md']:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return f.read()
+        return Document.open_text(filepath)
     else:
         raise ValueError("Unsupported file type. Please provide a PDF or text file.")
 
-def process_pdf(filepath):
+def extract_document_facts(text, processor=None, pages=None):
+    """
+    Extract company, market, financial and highlight data in a single pass.
+
+    The result has the same shape as the presentation data consumed by
+    generate_ppt ({'analysis': {...}, 'financial_metrics': {...}}) so later
+    stages can reuse it instead of asking the model again. With ``pages``,
+    the model only sees the pages the page index ranks highest for each
+    call; their numbers are returned under 'sources'.
+    """
+    processor = processor or PDFProcessor()
+    index = index_for(pages)
+    sources = {}
+
+    def relevant_text(site):
+        if index is None or not index.covers(site):
+            return text
+        sources[site] = index.relevant_pages(site)
+        return index.pages_text(sources[site])
+
+    analysis = processor.analyze_text_with_ai(relevant_text('document_analysis'))
+
+    regex_metrics, confidence = extract_metrics(text)
+    metrics = fill_missing(analysis.pop('financial_metrics', None) or {}, regex_metrics, confidence)
+    if not any(metrics.values()):
+        metrics = processor.extract_financial_metrics(relevant_text('financial_metrics')) or {}
+
+    return {
+        'analysis': {
+            'company_info': analysis.get('company_info') or {},
+            'market_info': analysis.get('market_info') or {},
+            'key_highlights': analysis.get('key_highlights') or []
+        },
+        'financial_metrics': metrics,
+        'sources': sources
+    }
+
+def _extract_page_batch(args) -> List[Tuple[int, str]]:
+    """Process pool worker: each worker opens its own PdfReader"""
+    from PyPDF2 import PdfReader
+    filepath, indices = args
+    reader = PdfReader(filepath)
+    return [(index, reader.pages[index].extract_text() or "") for index in indices]
+
+def iter_pages(filepath, workers=PDF_WORKERS, pages_per_task=PAGES_PER_WORKER_TASK,
+               cache=page_cache) -> Iterator[Tuple[int, str, str]]:
+    """
+    Yield ``(page_index, page_hash, text)`` for every page as its text
+    becomes available: cached pages first, then parsed pages one at a time
+    in-process or one batch at a time as pool workers finish (so in no
+    particular order). Pages whose content hash is already in the page cache are not
+    re-parsed; new text is cached a batch at a time.
+    """
+    from PyPDF2 import PdfReader
+    reader = PdfReader(filepath)
+    hashes = [page_content_hash(page) for page in reader.pages]
+    cached = cache.get_texts(hashes) if cache is not None else {}
+    missing = []
+    for index, page_hash in enumerate(hashes):
+        if page_hash in cached:
+            yield index, page_hash, cached[page_hash]
+        else:
+            missing.append(index)
+
+    if workers <= 1 or len(missing) <= pages_per_task:
+        fresh = {}
+        for index in missing:
+            text = reader.pages[index].extract_text() or ""
+            fresh[hashes[index]] = text
+            if len(fresh) >= pages_per_task or index == missing[-1]:
+                if cache is not None:
+                    cache.put_texts(fresh)
+                fresh = {}
+            yield index, hashes[index], text
+        return
+
+    batches = [(filepath, missing[start:start + pages_per_task])
+               for start in range(0, len(missing), pages_per_task)]
+    with ProcessPoolExecutor(max_workers=min(workers, len(batches))) as pool:
+        for future in as_completed([pool.submit(_extract_page_batch, batch) for batch in batches]):
+            batch = future.result()
+            if cache is not None:
+                cache.put_texts({hashes[index]: text for index, text in batch})
+            for index, text in batch:
+                yield index, hashes[index], text
+
+def extract_pages(filepath, workers=PDF_WORKERS, pages_per_task=PAGES_PER_WORKER_TASK,
+                  cache=page_cache) -> Tuple[List[str], List[str]]:
+    """
+    Extract the text of every page, indexed by page number.
+
+    Returns ``(pages, page_hashes)`` collected from iter_pages, so a
+    revised CIM only pays for the pages that changed.
+    """
+    pages, hashes = {}, {}
+    for index, page_hash, text in iter_pages(filepath, workers, pages_per_task, cache):
+        pages[index] = text
+        hashes[index] = page_hash
+    return [pages[index] for index in range(len(pages))], [hashes[index] for index in range(len(hashes))]
+
+def process_pdf(filepath) -> Document:
     """Process PDF and extract all relevant information using AI"""
     processor = PDFProcessor()
     
-    reader = PdfReader(filepath)
-    text = ""
-    for page in reader.pages:
-        text += page.extract_text() or ""
-    
-    # if not text.strip():
-    #     text = processor.extract_text_with_ocr(filepath)
+    pages, page_hashes = extract_pages(filepath)
+    pages = fill_scanned_pages(filepath, pages, page_hashes)
+    document = Document.from_pages(filepath, pages)
+    del pages
     
-    analysis = processor.analyze_text_with_ai(text)
-    
-    metrics = processor.extract_financial_metrics(text)
-    
-    return {
-        'text': text,
-        'analysis': analysis,
-        'financial_metrics': metrics
-    }
\ No newline at end of file
+    facts = extract_document_facts(document.text, processor, document.pages)
+    document.facts = {
+        'page_hashes': page_hashes,
+        'analysis': facts['analysis'],
+        'financial_metrics': facts['financial_metrics'],
+        'sources': facts['sources']
+    }
+    return document
@@ -0,0 +1,64 @@
+import json
+from typing import Any, List, Tuple
+
+
+class ObjectMemberStream:
+    """
+    Incremental parser for a streamed JSON object.
+
+    Feed it text as it arrives; ``feed`` returns the top-level ``(key,
+    value)`` members whose values closed in that text, so a consumer can act
+    on the first member while the rest of the object is still being
+    generated. Anything before the opening brace (e.g. a code fence) is
+    skipped. Members that fail to parse are dropped.
+    """
+
+    def __init__(self):
+        self.buffer = []
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.member_start = None
+        self.closed = False
+
+    def _complete(self, raw: str, members: List[Tuple[str, Any]]):
+        raw = raw.strip()
+        if not raw:
+            return
+        try:
+            members.extend(json.loads("{" + raw + "}").items())
+        except json.JSONDecodeError:
+            pass
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        members = []
+        for char in text:
+            if self.closed:
+                break
+            if self.depth == 0:
+                if char == "{":
+                    self.depth = 1
+                    self.member_start = len(self.buffer)
+                continue
+            self.buffer.append(char)
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+                continue
+            if char == '"':
+                self.in_string = True
+            elif char in "{[":
+                self.depth += 1
+            elif char in "}]":
+                self.depth -= 1
+                if self.depth == 0:
+                    self._complete("".join(self.buffer[self.member_start:-1]), members)
+                    self.closed = True
+            elif char == "," and self.depth == 1:
+                self._complete("".join(self.buffer[self.member_start:-1]), members)
+                self.member_start = len(self.buffer)
+        return members
@@ -0,0 +1,245 @@
+import contextvars
+import importlib.util
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Iterator
+
+import config
+from llm_cache import cache
+from metrics import metrics
+from rate_limit import BATCH, INTERACTIVE, backoff_delay, estimate_request_tokens, scheduler
+
+# openai and httpx are imported on first use: importing openai alone costs
+# several hundred milliseconds, which CLI paths like --help should not pay.
+
+LLM_MAX_CONCURRENCY = config.get_int("LLM_MAX_CONCURRENCY", 8)
+LLM_TIMEOUT = config.get_float("LLM_TIMEOUT", 120)
+LLM_CONNECT_TIMEOUT = config.get_float("LLM_CONNECT_TIMEOUT", 10)
+LLM_MAX_CONNECTIONS = config.get_int("LLM_MAX_CONNECTIONS", 32)
+LLM_MAX_KEEPALIVE_CONNECTIONS = config.get_int("LLM_MAX_KEEPALIVE_CONNECTIONS", 16)
+LLM_KEEPALIVE_EXPIRY = config.get_float("LLM_KEEPALIVE_EXPIRY", 120)
+LLM_MAX_RETRIES = config.get_int("LLM_MAX_RETRIES", 6)
+
+# HTTP/2 multiplexes concurrent requests over one connection; it needs the
+# optional h2 package (pip install "httpx[http2]").
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+_lock = threading.Lock()
+_client = None
+_llm_slots = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+_priority = contextvars.ContextVar("llm_priority", default=None)
+default_priority = INTERACTIVE
+
+
+def _retryable_errors():
+    import openai
+    return (
+        openai.RateLimitError,
+        openai.APITimeoutError,
+        openai.APIConnectionError,
+        openai.InternalServerError,
+    )
+
+
+def _http_options():
+    import httpx
+    import openai
+    return {
+        'limits': httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=LLM_KEEPALIVE_EXPIRY
+        ),
+        'timeout': openai.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+        'http2': HTTP2_AVAILABLE
+    }
+
+
+def get_client() -> "openai.OpenAI":
+    """Return the process-wide OpenAI client, creating it on first use"""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                import openai
+                _client = openai.OpenAI(
+                    api_key=config.get("OPENAI_API_KEY"),
+                    max_retries=0,
+                    http_client=openai.DefaultHttpxClient(**_http_options())
+                )
+    return _client
+
+
+def set_llm_concurrency(limit: int):
+    """Cap the number of upstream requests in flight across all threads"""
+    global _llm_slots
+    _llm_slots = threading.BoundedSemaphore(max(1, limit))
+
+
+@contextmanager
+def priority(level: int):
+    """Run LLM calls made in this context at INTERACTIVE or BATCH priority"""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> int:
+    level = _priority.get()
+    return default_priority if level is None else level
+
+
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    """ThreadPoolExecutor whose tasks inherit the submitter's context (and so its priority)"""
+
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def _create(params, info=None, hold_slot=False):
+    """
+    Send one request through the scheduler, retrying transient failures
+    with backoff. ``info`` (if given) receives the number of retries and
+    the token estimate the request was admitted with.
+
+    With ``hold_slot`` (streams), the concurrency slot stays taken after a
+    successful return and is left in ``info['slot']``; the caller releases
+    it once the stream is consumed.
+    """
+    import openai
+    info = {} if info is None else info
+    info['upstream'] = True
+    info['retries'] = 0
+    estimate = info['estimate'] = estimate_request_tokens(params)
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        scheduler.acquire(estimate, current_priority())
+        slot = _llm_slots
+        slot.acquire()
+        try:
+            response = get_client().chat.completions.create(**params)
+        except BaseException as e:
+            slot.release()
+            if not isinstance(e, _retryable_errors()) or attempt == LLM_MAX_RETRIES:
+                raise
+            info['retries'] += 1
+            delay = backoff_delay(e, attempt)
+            if isinstance(e, openai.RateLimitError):
+                scheduler.pause(delay)
+            time.sleep(delay)
+            continue
+        if hold_slot:
+            info['slot'] = slot
+        else:
+            slot.release()
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            scheduler.settle(estimate, usage.total_tokens)
+        return response
+
+
+def _record(params, started, info, response=None, error=None):
+    usage = getattr(response, "usage", None)
+    metrics.record_llm_call(
+        model=params.get("model"),
+        seconds=time.perf_counter() - started,
+        prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+        completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+        cached=not info.get('upstream'),
+        retries=info.get('retries', 0),
+        error=type(error).__name__ if error else None
+    )
+
+
+def chat(**params) -> "ChatCompletion":
+    """
+    Create a chat completion through the shared client and response cache.
+    Takes the same arguments as client.chat.completions.create.
+    """
+    if params.get("stream"):
+        return _create(params)
+    from openai.types.chat import ChatCompletion
+    info = {}
+    started = time.perf_counter()
+    try:
+        payload = cache.fetch(params, lambda: _create(params, info).model_dump_json())
+    except Exception as e:
+        _record(params, started, info, error=e)
+        raise
+    response = ChatCompletion.model_validate_json(payload)
+    _record(params, started, info, response)
+    return response
+
+
+def stream_chat(**params) -> Iterator[str]:
+    """
+    Yield the completion's content as it arrives. Takes the same arguments
+    as chat() (without ``stream``).
+
+    Shares cache entries with chat(): a cached response is yielded in one
+    piece, and a streamed response is cached once it completes.
+    """
+    from openai.types.chat import ChatCompletion
+    key = cache.make_key(params)
+    payload = None if cache.bypass else cache.get(key)
+    if payload is not None:
+        cache.stats['hits'] += 1
+        response = ChatCompletion.model_validate_json(payload)
+        _record(params, time.perf_counter(), {}, response)
+        yield response.choices[0].message.content or ""
+        return
+
+    if not cache.bypass:
+        cache.stats['misses'] += 1
+    info = {}
+    started = time.perf_counter()
+    parts = []
+    usage = None
+    finish_reason = None
+    response_id = 'stream'
+    try:
+        # The concurrency slot is held until the stream is consumed (or closed)
+        stream = _create({**params, 'stream': True, 'stream_options': {'include_usage': True}}, info, hold_slot=True)
+        for chunk in stream:
+            response_id = getattr(chunk, 'id', None) or response_id
+            if chunk.usage is not None:
+                usage = chunk.usage
+            for choice in chunk.choices:
+                finish_reason = choice.finish_reason or finish_reason
+                if choice.delta.content:
+                    parts.append(choice.delta.content)
+                    yield choice.delta.content
+    except Exception as e:
+        _record(params, started, info, error=e)
+        raise
+    finally:
+        slot = info.pop('slot', None)
+        if slot is not None:
+            slot.release()
+
+    response = ChatCompletion.model_validate({
+        'id': response_id,
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': params.get('model'),
+        'choices': [{'index': 0, 'finish_reason': finish_reason or 'stop',
+                     'message': {'role': 'assistant', 'content': "".join(parts)}}],
+        'usage': usage.model_dump() if usage is not None else None
+    })
+    if usage is not None:
+        scheduler.settle(info['estimate'], usage.total_tokens)
+    if not cache.bypass:
+        cache.put(key, response.model_dump_json())
+    _record(params, started, info, response)
+
+
+def close():
+    """Close pooled connections"""
+    global _client
+    with _lock:
+        if _client is not None:
+            _client.close()
+            _client = None
@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import config
+from sqlite_store import open_database
+
+CACHE_PATH = config.get("LLM_CACHE_PATH", os.path.join(".cim_cache", "llm_cache.sqlite3"))
+CACHE_MAX_BYTES = config.get_int("LLM_CACHE_MAX_BYTES", 256 * 1024 * 1024)
+CACHE_MAX_AGE_DAYS = config.get_float("LLM_CACHE_MAX_AGE_DAYS", 30)
+CACHE_BYPASS = config.get_bool("LLM_CACHE_BYPASS")
+
+
+class _InFlight:
+    """A request currently being computed that other callers can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.payload = None
+        self.error = None
+
+
+class ResponseCache:
+    """
+    Content-addressed on-disk cache for chat completion responses.
+
+    Entries are keyed on a hash of the full request (model, messages and
+    parameters) and stored in SQLite. Entries older than ``max_age_days``
+    are dropped and the least recently used ones are evicted once the
+    cache grows past ``max_bytes``. Identical requests issued concurrently
+    are coalesced onto a single upstream call.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, max_bytes: int = CACHE_MAX_BYTES,
+                 max_age_days: float = CACHE_MAX_AGE_DAYS, bypass: bool = CACHE_BYPASS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 86400
+        self.bypass = bypass
+        self.stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'evictions': 0}
+        self._conn = None
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, _InFlight] = {}
+
+    @staticmethod
+    def make_key(params: Dict[str, Any]) -> str:
+        blob = json.dumps(params, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = open_database(self.path, [
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, payload TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created REAL NOT NULL, last_used REAL NOT NULL)",
+                "CREATE INDEX IF NOT EXISTS responses_last_used ON responses(last_used)",
+            ])
+        return self._conn
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT payload, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.max_age:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                conn.commit()
+                self.stats['evictions'] += 1
+                return None
+            conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            conn.commit()
+            return row[0]
+
+    def put(self, key: str, payload: str):
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, payload, size, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, payload, len(payload.encode("utf-8")), now, now)
+            )
+            self._evict(conn, now)
+            conn.commit()
+
+    def _evict(self, conn, now):
+        """Drop expired entries, then least recently used ones until under max_bytes"""
+        self.stats['evictions'] += conn.execute(
+            "DELETE FROM responses WHERE created < ?", (now - self.max_age,)
+        ).rowcount
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall():
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.stats['evictions'] += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM responses")
+            conn.commit()
+
+    def fetch(self, params: Dict[str, Any], compute: Callable[[], str]) -> str:
+        """Return the cached payload for ``params``, calling ``compute`` on a miss"""
+        if self.bypass:
+            return compute()
+
+        key = self.make_key(params)
+        payload = self.get(key)
+        if payload is not None:
+            self.stats['hits'] += 1
+            return payload
+
+        with self._lock:
+            pending = self._inflight.get(key)
+            owner = pending is None
+            if owner:
+                pending = self._inflight[key] = _InFlight()
+
+        if not owner:
+            self.stats['coalesced'] += 1
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.payload
+
+        self.stats['misses'] += 1
+        try:
+            pending.payload = compute()
+            self.put(key, pending.payload)
+            return pending.payload
+        except Exception as e:
+            pending.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            pending.done.set()
+
+
+cache = ResponseCache()
@@ -1,22 +1,58 @@
 import click
-from rich.console import Console
-from rich.progress import Progress, SpinnerColumn, TextColumn
-from rich.panel import Panel
 
-from ingestion import ingest_file
-from parsing import parse_sections
-from summarization import summarize_sections, format_summary, process_for_presentation
-from ppt_generator import generate_ppt
+# Pipeline modules (and through them openai, PyPDF2, python-pptx) and rich
+# are imported inside the commands so `--help` and argument errors return
+# without paying for them.
 
-console = Console()
+_console = None
 
-@click.command()
+def get_console():
+    global _console
+    if _console is None:
+        from rich.console import Console
+        _console = Console()
+    return _console
+
+class DefaultGroup(click.Group):
+    """Click group that falls back to the `run` command when no subcommand is given"""
+
+    def parse_args(self, ctx, args):
+        if not args or (args[0] not in self.commands and args[0] not in ctx.help_option_names):
+            args = ['run'] + list(args)
+        return super().parse_args(ctx, args)
+
+@click.group(cls=DefaultGroup)
+def main():
+    """CIM Summarizer & Mini Deck Generator"""
+
+@main.command()
 @click.option('--input', prompt='📄 Path to CIM file (PDF or TXT)', help='Input CIM file path')
 @click.option('--summary', prompt='📝 Output path for executive summary (e.g., summary.md)', help='Output summary file path')
 @click.option('--ppt', prompt='📊 Output path for PowerPoint deck (e.g., deck.pptx)', help='Output PowerPoint file path')
-def main(input, summary, ppt):
+@click.option('--stream', is_flag=True, help='Write and print the executive summary as it is generated')
+@click.option('--no-cache', is_flag=True, help='Bypass the LLM response cache, stage checkpoints and near-duplicate reuse')
+@click.option('--metrics-out', help='Write a run report (JSON, or Prometheus text for *.prom)')
+def run(input, summary, ppt, stream, no_cache, metrics_out):
+    """Summarize one CIM into an executive summary and a PowerPoint deck"""
+    from rich.progress import Progress, SpinnerColumn, TextColumn
+    from rich.panel import Panel
+
+    from pipeline import PipelineRun
+    from checkpoints import checkpoints
+    from near_duplicates import near_duplicates
+    from llm_cache import cache
+    from metrics import metrics
+
+    console = get_console()
+    cache.bypass = cache.bypass or no_cache
+    checkpoints.bypass = checkpoints.bypass or no_cache
+    near_duplicates.bypass = near_duplicates.bypass or no_cache
     console.print(Panel.fit("[bold cyan]CIM Summarizer & Mini Deck Generator[/bold cyan]\n[green]by Hopkins Coding Challenge[/green]", border_style="cyan"))
 
+    pipeline = PipelineRun(input)
+    def reused(stage):
+        return " [dim](reused checkpoint)[/dim]" if pipeline.reused.get(stage) else ""
+
     with Progress(
         SpinnerColumn(style="magenta"),
         TextColumn("[progress.description]{task.description}"),
@@ -25,41 +61,142 @@ def main(input, summary, ppt):
     ) as progress:
         task = progress.add_task("[yellow]Ingesting file...", start=False)
         progress.start_task(task)
-        pdf_data = ingest_file(input)
-        progress.update(task, description="[green]File ingested successfully!")
+        pipeline.result('ingest')
+        progress.update(task, description="[green]File ingested successfully!" + reused('ingest'))
         progress.stop_task(task)
 
         task = progress.add_task("[yellow]Parsing sections...", start=False)
         progress.start_task(task)
-        parsed_data = parse_sections(pdf_data)
-        progress.update(task, description="[green]Sections parsed!")
+        parsed_data = pipeline.result('parse') if stream else pipeline.start_overlapped()
+        progress.update(task, description=f"[green]Sections parsed! ({parsed_data['sectioning']['llm_share']:.0%} of text sent to the LLM)" + reused('parse'))
         progress.stop_task(task)
 
-        task = progress.add_task("[yellow]Summarizing sections...", start=False)
-        progress.start_task(task)
-        summary_dict = summarize_sections(parsed_data)
-        progress.update(task, description="[green]Sections summarized!")
-        progress.stop_task(task)
+        if stream:
+            def echo(text):
+                console.file.write(text)
+                console.file.flush()
+            progress.stop()
+            console.rule("[cyan]Executive summary")
+            pipeline.write_summary(summary, stream=True, echo=echo)
+            console.rule(f"[green]Saved to [bold]{summary}[/bold]" + reused('summarize'))
+            progress.start()
+        else:
+            task = progress.add_task("[yellow]Summarizing sections...", start=False)
+            progress.start_task(task)
+            pipeline.result('summarize')
+            progress.update(task, description="[green]Sections summarized!" + reused('summarize'))
+            progress.stop_task(task)
 
-        task = progress.add_task("[yellow]Writing executive summary...", start=False)
-        progress.start_task(task)
-        formatted_summary = format_summary(summary_dict, parsed_data)
-        with open(summary, 'w', encoding='utf-8') as f:
-            f.write(formatted_summary)
-        progress.update(task, description=f"[green]Executive summary saved to [bold]{summary}[/bold]")
-        progress.stop_task(task)
+            task = progress.add_task("[yellow]Writing executive summary...", start=False)
+            progress.start_task(task)
+            pipeline.write_summary(summary)
+            progress.update(task, description=f"[green]Executive summary saved to [bold]{summary}[/bold]")
+            progress.stop_task(task)
 
         task = progress.add_task("[yellow]Generating PowerPoint deck...", start=False)
         progress.start_task(task)
-        presentation_data = process_for_presentation(parsed_data)
-        import json
-        with open('pptx_data.json', 'w', encoding='utf-8') as f:
-            json.dump(presentation_data, f, indent=2)
-        generate_ppt(presentation_data, ppt)
+        pipeline.render(ppt, 'pptx_data.json')
         progress.update(task, description=f"[green]PowerPoint deck saved to [bold]{ppt}[/bold]")
         progress.stop_task(task)
 
+    if not cache.bypass:
+        console.print(f"[dim]LLM cache: {cache.stats['hits']} hits, {cache.stats['misses']} misses, {cache.stats['coalesced']} coalesced[/dim]")
+    if metrics_out:
+        metrics.write(metrics_out)
+        console.print(f"[dim]Run report saved to {metrics_out}[/dim]")
+
     console.print(Panel.fit("[bold green]:sparkles: All done! :sparkles:[/bold green]\n\n[cyan]Thank you for using the CIM Summarizer.[/cyan]", border_style="green"))
 
+@main.command()
+@click.argument('source')
+@click.option('--output-dir', required=True, help='Directory to write outputs to, mirroring the input tree')
+@click.option('--workers', default=4, show_default=True, help='Number of CIMs processed at the same time')
+@click.option('--llm-concurrency', type=int, help='Global cap on in-flight LLM requests (default: LLM_MAX_CONCURRENCY or 8)')
+@click.option('--no-cache', is_flag=True, help='Bypass the LLM response cache, stage checkpoints and near-duplicate reuse')
+@click.option('--metrics-out', help='Write a run report (JSON, or Prometheus text for *.prom)')
+def batch(source, output_dir, workers, llm_concurrency, no_cache, metrics_out):
+    """Process every CIM in a directory or glob (e.g. "cims/**/*.pdf")"""
+    from rich.panel import Panel
+
+    from batch import run_batch
+    from checkpoints import checkpoints
+    from near_duplicates import near_duplicates
+    from llm import set_llm_concurrency
+    from llm_cache import cache
+    from metrics import metrics
+
+    console = get_console()
+    cache.bypass = cache.bypass or no_cache
+    checkpoints.bypass = checkpoints.bypass or no_cache
+    near_duplicates.bypass = near_duplicates.bypass or no_cache
+    if llm_concurrency:
+        set_llm_concurrency(llm_concurrency)
+
+    styles = {'done': 'green', 'failed': 'red', 'skipped': 'dim'}
+    def report(key, status, detail):
+        console.print(f"[{styles[status]}]{status:>7}[/{styles[status]}] {key}" + (f" [dim]({detail})[/dim]" if status == 'failed' else ""))
+
+    counts = run_batch(source, output_dir, workers=workers, on_result=report)
+    console.print(Panel.fit(
+        f"[bold]{counts['done']}[/bold] done, [bold]{counts['failed']}[/bold] failed, [bold]{counts['skipped']}[/bold] already complete\n"
+        f"[cyan]Manifest: {output_dir}/manifest.json[/cyan]",
+        border_style="green" if not counts['failed'] else "yellow"
+    ))
+    if metrics_out:
+        metrics.write(metrics_out)
+
+@main.command()
+@click.argument('source')
+@click.option('--ppt', help='Output deck path when SOURCE is a single JSON file')
+@click.option('--output-dir', help='Write decks to a tree under this directory instead of next to each JSON file')
+@click.option('--template', help='.pptx to build decks on (default: PPT_TEMPLATE or a blank deck)')
+@click.option('--workers', type=int, help='Render processes (default: RENDER_WORKERS)')
+def render(source, ppt, output_dir, template, workers):
+    """Rebuild decks from saved presentation data (pptx_data.json files) without calling the LLM"""
+    from rich.panel import Panel
+
+    from batch import render_jobs
+    from ppt_generator import render_decks, RENDER_WORKERS
+
+    console = get_console()
+    jobs = render_jobs(source, output_dir)
+    if ppt:
+        if len(jobs) != 1:
+            raise click.UsageError("--ppt needs SOURCE to be a single JSON file")
+        jobs = [(jobs[0][0], ppt)]
+    if not jobs:
+        raise click.UsageError(f"No presentation data found in {source}")
+
+    styles = {'done': 'green', 'failed': 'red'}
+    def report(data_path, status, detail):
+        console.print(f"[{styles[status]}]{status:>7}[/{styles[status]}] {data_path} [dim]({detail})[/dim]")
+
+    counts = render_decks(jobs, template, workers or RENDER_WORKERS, on_result=report)
+    console.print(Panel.fit(
+        f"[bold]{counts['done']}[/bold] decks rendered, [bold]{counts['failed']}[/bold] failed",
+        border_style="green" if not counts['failed'] else "yellow"
+    ))
+
+@main.command()
+@click.option('--host', help='Interface to listen on (default: SERVER_HOST or 127.0.0.1)')
+@click.option('--port', type=int, help='Port to listen on (default: SERVER_PORT or 8000)')
+@click.option('--workers', type=int, help='CIMs processed at the same time (default: SERVER_WORKERS or 2)')
+@click.option('--queue-size', type=int, help='Uploads that may wait before new ones get 503 (default: SERVER_QUEUE_SIZE or 16)')
+def serve(host, port, workers, queue_size):
+    """Run the HTTP service: upload CIMs, poll job status and download the outputs"""
+    import asyncio
+
+    import server
+
+    options = {}
+    if workers:
+        options['workers'] = workers
+    if queue_size:
+        options['queue_size'] = queue_size
+    try:
+        asyncio.run(server.serve(host or server.SERVER_HOST, port or server.SERVER_PORT, **options))
+    except KeyboardInterrupt:
+        pass
+
 if __name__ == '__main__':
     main()
\ No newline at end of file
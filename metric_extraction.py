@@ -0,0 +1,228 @@
+import re
+from typing import Any, Dict, List, Tuple
+
+METRIC_KEYS = ['revenue', 'revenue_growth', 'ebitda', 'ebitda_margin', 'market_size']
+HIGH_CONFIDENCE = 0.8
+
+# Keyword patterns per metric, tried in this order at every anchor word so
+# "ebitda margin" wins over "ebitda" and "revenue growth" over "revenue".
+# Percentage metrics only accept a % value and money metrics an amount.
+# Matching runs on lower-cased text.
+METRIC_KEYWORDS = {
+    'revenue_growth': (r"(?:revenue|sales)\s+(?:growth|grew|increased|cagr)", 'percent'),
+    'ebitda_margin': (r"ebitda\s+margins?", 'percent'),
+    'market_size': (r"addressable\s+market|market\s+size|tam\b", 'money'),
+    'ebitda': (r"ebitda", 'money'),
+    'revenue': (r"revenues?|sales", 'money'),
+}
+
+# Revenue keywords that name an expense line ("sales and marketing",
+# "cost of sales") are not revenue. Other nouns after the keyword ("sales
+# team", "revenue per employee") make the figure an unreliable revenue
+# reading, so it gets no fiscal-year bonus. "sales" alone is often a
+# segment or region rather than total revenue, so it scores lower than
+# "revenue" and never counts as confident on its own.
+EXPENSE_BEFORE_RE = re.compile(r"costs?\s+of\s+(?:goods\s+)?$")
+EXPENSE_AFTER_RE = re.compile(r"\s*(?:and|&)\s*marketing|\s+(?:marketing|expenses?|costs?|commissions?)\b")
+NON_REVENUE_AFTER_RE = re.compile(
+    r"\s+(?:force|teams?|staff|people|personnel|headcount|reps?|representatives?|cycles?|pipeline|channels?"
+    r"|offices?|tax(?:es)?|per|mix|volumes?|recognition)\b"
+)
+SALES_PENALTY = 0.25
+
+# Cheap literal scan for the words every keyword starts with; the full
+# keyword pattern is only tried where one of them occurs.
+ANCHOR_RE = re.compile(r"(?:revenue|sales|ebitda|addressable|market|tam)")
+KEYWORD_RE = re.compile(
+    "|".join(f"(?P<{name}>{pattern})" for name, (pattern, _) in METRIC_KEYWORDS.items())
+)
+DIGIT_RE = re.compile(r"\d")
+_NUMBER = r"\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?"
+_UNIT = r"billion|million|thousand|bn|mm|mn|b|m|k"
+# An amount needs a currency marker or a unit; bare numbers are mostly
+# years, counts or table references.
+MONEY_RE = re.compile(
+    r"(?:(?P<currency>\$|usd\s*)(?P<number>" + _NUMBER + r")(?:\s*(?P<unit>" + _UNIT + r"))?"
+    r"|\b(?P<bare_number>" + _NUMBER + r")\s*(?P<bare_unit>" + _UNIT + r"))\b(?!\s*%)"
+)
+PERCENT_RE = re.compile(r"(?P<number>-?\d+(?:\.\d+)?)\s*(?:%|percent\b)")
+YEAR_RE = re.compile(
+    r"\b(?:(?P<fy>fy|fiscal(?:\s+year)?)\s*'?(?P<short>\d{2}(?!\d))|(?P<fy_long>fy|fiscal(?:\s+year)?)?\s*"
+    r"(?P<year>(?:19|20)\d{2})(?P<suffix>[aepf]\b)?)",
+    re.IGNORECASE
+)
+
+UNIT_SCALE = {
+    'billion': 1e9, 'bn': 1e9, 'b': 1e9,
+    'million': 1e6, 'mm': 1e6, 'mn': 1e6, 'm': 1e6,
+    'thousand': 1e3, 'k': 1e3,
+}
+WINDOW_CHARS = 120
+
+
+def parse_year(match) -> str:
+    """Normalise FY23 / fiscal 2023 / 2023E style labels to 'FY2023' / '2023E'"""
+    if match.group('short'):
+        return f"FY20{match.group('short')}"
+    label = match.group('year')
+    if match.group('fy_long'):
+        label = f"FY{label}"
+    if match.group('suffix'):
+        label += match.group('suffix').upper()
+    return label
+
+
+def format_amount(value: float) -> str:
+    """Format a USD amount as $1.2B / $350M / $12,500"""
+    if value >= 1e9:
+        return "$" + f"{value / 1e9:,.2f}".rstrip("0").rstrip(".") + "B"
+    if value >= 1e6:
+        return "$" + f"{value / 1e6:,.1f}".rstrip("0").rstrip(".") + "M"
+    return f"${value:,.0f}"
+
+
+def _value_in_window(kind: str, window: str):
+    """
+    Return (value, display, offset, has_unit) for the first value of
+    ``kind`` in a lower-cased window, or None.
+    """
+    if kind == 'percent':
+        match = PERCENT_RE.search(window)
+        if not match:
+            return None
+        value = float(match.group('number'))
+        return value, f"{match.group('number')}%", match.start(), True
+
+    match = MONEY_RE.search(window)
+    if not match:
+        return None
+    number = match.group('number') or match.group('bare_number')
+    unit = match.group('unit') or match.group('bare_unit') or ''
+    value = float(number.replace(',', '')) * UNIT_SCALE.get(unit, 1.0)
+    return value, format_amount(value), match.start(), bool(unit)
+
+
+def find_metric_candidates(text: str) -> List[Dict[str, Any]]:
+    """
+    Scan the text once for metric keywords and score the value that follows
+    each of them. Every candidate carries the normalised numeric value, a
+    display string, the fiscal-year label (if any) and a confidence in [0, 1].
+    """
+    lowered = text.lower()
+    if len(lowered) != len(text):
+        # A few characters (e.g. 'İ') lower-case to two; keep offsets aligned.
+        lowered = "".join(c.lower() if len(c.lower()) == 1 else c for c in text)
+    candidates = []
+    for anchor in ANCHOR_RE.finditer(lowered):
+        start = anchor.start()
+        if start and lowered[start - 1].isalnum():
+            continue
+        keyword = KEYWORD_RE.match(lowered, start)
+        if keyword is None:
+            continue
+        metric = keyword.lastgroup
+        kind = METRIC_KEYWORDS[metric][1]
+        qualified = False
+        if metric in ('revenue', 'revenue_growth'):
+            after = lowered[keyword.end():keyword.end() + 30]
+            if EXPENSE_AFTER_RE.match(after) or EXPENSE_BEFORE_RE.search(lowered, max(0, start - 20), start):
+                continue
+            qualified = NON_REVENUE_AFTER_RE.match(after) is not None
+        window = lowered[keyword.end():keyword.end() + WINDOW_CHARS]
+        if not DIGIT_RE.search(window):
+            continue
+        found = _value_in_window(kind, window)
+        if found is None:
+            continue
+        value, display, offset, has_unit = found
+
+        if kind == 'percent' and not (-100 <= value <= 1000 if metric == 'revenue_growth' else 0 <= value <= 100):
+            continue
+        if kind == 'money' and value <= 0:
+            continue
+
+        value_position = keyword.end() + offset
+        # Look for the fiscal-year label around the value, without running
+        # into the next line or sentence.
+        start = max(0, keyword.start() - 40)
+        start = max(start, lowered.rfind("\n", start, keyword.start()) + 1,
+                    lowered.rfind(". ", start, keyword.start()) + 2)
+        end = value_position + 40
+        for stop in (lowered.find("\n", value_position, end), lowered.find(". ", value_position, end)):
+            if stop != -1:
+                end = min(end, stop)
+        years = YEAR_RE.finditer(text, start, end)
+        year = min(years, key=lambda match: abs(match.start() - value_position), default=None)
+
+        confidence = 0.5
+        if lowered.startswith("sales", keyword.start()):
+            confidence -= SALES_PENALTY
+        if has_unit:
+            confidence += 0.15
+        if year and not qualified:
+            confidence += 0.15
+        if offset <= 30:
+            confidence += 0.2
+        elif offset > 80:
+            confidence -= 0.1
+
+        candidates.append({
+            'metric': metric,
+            'value': value,
+            'display': display,
+            'year': parse_year(year) if year else None,
+            'confidence': round(min(confidence, 1.0), 2),
+            'position': keyword.start()
+        })
+    return candidates
+
+
+def _year_rank(label):
+    """Rank actuals above estimates/projections, then later years first"""
+    digits = re.sub(r"\D", "", label or "")
+    actual = not (label and label[-1] in "EPF")
+    return (actual, int(digits) if digits else 0)
+
+
+def extract_metrics(text: str) -> Tuple[Dict[str, Any], Dict[str, float]]:
+    """
+    Pick the best candidate for each metric.
+
+    Returns ``(metrics, confidence)``. Values use the same "2024: $100M"
+    style as the LLM extractor; missing metrics are None with confidence 0.
+    """
+    best = {}
+    for candidate in find_metric_candidates(text):
+        metric = candidate['metric']
+        key = (candidate['confidence'], _year_rank(candidate['year']), -candidate['position'])
+        if metric not in best or key > best[metric][0]:
+            best[metric] = (key, candidate)
+
+    metrics = {}
+    confidence = {}
+    for metric in METRIC_KEYS:
+        if metric in best:
+            candidate = best[metric][1]
+            prefix = f"{candidate['year']}: " if candidate['year'] else ""
+            metrics[metric] = prefix + candidate['display']
+            confidence[metric] = candidate['confidence']
+        else:
+            metrics[metric] = None
+            confidence[metric] = 0.0
+    return metrics, confidence
+
+
+def is_confident(confidence: Dict[str, float], keys=('revenue', 'revenue_growth', 'ebitda', 'ebitda_margin'),
+                 threshold: float = HIGH_CONFIDENCE) -> bool:
+    """True when every metric in ``keys`` was found with at least ``threshold`` confidence"""
+    return all(confidence.get(key, 0.0) >= threshold for key in keys)
+
+
+def fill_missing(metrics: Dict[str, Any], fallback: Dict[str, Any], confidence: Dict[str, float],
+                 threshold: float = HIGH_CONFIDENCE) -> Dict[str, Any]:
+    """Fill metrics the model left empty with confident regex results"""
+    merged = dict(metrics or {})
+    for key, value in fallback.items():
+        if not merged.get(key) and value and confidence.get(key, 0.0) >= threshold:
+            merged[key] = value
+    return merged
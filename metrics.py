@@ -0,0 +1,256 @@
+import contextvars
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+_current_stage = contextvars.ContextVar("pipeline_stage", default=None)
+_failures = contextvars.ContextVar("stage_failures", default=None)
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _labels(**labels) -> str:
+    parts = [f'{key}="{str(value)}"'.replace("\n", " ") for key, value in labels.items() if value is not None]
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class RunMetrics:
+    """
+    Collects per-stage wall time and per-LLM-call latency, token usage,
+    cache hits and retries for one process run.
+
+    LLM calls are attributed to the pipeline stage active when they were
+    made (the stage travels in a context variable, so calls from the
+    fan-out thread pools are attributed correctly). Totals are kept as
+    running counters; the per-record detail (and the latency percentiles)
+    cover at most the last ``max_records`` stages and calls, so a
+    long-running process does not grow without bound.
+    """
+
+    def __init__(self, max_records: Optional[int] = None):
+        self._lock = threading.Lock()
+        self.max_records = max_records
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self._start = time.perf_counter()
+            self.stages = deque(maxlen=self.max_records)
+            self.llm_calls = deque(maxlen=self.max_records)
+            self._latencies = deque(maxlen=self.max_records)
+            self.failures: Dict[str, int] = {}
+            self.stage_seconds: Dict[str, float] = {}
+            self.by_stage: Dict[str, Dict[str, Any]] = {}
+            self.totals = {'calls': 0, 'upstream_calls': 0, 'errors': 0, 'retries': 0,
+                           'prompt_tokens': 0, 'completion_tokens': 0, 'upstream_seconds': 0.0}
+
+    def set_max_records(self, max_records: Optional[int]):
+        """Keep detail for only the last ``max_records`` stages and calls (None: all of them)"""
+        with self._lock:
+            self.max_records = max_records
+            self.stages = deque(self.stages, maxlen=max_records)
+            self.llm_calls = deque(self.llm_calls, maxlen=max_records)
+            self._latencies = deque(self._latencies, maxlen=max_records)
+
+    @contextmanager
+    def stage(self, name: str, **labels):
+        """Time a pipeline stage; nested LLM calls are tagged with its name"""
+        token = _current_stage.set(name)
+        start = time.perf_counter()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            _current_stage.reset(token)
+            seconds = round(time.perf_counter() - start, 4)
+            with self._lock:
+                self.stage_seconds[name] = round(self.stage_seconds.get(name, 0.0) + seconds, 4)
+                self.stages.append({
+                    'stage': name,
+                    'seconds': seconds,
+                    'error': error,
+                    **labels
+                })
+
+    @contextmanager
+    def attribute(self, name: str):
+        """Attribute LLM calls made in this context to ``name`` without timing a stage"""
+        token = _current_stage.set(name)
+        try:
+            yield
+        finally:
+            _current_stage.reset(token)
+
+    @contextmanager
+    def collect_failures(self, into: Dict[str, List[str]]):
+        """
+        Collect failures reported in this context, and in tasks submitted
+        from it, into ``into`` keyed by the stage they were attributed to
+        """
+        token = _failures.set(into)
+        try:
+            yield into
+        finally:
+            _failures.reset(token)
+
+    def record_failure(self, detail: str, stage: str = None):
+        """Note that ``stage`` (default: the current one) degraded: a placeholder or default stands in for a failed step"""
+        stage = stage or _current_stage.get() or 'unstaged'
+        with self._lock:
+            self.failures[stage] = self.failures.get(stage, 0) + 1
+            collector = _failures.get()
+            if collector is not None:
+                collector.setdefault(stage, []).append(detail)
+
+    def record_llm_call(self, model: str, seconds: float, prompt_tokens: int = 0, completion_tokens: int = 0,
+                        cached: bool = False, retries: int = 0, error: str = None):
+        stage = _current_stage.get()
+        seconds = round(seconds, 4)
+        with self._lock:
+            self.llm_calls.append({
+                'stage': stage,
+                'model': model,
+                'seconds': seconds,
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'cached': cached,
+                'retries': retries,
+                'error': error
+            })
+            totals = self.totals
+            totals['calls'] += 1
+            totals['errors'] += int(bool(error))
+            totals['retries'] += retries
+            entry = self.by_stage.setdefault(stage or 'unstaged', {
+                'calls': 0, 'cached_calls': 0, 'prompt_tokens': 0, 'completion_tokens': 0, 'seconds': 0.0
+            })
+            entry['calls'] += 1
+            entry['cached_calls'] += int(cached)
+            entry['seconds'] = round(entry['seconds'] + seconds, 4)
+            if not cached:
+                totals['upstream_calls'] += 1
+                totals['upstream_seconds'] = round(totals['upstream_seconds'] + seconds, 4)
+                totals['prompt_tokens'] += prompt_tokens
+                totals['completion_tokens'] += completion_tokens
+                entry['prompt_tokens'] += prompt_tokens
+                entry['completion_tokens'] += completion_tokens
+                if not error:
+                    self._latencies.append(seconds)
+
+    def report(self) -> Dict[str, Any]:
+        """Machine-readable run report"""
+        from checkpoints import checkpoints
+        from llm_cache import cache
+        from near_duplicates import near_duplicates
+        from page_cache import page_cache
+        import tokens
+
+        with self._lock:
+            stages = list(self.stages)
+            calls = list(self.llm_calls)
+            latencies = list(self._latencies)
+            failures = dict(self.failures)
+            stage_seconds = dict(self.stage_seconds)
+            by_stage = {name: dict(entry) for name, entry in self.by_stage.items()}
+            totals = dict(self.totals)
+
+        return {
+            'started': self.started,
+            'wall_seconds': round(time.perf_counter() - self._start, 4),
+            'stages': stages,
+            'stage_seconds': stage_seconds,
+            'failures': failures,
+            'llm': {
+                'calls': totals['calls'],
+                'upstream_calls': totals['upstream_calls'],
+                'cached_calls': totals['calls'] - totals['upstream_calls'],
+                'errors': totals['errors'],
+                'retries': totals['retries'],
+                'prompt_tokens': totals['prompt_tokens'],
+                'completion_tokens': totals['completion_tokens'],
+                'upstream_seconds': totals['upstream_seconds'],
+                'latency_p50': _percentile(latencies, 0.5),
+                'latency_p95': _percentile(latencies, 0.95),
+                'by_stage': by_stage,
+                'calls_detail': calls
+            },
+            'cache': {
+                'llm': dict(cache.stats),
+                'pages': dict(page_cache.stats),
+                'checkpoints': dict(checkpoints.stats),
+                'near_duplicates': dict(near_duplicates.stats)
+            },
+            'prompt_budget': dict(tokens.stats)
+        }
+
+    def to_prometheus(self) -> str:
+        """Render the report in the Prometheus text exposition format"""
+        report = self.report()
+        llm = report['llm']
+        lines = [
+            "# HELP cim_run_seconds Wall time of the whole run",
+            "# TYPE cim_run_seconds gauge",
+            f"cim_run_seconds {report['wall_seconds']}",
+            "# HELP cim_stage_seconds Wall time per pipeline stage",
+            "# TYPE cim_stage_seconds gauge",
+        ]
+        lines += [f"cim_stage_seconds{_labels(stage=name)} {value}" for name, value in report['stage_seconds'].items()]
+
+        lines += [
+            "# HELP cim_llm_calls_total LLM calls by stage and cache outcome",
+            "# TYPE cim_llm_calls_total counter",
+        ]
+        for name, entry in llm['by_stage'].items():
+            lines.append(f"cim_llm_calls_total{_labels(stage=name, cached='false')} {entry['calls'] - entry['cached_calls']}")
+            lines.append(f"cim_llm_calls_total{_labels(stage=name, cached='true')} {entry['cached_calls']}")
+        lines += [
+            "# HELP cim_llm_tokens_total Billed tokens by stage",
+            "# TYPE cim_llm_tokens_total counter",
+        ]
+        for name, entry in llm['by_stage'].items():
+            lines.append(f"cim_llm_tokens_total{_labels(stage=name, kind='prompt')} {entry['prompt_tokens']}")
+            lines.append(f"cim_llm_tokens_total{_labels(stage=name, kind='completion')} {entry['completion_tokens']}")
+        lines += [
+            "# HELP cim_llm_call_seconds Latency of upstream LLM calls",
+            "# TYPE cim_llm_call_seconds summary",
+            f"cim_llm_call_seconds{_labels(quantile='0.5')} {llm['latency_p50']}",
+            f"cim_llm_call_seconds{_labels(quantile='0.95')} {llm['latency_p95']}",
+            f"cim_llm_call_seconds_sum {llm['upstream_seconds']}",
+            f"cim_llm_call_seconds_count {llm['upstream_calls']}",
+            "# HELP cim_llm_retries_total Retried LLM requests",
+            "# TYPE cim_llm_retries_total counter",
+            f"cim_llm_retries_total {llm['retries']}",
+            "# HELP cim_llm_errors_total Failed LLM calls",
+            "# TYPE cim_llm_errors_total counter",
+            f"cim_llm_errors_total {llm['errors']}",
+            "# HELP cim_cache_events_total Cache lookups by cache and outcome",
+            "# TYPE cim_cache_events_total counter",
+        ]
+        for cache_name, stats in report['cache'].items():
+            for outcome, value in stats.items():
+                lines.append(f"cim_cache_events_total{_labels(cache=cache_name, outcome=outcome)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str):
+        """Write the report to ``path``: Prometheus text for .prom files, JSON otherwise"""
+        with open(path, 'w', encoding='utf-8') as f:
+            if path.endswith('.prom'):
+                f.write(self.to_prometheus())
+            else:
+                json.dump(self.report(), f, indent=2)
+
+
+metrics = RunMetrics()
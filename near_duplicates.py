@@ -0,0 +1,256 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import config
+from llm import chat
+from sqlite_store import open_database
+from tokens import count_tokens
+
+NEAR_DUP_PATH = config.get("NEAR_DUP_PATH", os.path.join(".cim_cache", "near_duplicates.sqlite3"))
+NEAR_DUP_MAX_AGE_DAYS = config.get_float("NEAR_DUP_MAX_AGE_DAYS", 180)
+NEAR_DUP_BYPASS = config.get_bool("NEAR_DUP_BYPASS")
+# Jaccard similarity (over word shingles) at which only the differences are
+# sent to the model. A stored result is reused outright only when no line
+# changed beyond case and spacing and the similarity is also at least the
+# reuse threshold (below it, e.g. reordered lines, the text is sent again).
+NEAR_DUP_THRESHOLD = config.get_float("NEAR_DUP_THRESHOLD", 0.8)
+NEAR_DUP_REUSE_THRESHOLD = config.get_float("NEAR_DUP_REUSE_THRESHOLD", 1.0)
+
+SHINGLE_WORDS = 5
+NUM_PERM = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERM // BANDS
+MIN_INDEX_CHARS = 400
+MAX_CANDIDATES = 20
+# A diff bigger than this share of the text is sent as a normal request
+MAX_DIFF_SHARE = 0.5
+
+WORD_RE = re.compile(r"\w+")
+UNIT_RE = re.compile(r"\n+|(?<=[.!?])\s+")
+# One XOR mask per MinHash permutation, fixed so signatures are stable across runs
+MASKS = [int.from_bytes(hashlib.blake2b(str(i).encode(), digest_size=8).digest(), "big") for i in range(NUM_PERM)]
+
+UPDATE_PROMPT = """{instructions}
+
+The full text is not repeated here. It is a revised version of a text you already answered for. Your previous answer was:
+
+{previous}
+
+The new version differs from the earlier one as follows.
+
+Removed:
+{removed}
+
+Added:
+{added}
+
+Give your answer for the new version in exactly the same format as the previous answer, changing only what these differences affect."""
+
+
+def shingles(text: str) -> Set[str]:
+    """Word ``SHINGLE_WORDS``-grams of the lower-cased text"""
+    words = WORD_RE.findall(text.lower())
+    if len(words) < SHINGLE_WORDS:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def signature(items: Set[str]) -> List[int]:
+    """MinHash signature of a shingle set (one 64-bit hash XORed with a mask per permutation)"""
+    hashes = [int.from_bytes(hashlib.blake2b(item.encode("utf-8"), digest_size=8).digest(), "big")
+              for item in items]
+    if not hashes:
+        return [0] * NUM_PERM
+    return [min(map(mask.__xor__, hashes)) for mask in MASKS]
+
+
+def band_keys(sig: List[int]) -> List[str]:
+    """LSH bands: texts that share any band are compared exactly"""
+    keys = []
+    for band in range(BANDS):
+        rows = sig[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        keys.append(f"{band}:" + hashlib.blake2b(repr(rows).encode(), digest_size=8).hexdigest())
+    return keys
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def _units(text: str) -> List[str]:
+    return [unit.strip() for unit in UNIT_RE.split(text) if unit.strip()]
+
+
+def diff_units(old: str, new: str) -> Tuple[List[str], List[str]]:
+    """Lines/sentences ``(removed, added)`` between two versions, ignoring case and spacing"""
+    def normalize(unit):
+        return " ".join(unit.lower().split())
+    old_units, new_units = _units(old), _units(new)
+    old_keys = {normalize(unit) for unit in old_units}
+    new_keys = {normalize(unit) for unit in new_units}
+    removed = [unit for unit in old_units if normalize(unit) not in new_keys]
+    added = [unit for unit in new_units if normalize(unit) not in old_keys]
+    return removed, added
+
+
+def update_request(params: Dict[str, Any], text: str, previous: str,
+                   removed: List[str], added: List[str]) -> Dict[str, Any]:
+    """``params`` rewritten to send the previous answer and the differences instead of ``text``"""
+    messages = list(params['messages'])
+    instructions = messages[-1]['content'].replace(text, "").rstrip()
+    messages[-1] = {**messages[-1], 'content': UPDATE_PROMPT.format(
+        instructions=instructions,
+        previous=previous,
+        removed="\n".join(f"- {unit}" for unit in removed) or "(nothing)",
+        added="\n".join(f"+ {unit}" for unit in added) or "(nothing)"
+    )}
+    return {**params, 'messages': messages}
+
+
+class NearDuplicateIndex:
+    """
+    Persistent MinHash/LSH index of texts the model has already answered for.
+
+    CIMs from the same bank or sponsor repeat large blocks (risk factors,
+    disclaimers, market descriptions). Each answered text is stored with
+    its answer under a ``kind`` that pins the prompt. When a new text is
+    near-identical to a stored one, the stored answer is reused, or only
+    the changed lines are sent with the previous answer, instead of the
+    whole text. Candidates come from LSH bands over MinHash signatures and
+    are confirmed with exact shingle Jaccard. Entries unused for
+    ``max_age_days`` are pruned when the index opens.
+    """
+
+    def __init__(self, path: str = NEAR_DUP_PATH, max_age_days: float = NEAR_DUP_MAX_AGE_DAYS,
+                 bypass: bool = NEAR_DUP_BYPASS, threshold: float = NEAR_DUP_THRESHOLD,
+                 reuse_threshold: float = NEAR_DUP_REUSE_THRESHOLD):
+        self.path = path
+        self.max_age = max_age_days * 86400
+        self.bypass = bypass
+        self.threshold = threshold
+        self.reuse_threshold = reuse_threshold
+        self.stats = {'reused': 0, 'diffed': 0, 'full': 0}
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = open_database(self.path, [
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, kind TEXT NOT NULL, text TEXT NOT NULL, content TEXT NOT NULL, "
+                "last_used REAL NOT NULL)",
+                "CREATE TABLE IF NOT EXISTS bands (kind TEXT NOT NULL, band TEXT NOT NULL, key TEXT NOT NULL)",
+                "CREATE INDEX IF NOT EXISTS bands_lookup ON bands(kind, band)",
+            ], prune=[
+                "DELETE FROM bands WHERE key IN (SELECT key FROM entries WHERE last_used < ?)",
+                "DELETE FROM entries WHERE last_used < ?",
+            ], max_age=self.max_age)
+        return self._conn
+
+    @staticmethod
+    def make_kind(kind: str, text: str, params: Dict[str, Any]) -> str:
+        """Pin ``kind`` to the request with ``text`` taken out (model, instructions, limits)"""
+        messages = list(params['messages'])
+        messages[-1] = {**messages[-1], 'content': messages[-1]['content'].replace(text, "")}
+        blob = json.dumps({**params, 'messages': messages, 'kind': kind}, sort_keys=True, default=str)
+        return f"{kind}:" + hashlib.sha256(blob.encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def _entry_key(kind: str, text: str) -> str:
+        return hashlib.sha256(f"{kind}\0{text}".encode("utf-8")).hexdigest()
+
+    def lookup(self, kind: str, text: str) -> Optional[Tuple[float, str, str]]:
+        """Most similar stored ``(similarity, text, content)`` of ``kind`` at or above the diff threshold"""
+        items = shingles(text)
+        bands = band_keys(signature(items))
+        with self._lock:
+            conn = self._connect()
+            placeholders = ",".join("?" * len(bands))
+            rows = conn.execute(
+                f"SELECT key, text, content FROM entries WHERE key IN "
+                f"(SELECT DISTINCT key FROM bands WHERE kind = ? AND band IN ({placeholders})) "
+                f"ORDER BY last_used DESC LIMIT ?", [kind, *bands, MAX_CANDIDATES]
+            ).fetchall()
+        best = None
+        for key, stored_text, content in rows:
+            similarity = jaccard(items, shingles(stored_text))
+            if similarity >= self.threshold and (best is None or similarity > best[0]):
+                best = (similarity, key, stored_text, content)
+        if best is None:
+            return None
+        with self._lock:
+            conn = self._connect()
+            conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), best[1]))
+            conn.commit()
+        return best[0], best[2], best[3]
+
+    def add(self, kind: str, text: str, content: str):
+        if self.bypass or not content or len(text) < MIN_INDEX_CHARS:
+            return
+        key = self._entry_key(kind, text)
+        bands = band_keys(signature(shingles(text)))
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM bands WHERE key = ?", (key,))
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, kind, text, content, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, kind, text, content, time.time())
+            )
+            conn.executemany("INSERT INTO bands (kind, band, key) VALUES (?, ?, ?)",
+                             [(kind, band, key) for band in bands])
+            conn.commit()
+
+    def prepare(self, kind: str, text: str, params: Dict[str, Any]) -> Tuple[str, Optional[str], Optional[Dict[str, Any]]]:
+        """
+        Decide how to answer ``params`` (whose last message contains
+        ``text``). Returns ``(kind_key, content, request)``: a reusable
+        stored answer in ``content``, or the request to send (the original
+        or a diff update). Pass the answer to add() under ``kind_key``.
+        """
+        kind_key = self.make_kind(kind, text, params)
+        if self.bypass or len(text) < MIN_INDEX_CHARS:
+            self.stats['full'] += 1
+            return kind_key, None, params
+        match = self.lookup(kind_key, text)
+        if match is not None:
+            similarity, previous_text, previous = match
+            removed, added = diff_units(previous_text, text)
+            # Shingles drop signs and punctuation ("-5%" and "5%" look the
+            # same), so only the line diff can say nothing changed
+            if not (removed or added):
+                if similarity >= self.reuse_threshold:
+                    self.stats['reused'] += 1
+                    return kind_key, previous, None
+            elif count_tokens("\n".join(removed + added)) <= count_tokens(text) * MAX_DIFF_SHARE:
+                self.stats['diffed'] += 1
+                return kind_key, None, update_request(params, text, previous, removed, added)
+        self.stats['full'] += 1
+        return kind_key, None, params
+
+    def complete(self, kind: str, text: str, params: Dict[str, Any]) -> str:
+        """
+        Message content of ``chat(**params)``, reusing or updating the answer
+        for a near-identical ``text`` seen before
+        """
+        kind_key, content, request = self.prepare(kind, text, params)
+        if content is None:
+            content = chat(**request).choices[0].message.content or ""
+        self.add(kind_key, text, content)
+        return content
+
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM bands")
+            conn.execute("DELETE FROM entries")
+            conn.commit()
+
+
+near_duplicates = NearDuplicateIndex()
@@ -0,0 +1,134 @@
+import importlib.util
+import os
+import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Dict, List
+
+import config
+from metrics import metrics
+from page_cache import page_cache
+
+# pdf2image (which needs poppler) and pytesseract (which needs the tesseract
+# binary) are optional; without them suspect pages are reported but kept as-is.
+OCR_PACKAGES = ("pdf2image", "pytesseract")
+OCR_ENABLED = config.get_bool("OCR_ENABLED", True)
+OCR_DPI = config.get_int("OCR_DPI", 300)
+OCR_LANG = config.get("OCR_LANG", "eng")
+OCR_WORKERS = config.get_int("OCR_WORKERS", min(4, os.cpu_count() or 1))
+OCR_MIN_CHARS = 25
+OCR_MIN_WORD_RATIO = 0.5
+
+WORD_RE = re.compile(r"[A-Za-z]{2,}")
+GARBAGE_RE = re.compile(r"\(cid:\d+\)|�|[\x00-\x08\x0e-\x1f]")
+
+
+def needs_ocr(text: str) -> bool:
+    """
+    True for pages whose extracted text is empty or garbage: too few
+    characters, mostly unmapped glyphs (``(cid:NN)``, U+FFFD, control
+    characters), or too little of it made of actual words.
+    """
+    stripped = "".join(text.split())
+    if len(stripped) < OCR_MIN_CHARS:
+        return True
+    garbage = sum(len(match) for match in GARBAGE_RE.findall(text))
+    if garbage > len(stripped) * 0.2:
+        return True
+    word_chars = sum(len(word) for word in WORD_RE.findall(text))
+    return word_chars < len(stripped) * OCR_MIN_WORD_RATIO
+
+
+@lru_cache(maxsize=None)
+def missing_ocr_tools() -> List[str]:
+    """
+    Names of the OCR packages and binaries that are not installed, checked
+    once per process. A missing binary means OCR is unavailable rather than
+    a failure on every scanned page.
+    """
+    missing = [name for name in OCR_PACKAGES if importlib.util.find_spec(name) is None]
+    if not missing:
+        import pytesseract
+        binaries = [("poppler (pdftoppm)", "pdftoppm"), ("tesseract", pytesseract.pytesseract.tesseract_cmd)]
+        missing = [name for name, command in binaries if shutil.which(command) is None]
+    return missing
+
+
+def _ocr_page(args) -> str:
+    """Process pool worker: rasterise one page and OCR it"""
+    from pdf2image import convert_from_path
+    import pytesseract
+    filepath, index, dpi, lang = args
+    images = convert_from_path(filepath, dpi=dpi, first_page=index + 1, last_page=index + 1)
+    return "\n".join(pytesseract.image_to_string(image, lang=lang) for image in images)
+
+
+def ocr_pages(filepath: str, indices: List[int], hashes: List[str], dpi: int = OCR_DPI, lang: str = OCR_LANG,
+              workers: int = OCR_WORKERS, cache=page_cache) -> Dict[int, str]:
+    """
+    OCR the pages at ``indices`` (0-based) and return ``{index: text}``.
+
+    Only those pages are rasterised. Results are cached per page hash (and
+    DPI/language), which covers the page's image data (see
+    page_cache.page_content_hash), so a page is only OCRed once across
+    runs and pages with identical content are OCRed once per run. Pages
+    that fail are logged and left out.
+    """
+    artifact = f"ocr:{dpi}:{lang}"
+    cached = cache.get_artifacts([hashes[i] for i in indices], artifact) if cache is not None else {}
+    results = {i: cached[hashes[i]] for i in indices if hashes[i] in cached}
+    # One page per distinct hash is OCRed; the others share its text
+    duplicates = {}
+    for index in indices:
+        if index not in results:
+            duplicates.setdefault(hashes[index], []).append(index)
+    missing = [group[0] for group in duplicates.values()]
+
+    jobs = [(filepath, index, dpi, lang) for index in missing]
+    if workers <= 1 or len(jobs) <= 1:
+        outputs = []
+        for job in jobs:
+            try:
+                outputs.append(_ocr_page(job))
+            except Exception as e:
+                outputs.append(e)
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            futures = [pool.submit(_ocr_page, job) for job in jobs]
+            outputs = []
+            for future in futures:
+                try:
+                    outputs.append(future.result())
+                except Exception as e:
+                    outputs.append(e)
+
+    fresh = {}
+    for index, output in zip(missing, outputs):
+        if isinstance(output, Exception):
+            print(f"OCR failed for page {index + 1}: {output}")
+            metrics.record_failure(f"ocr:{index + 1}")
+            continue
+        fresh[hashes[index]] = output
+        for duplicate in duplicates[hashes[index]]:
+            results[duplicate] = output
+    if cache is not None and fresh:
+        cache.put_artifacts(artifact, fresh)
+    return results
+
+
+def fill_scanned_pages(filepath: str, pages: List[str], hashes: List[str]) -> List[str]:
+    """Replace the text of empty or garbage pages with OCR output where OCR is available"""
+    suspect = [index for index, text in enumerate(pages) if needs_ocr(text)]
+    if not suspect or not OCR_ENABLED:
+        return pages
+    missing = missing_ocr_tools()
+    if missing:
+        print(f"{len(suspect)} page(s) look scanned; install {', '.join(missing)} to OCR them")
+        return pages
+
+    pages = list(pages)
+    for index, text in ocr_pages(filepath, suspect, hashes).items():
+        if text.strip():
+            pages[index] = text
+    return pages
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+import config
+from sqlite_store import open_database
+
+PAGE_CACHE_PATH = config.get("PAGE_CACHE_PATH", os.path.join(".cim_cache", "pages.sqlite3"))
+PAGE_CACHE_MAX_AGE_DAYS = config.get_float("PAGE_CACHE_MAX_AGE_DAYS", 90)
+
+
+# Bump when the hash covers more of the page, so entries keyed by the old hash are never matched
+PAGE_HASH_VERSION = 2
+
+
+def _hash_resources(digest, resources, seen):
+    """Fold the fonts and XObjects in ``resources`` into ``digest``, recursing into Form XObjects"""
+    resources = resources.get_object() if resources else None
+    if not resources:
+        return
+    fonts = resources.get("/Font")
+    if fonts:
+        for name, font in sorted(fonts.get_object().items()):
+            font = font.get_object()
+            digest.update(f"{name}:{font.get('/BaseFont')}:{font.get('/Subtype')}".encode("utf-8"))
+    xobjects = resources.get("/XObject")
+    if not xobjects:
+        return
+    for name, reference in sorted(xobjects.get_object().items()):
+        xobject = reference.get_object()
+        subtype = xobject.get("/Subtype")
+        digest.update(f"{name}:{subtype}".encode("utf-8"))
+        # Images are hashed as stored (no need to decode them), forms by their content stream
+        digest.update(hashlib.sha256(getattr(xobject, "_data", None) or b"").digest())
+        identity = getattr(reference, "idnum", None) or id(xobject)
+        if subtype == "/Form" and identity not in seen:
+            seen.add(identity)
+            _hash_resources(digest, xobject.get("/Resources"), seen)
+
+
+def page_content_hash(page) -> str:
+    """
+    Hash a PyPDF2 page by its content stream and every resource it draws:
+    fonts, images and Form XObjects (with their own resources)
+    """
+    digest = hashlib.sha256(f"page-v{PAGE_HASH_VERSION}".encode("utf-8"))
+    contents = page.get_contents()
+    if contents is not None:
+        digest.update(contents.get_data())
+    _hash_resources(digest, page.get("/Resources"), set())
+    return digest.hexdigest()
+
+
+class PageCache:
+    """
+    Per-page cache keyed by page content hash.
+
+    Stores the extracted text of each page plus derived per-page
+    artifacts (OCR output, heading-detector segments), so re-ingesting a revised CIM only has to
+    process the pages that actually changed.
+    Entries not used for ``max_age_days`` are pruned when the cache opens.
+    """
+
+    def __init__(self, path: str = PAGE_CACHE_PATH, max_age_days: float = PAGE_CACHE_MAX_AGE_DAYS):
+        self.path = path
+        self.max_age = max_age_days * 86400
+        self.stats = {'hits': 0, 'misses': 0}
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = open_database(self.path, [
+                "CREATE TABLE IF NOT EXISTS pages ("
+                "hash TEXT PRIMARY KEY, text TEXT, artifacts TEXT NOT NULL DEFAULT '{}', last_used REAL NOT NULL)",
+            ], prune=["DELETE FROM pages WHERE last_used < ?"], max_age=self.max_age)
+        return self._conn
+
+    def get_texts(self, hashes: Iterable[str]) -> Dict[str, str]:
+        """Return the cached text for every known hash in ``hashes``"""
+        hashes = list(dict.fromkeys(hashes))
+        found = {}
+        with self._lock:
+            conn = self._connect()
+            for start in range(0, len(hashes), 500):
+                batch = hashes[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                for key, text in conn.execute(
+                    f"SELECT hash, text FROM pages WHERE hash IN ({placeholders}) AND text IS NOT NULL", batch
+                ):
+                    found[key] = text
+            conn.executemany("UPDATE pages SET last_used = ? WHERE hash = ?",
+                             [(time.time(), key) for key in found])
+            conn.commit()
+        self.stats['hits'] += len(found)
+        self.stats['misses'] += len(hashes) - len(found)
+        return found
+
+    def put_texts(self, texts: Dict[str, str]):
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                "INSERT INTO pages (hash, text, last_used) VALUES (?, ?, ?) "
+                "ON CONFLICT(hash) DO UPDATE SET text = excluded.text, last_used = excluded.last_used",
+                [(key, text, now) for key, text in texts.items()]
+            )
+            conn.commit()
+
+    def get_artifacts(self, hashes: List[str], name: str) -> Dict[str, Any]:
+        """Return the ``name`` artifact for every hash that has one"""
+        found = {}
+        with self._lock:
+            conn = self._connect()
+            for key in dict.fromkeys(hashes):
+                row = conn.execute("SELECT artifacts FROM pages WHERE hash = ?", (key,)).fetchone()
+                if row is not None:
+                    artifacts = json.loads(row[0])
+                    if name in artifacts:
+                        found[key] = artifacts[name]
+        return found
+
+    def put_artifacts(self, name: str, values: Dict[str, Any]):
+        """Attach the ``name`` artifact to each page hash in ``values``"""
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            for key, value in values.items():
+                row = conn.execute("SELECT artifacts FROM pages WHERE hash = ?", (key,)).fetchone()
+                artifacts = json.loads(row[0]) if row else {}
+                artifacts[name] = value
+                conn.execute(
+                    "INSERT INTO pages (hash, artifacts, last_used) VALUES (?, ?, ?) "
+                    "ON CONFLICT(hash) DO UPDATE SET artifacts = excluded.artifacts, last_used = excluded.last_used",
+                    (key, json.dumps(artifacts), now)
+                )
+            conn.commit()
+
+    def get_artifact(self, page_hash: str, name: str) -> Optional[Any]:
+        return self.get_artifacts([page_hash], name).get(page_hash)
+
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM pages")
+            conn.commit()
+
+
+page_cache = PageCache()
@@ -0,0 +1,115 @@
+import hashlib
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, List, Sequence, Tuple
+
+import config
+from tokens import BUDGETS
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+# Pages handed to each extractor (see tokens.BUDGETS for the query terms).
+# Override with PAGE_INDEX_TOP_K_<SITE>, e.g. PAGE_INDEX_TOP_K_FINANCIAL_METRICS=3.
+TOP_K = {
+    'document_analysis': 12,
+    'financial_metrics': 5,
+    'company_info': 4,
+    'market_info': 4,
+    'highlights': 8,
+}
+TERM_RE = re.compile(r"[a-z][a-z0-9]+")
+# Postings of the most recently indexed documents, by content hash
+INDEX_CACHE_SIZE = 8
+
+_cache_lock = threading.Lock()
+_postings_cache = OrderedDict()
+
+
+class PageIndex:
+    """
+    In-memory BM25 inverted index over a document's pages.
+
+    Lets each extractor pull only the handful of pages relevant to it (the
+    financial summary, the market overview, ...) instead of the whole
+    document. Page numbers are 1-based. ``pages`` is kept as given (a
+    Document's PageView decodes a page only when it is read), and prebuilt
+    ``postings`` and ``lengths`` can be passed in to skip indexing.
+    """
+
+    def __init__(self, pages: Sequence[str], postings: Dict[str, List[Tuple[int, int]]] = None,
+                 lengths: List[int] = None):
+        self.pages = pages
+        if postings is None:
+            postings, lengths = {}, []
+            for number, text in enumerate(pages):
+                terms = Counter(TERM_RE.findall(text.lower()))
+                lengths.append(sum(terms.values()))
+                for term, count in terms.items():
+                    postings.setdefault(term, []).append((number, count))
+        self.postings = postings
+        self.lengths = lengths
+        self.average_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+
+    def search(self, terms: Sequence[str], k: int) -> List[Tuple[int, float]]:
+        """Return up to ``k`` ``(page_number, score)`` pairs, best first"""
+        total = len(self.pages)
+        scores: Dict[int, float] = {}
+        for term in set(t.lower() for t in terms):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for number, count in postings:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[number] / (self.average_length or 1))
+                scores[number] = scores.get(number, 0.0) + idf * count * (BM25_K1 + 1) / (count + norm)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+        return [(number + 1, score) for number, score in ranked]
+
+    def relevant_pages(self, site: str) -> List[int]:
+        """Page numbers (in document order) of the top-k pages for an extractor call site"""
+        k = config.get_int(f"PAGE_INDEX_TOP_K_{site.upper()}", TOP_K[site])
+        return sorted(number for number, _ in self.search(BUDGETS[site][1], k))
+
+    def pages_text(self, numbers: Sequence[int]) -> str:
+        """Join pages, each preceded by a [Page N] marker so answers can be traced back"""
+        return "\n\n".join(f"[Page {number}]\n{self.pages[number - 1]}" for number in numbers)
+
+    def covers(self, site: str) -> bool:
+        """Whether the index narrows anything down for ``site`` (the document has more than k pages)"""
+        return len(self.pages) > config.get_int(f"PAGE_INDEX_TOP_K_{site.upper()}", TOP_K[site])
+
+
+def pages_digest(pages: Sequence[str]) -> str:
+    """Content hash of a page sequence (a PageView hashes its document's buffer without decoding pages)"""
+    if hasattr(pages, 'digest'):
+        return pages.digest()
+    digest = hashlib.sha256()
+    for page in pages:
+        digest.update(page.encode("utf-8"))
+        digest.update(b"\f")
+    return digest.hexdigest()
+
+
+def index_for(pages) -> PageIndex:
+    """
+    Return an index over ``pages`` (None without pages). The postings are
+    built once per distinct document content and the last INDEX_CACHE_SIZE
+    are kept; the page text itself is not cached.
+    """
+    if not pages:
+        return None
+    key = pages_digest(pages)
+    with _cache_lock:
+        cached = _postings_cache.get(key)
+        if cached is not None:
+            _postings_cache.move_to_end(key)
+    if cached is not None:
+        return PageIndex(pages, *cached)
+    index = PageIndex(pages)
+    with _cache_lock:
+        _postings_cache[key] = (index.postings, index.lengths)
+        while len(_postings_cache) > INDEX_CACHE_SIZE:
+            _postings_cache.popitem(last=False)
+    return index
@@ -1,11 +1,13 @@
 import json
-from typing import Dict, Any
-import openai
-from dotenv import load_dotenv
-import os
-
-load_dotenv()
-client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from typing import Dict, Any, List, Callable
+from llm import chat, stream_chat, ContextThreadPoolExecutor
+from json_stream import ObjectMemberStream
+import config
+from section_detector import detect_sections
+from page_cache import page_cache
+from document import Document
+from metrics import metrics
+from tokens import count_tokens
 
 SECTION_HEADERS = [
     "Company Overview",
@@ -14,8 +16,28 @@ SECTION_HEADERS = [
     "Risks"
 ]
 
-def split_sections_with_llm(text: str) -> Dict[str, str]:
-    """Use GPT-4 to intelligently split the text into relevant sections"""
+SINGLE_PASS_MAX_TOKENS = config.get_int("SINGLE_PASS_MAX_TOKENS", 12000)
+# The single-pass answer repeats the document's text, so it is only used
+# when that text fits in the completion with room for JSON escaping. Each
+# request asks for no more than its text can need (the rate limiter
+# reserves max_tokens against the TPM limit).
+SECTIONING_MAX_COMPLETION_TOKENS = config.get_int("SECTIONING_MAX_COMPLETION_TOKENS", 16000)
+SECTIONING_COMPLETION_OVERHEAD = 1000
+CHUNK_TOKENS = config.get_int("SECTION_CHUNK_TOKENS", 6000)
+CHUNK_OVERLAP_TOKENS = config.get_int("SECTION_CHUNK_OVERLAP_TOKENS", 300)
+SECTIONING_CONCURRENCY = config.get_int("SECTIONING_CONCURRENCY", 8)
+SECTIONING_MODE = config.get("SECTIONING_MODE", "heuristic")
+MIN_AMBIGUOUS_CHARS = 200
+
+def split_sections_with_llm(text: str, on_section: Callable[[str, str], None] = None) -> Dict[str, str]:
+    """
+    Use GPT-4 to intelligently split the text into relevant sections.
+
+    With ``on_section``, the response is streamed and ``on_section(name,
+    text)`` is called for each section as soon as its JSON value closes.
+    A response cut off at the completion limit (or that is not valid JSON)
+    falls back to chunked sectioning for the sections not reported yet.
+    """
     prompt = f"""Please analyze the following CIM (Confidential Information Memorandum) text and split it into the following sections:
     - Company Overview
     - Financials
@@ -37,64 +59,240 @@ def split_sections_with_llm(text: str) -> Dict[str, str]:
     }}
     """
 
-    response = client.chat.completions.create(
+    params = dict(
         model="gpt-4.1",
         messages=[
             {"role": "system", "content": "You are a financial document analysis expert. Extract and organize content precisely."},
             {"role": "user", "content": prompt}
         ],
         temperature=0,
-        max_tokens=3000,
+        max_tokens=min(SECTIONING_MAX_COMPLETION_TOKENS, count_tokens(text) * 4 // 3 + SECTIONING_COMPLETION_OVERHEAD),
         response_format={"type": "json_object"}
     )
 
-    try:
-        sections = json.loads(response.choices[0].message.content)
-        return sections
-    except json.JSONDecodeError:
-        return {header: "" for header in SECTION_HEADERS}
+    # Sections already passed to on_section; later stages have started on
+    # them, so they are kept whatever happens to the rest of the response
+    reported = {}
+    if on_section is None:
+        choice = chat(**params).choices[0]
+        content = choice.message.content
+        truncated = choice.finish_reason == "length"
+    else:
+        parser = ObjectMemberStream()
+        parts = []
+        for delta in stream_chat(**params):
+            parts.append(delta)
+            for name, value in parser.feed(delta):
+                if isinstance(value, str) and name not in reported:
+                    reported[name] = value
+                    on_section(name, value)
+        content = "".join(parts)
+        truncated = not parser.closed
 
-def extract_company_info(text: str) -> Dict[str, str]:
-    """Extract company information using LLM"""
-    prompt = f"""Extract the following information from the text in JSON format:
-    - company_name: The name of the company
-    - location: Company headquarters or main location
-    - industry: Company's industry or sector
+    if not truncated:
+        try:
+            return {**json.loads(content), **reported}
+        except json.JSONDecodeError:
+            pass
+    print("Single-pass sectioning response was incomplete; sectioning in chunks instead")
+    return {**split_sections_chunked(text), **reported}
 
-    Text:
-    {text}
+def chunk_text(text: str, max_tokens: int = CHUNK_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> List[str]:
+    """
+    Split text into windows of at most ``max_tokens`` tokens on line
+    boundaries, each window repeating the last ``overlap_tokens`` of the
+    previous one so content straddling a boundary is seen whole. A line
+    longer than a whole window is cut into window-sized pieces.
+    """
+    pieces = []
+    for line in text.splitlines(keepends=True):
+        cost = count_tokens(line)
+        if cost <= max_tokens:
+            pieces.append((line, cost))
+            continue
+        step = max(1, len(line) * max_tokens // cost)
+        for start in range(0, len(line), step):
+            piece = line[start:start + step]
+            pieces.append((piece, count_tokens(piece)))
 
-    Return only the JSON object."""
+    chunks = []
+    start = 0
+    while start < len(pieces):
+        end = start + 1
+        used = pieces[start][1]
+        while end < len(pieces) and used + pieces[end][1] <= max_tokens:
+            used += pieces[end][1]
+            end += 1
+        chunks.append("".join(piece for piece, _ in pieces[start:end]))
+        if end >= len(pieces):
+            break
+        # Step back over whole lines for the overlap, always moving forward
+        overlap = 0
+        back = end
+        while back > start + 1 and overlap + pieces[back - 1][1] <= overlap_tokens:
+            back -= 1
+            overlap += pieces[back][1]
+        start = back
+    return chunks
 
-    response = client.chat.completions.create(
-        model="gpt-4.1",
-        messages=[
-            {"role": "system", "content": "You are a financial document analysis expert. Extract company information precisely."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0,
-        response_format={"type": "json_object"}
-    )
+def classify_chunk(chunk: str, index: int, total: int) -> Dict[str, str]:
+    """Ask the model which parts of one window belong to each section"""
+    prompt = f"""The following text is part {index + 1} of {total} of a CIM (Confidential Information Memorandum).
+    Assign its content to these sections:
+    - Company Overview
+    - Financials
+    - Market Opportunity
+    - Risks
+
+    Only use content that appears in this part. Leave a section as an empty string if this part has nothing for it.
+
+    Text to analyze:
+    {chunk}
+
+    Return only the JSON object with the following structure:
+    {{
+        "Company Overview": "extracted text...",
+        "Financials": "extracted text...",
+        "Market Opportunity": "extracted text...",
+        "Risks": "extracted text..."
+    }}
+    """
 
     try:
-        info = json.loads(response.choices[0].message.content)
-        return {k: v for k, v in info.items() if v and v.strip()}
-    except json.JSONDecodeError:
+        response = chat(
+            model="gpt-4.1",
+            messages=[
+                {"role": "system", "content": "You are a financial document analysis expert. Extract and organize content precisely."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0,
+            response_format={"type": "json_object"}
+        )
+        return json.loads(response.choices[0].message.content)
+    except Exception as e:
+        print(f"Sectioning of chunk {index + 1}/{total} failed: {e}")
+        metrics.record_failure(f"sectioning:{index + 1}/{total}")
         return {}
-def parse_sections(pdf_data: Dict[str, Any]) -> Dict[str, Any]:
+
+def merge_section_chunks(results: List[Dict[str, str]]) -> Dict[str, str]:
+    """Merge per-chunk sections in document order, dropping paragraphs repeated by the overlap"""
+    merged = {}
+    for header in SECTION_HEADERS:
+        seen = set()
+        paragraphs = []
+        for result in results:
+            value = result.get(header) or ""
+            if not isinstance(value, str):
+                value = json.dumps(value)
+            for paragraph in value.split("\n\n"):
+                key = " ".join(paragraph.split()).lower()
+                if key and key not in seen:
+                    seen.add(key)
+                    paragraphs.append(paragraph.strip())
+        merged[header] = "\n\n".join(paragraphs)
+    return merged
+
+def split_sections_chunked(text: str, max_workers: int = SECTIONING_CONCURRENCY) -> Dict[str, str]:
     """
-    Enhanced section parser that uses LLM for intelligent parsing
+    Map-reduce sectioning for documents larger than one context window:
+    classify overlapping windows in parallel and merge them per section.
     """
-    text = pdf_data['text']
-    financial_metrics = pdf_data.get('financial_metrics', {})
-    
-    sections = split_sections_with_llm(text)
-    
-    company_info = extract_company_info(text)
+    chunks = chunk_text(text)
+    if not chunks:
+        return {header: "" for header in SECTION_HEADERS}
+    with ContextThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as pool:
+        results = list(pool.map(classify_chunk, chunks, range(len(chunks)), [len(chunks)] * len(chunks)))
+    return merge_section_chunks(results)
+
+def split_sections(text: str, chunked: bool = None, on_section: Callable[[str, str], None] = None) -> Dict[str, str]:
+    """
+    Pick single-pass or chunked sectioning based on document size and the
+    single-pass completion budget.
+    ``on_section`` is only called early by the single-pass (streamed) path.
+    """
+    if chunked is None:
+        limit = min(SINGLE_PASS_MAX_TOKENS, SECTIONING_MAX_COMPLETION_TOKENS * 3 // 4)
+        chunked = count_tokens(text) > limit
+    if chunked:
+        return split_sections_chunked(text)
+    return split_sections_with_llm(text, on_section)
+
+def merge_section_text(detected: str, value: Any) -> str:
+    """Append LLM-assigned text to what the heading detector found for a section"""
+    if not isinstance(value, str) or not value.strip():
+        return detected
+    return "\n\n".join(part for part in (detected, value.strip()) if part)
+
+def split_sections_hybrid(text: str, pages: List[str] = None, on_section: Callable[[str, str], None] = None):
+    """
+    Assign text to sections with the offline heading detector and only send
+    the spans it could not place to the LLM. The detector's per-page
+    results are kept in the page cache.
+
+    Returns ``(sections, stats)`` where stats reports how much of the text
+    was routed to the model. Unplaced spans shorter than MIN_AMBIGUOUS_CHARS
+    (cover pages, stray footers) are dropped rather than sent. With
+    ``on_section``, each section is reported as soon as the LLM has finished
+    assigning text to it.
+    """
+    sections, ambiguous = detect_sections(text, pages, cache=page_cache)
+
+    if not any(sections.values()):
+        llm_text = text
+        sections = split_sections(text, on_section=on_section)
+    else:
+        llm_text = ambiguous if len(ambiguous) >= MIN_AMBIGUOUS_CHARS else ""
+        if llm_text:
+            detected = dict(sections)
+            def merge_early(header, value):
+                if header in detected:
+                    on_section(header, merge_section_text(detected[header], value))
+            for header, value in split_sections(llm_text, on_section=merge_early if on_section else None).items():
+                if header in sections:
+                    sections[header] = merge_section_text(sections[header], value)
+
+    stats = {
+        'total_chars': len(text),
+        'llm_chars': len(llm_text),
+        'llm_share': round(len(llm_text) / len(text), 4) if text else 0.0
+    }
+    return sections, stats
+
+def parse_sections(document: Document, on_section: Callable[[str, str], None] = None) -> Dict[str, Any]:
+    """
+    Enhanced section parser that uses LLM for intelligent parsing.
+
+    Facts already extracted during ingestion ('analysis' and
+    'financial_metrics') are carried through rather than re-extracted.
+    ``on_section(name, text)`` is called once per section in SECTION_HEADERS
+    with its final text, as early as it is known (while the sectioning
+    response is still streaming when possible), so later stages can start.
+    """
+    text = document.text
+    pages = document.pages if document.page_count > 1 else None
+    analysis = document.facts.get('analysis') or {}
+    financial_metrics = document.facts.get('financial_metrics', {})
+
+    emitted = set()
+    def emit(header, value):
+        if on_section and header in SECTION_HEADERS and header not in emitted:
+            emitted.add(header)
+            on_section(header, value)
     
+    if SECTIONING_MODE == "llm":
+        sections = split_sections(text, on_section=emit)
+        sectioning = {'total_chars': len(text), 'llm_chars': len(text), 'llm_share': 1.0}
+    else:
+        sections, sectioning = split_sections_hybrid(text, pages, on_section=emit)
+
+    for header in SECTION_HEADERS:
+        value = sections.get(header)
+        emit(header, value if isinstance(value, str) else "")
     
     return {
         'sections': sections,
-        'company_info': company_info,
-        'financial_metrics': financial_metrics
-    }
\ No newline at end of file
+        'company_info': analysis.get('company_info') or {},
+        'analysis': analysis,
+        'financial_metrics': financial_metrics,
+        'sectioning': sectioning
+    }
@@ -0,0 +1,218 @@
+import hashlib
+import json
+from typing import Any, Dict, List
+
+import config
+from checkpoints import checkpoints, file_digest, source_digest
+from document import Document
+from ingestion import ingest_file
+from parsing import parse_sections
+from summarization import (summarize_sections, format_summary, process_for_presentation, stream_summary,
+                           document_facts, SectionPipeline)
+from ppt_generator import generate_ppt
+from metrics import metrics
+
+# Bump to invalidate every stored checkpoint (e.g. when an output format changes)
+PIPELINE_VERSION = 2
+
+def present(parsed_data: Dict[str, Any], document: Document) -> Dict[str, Any]:
+    """Presentation data for the parse output; extractors query the ingested document's pages"""
+    return process_for_presentation(parsed_data, pages=document.pages)
+
+
+# stage -> (fn, dependencies, modules whose source defines the stage, settings read from the environment).
+# A stage without dependencies is given the input path.
+STAGES = {
+    'ingest': (ingest_file, [], ['ingestion', 'document', 'ocr', 'metric_extraction', 'page_cache',
+                                 'tokens', 'page_index'],
+               ['OCR_ENABLED', 'OCR_DPI', 'OCR_LANG', 'TOKEN_BUDGET_DOCUMENT_ANALYSIS', 'TOKEN_BUDGET_FINANCIAL_METRICS',
+                'PAGE_INDEX_TOP_K_DOCUMENT_ANALYSIS', 'PAGE_INDEX_TOP_K_FINANCIAL_METRICS']),
+    'parse': (parse_sections, ['ingest'], ['parsing', 'document', 'section_detector'],
+              ['SECTIONING_MODE', 'SINGLE_PASS_MAX_TOKENS', 'SECTIONING_MAX_COMPLETION_TOKENS', 'SECTION_CHUNK_TOKENS',
+               'SECTION_CHUNK_OVERLAP_TOKENS']),
+    'summarize': (summarize_sections, ['parse'], ['summarization', 'near_duplicates', 'tokens'],
+                  ['TOKEN_BUDGET_SECTION_SUMMARY', 'NEAR_DUP_THRESHOLD', 'NEAR_DUP_REUSE_THRESHOLD']),
+    'present': (present, ['parse', 'ingest'], ['summarization', 'near_duplicates', 'metric_extraction', 'tokens',
+                                                      'page_index'],
+                ['TOKEN_BUDGET_FINANCIAL_METRICS', 'TOKEN_BUDGET_COMPANY_INFO', 'TOKEN_BUDGET_MARKET_INFO',
+                 'TOKEN_BUDGET_HIGHLIGHTS', 'PAGE_INDEX_TOP_K_FINANCIAL_METRICS', 'PAGE_INDEX_TOP_K_COMPANY_INFO',
+                 'PAGE_INDEX_TOP_K_MARKET_INFO', 'PAGE_INDEX_TOP_K_HIGHLIGHTS', 'NEAR_DUP_THRESHOLD',
+                 'NEAR_DUP_REUSE_THRESHOLD']),
+}
+# Stages whose output is not plain JSON: stage -> (to checkpoint form, from checkpoint form and input path)
+CODECS = {
+    'ingest': (Document.to_dict, Document.from_dict),
+}
+
+
+def value_digest(value: Any) -> str:
+    blob = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class PipelineRun:
+    """
+    One input file's pass through the stage DAG.
+
+    ``result(stage)`` returns a stage's output, computing its dependencies
+    first. Outputs are checkpointed under a key made of the digests of the
+    stage's inputs plus the digest of its source and settings, so unchanged
+    stages are loaded from the store instead of recomputed. A stage that
+    reported a failure (a placeholder summary, an extractor default) is
+    used for this run but not checkpointed, so the next run retries it.
+    """
+
+    def __init__(self, input_path: str, store=checkpoints):
+        self.input_path = input_path
+        self.store = store
+        self.outputs: Dict[str, Any] = {}
+        self.digests: Dict[str, str] = {}
+        self.reused: Dict[str, bool] = {}
+        self.failures: Dict[str, List[str]] = {}
+        self._overlap = None
+
+    def key(self, stage: str) -> str:
+        fn, deps, modules, settings = STAGES[stage]
+        if deps:
+            inputs = {}
+            for dep in deps:
+                self.result(dep)
+                inputs[dep] = self.digests[dep]
+        else:
+            inputs = {'input': file_digest(self.input_path)}
+        return self.store.make_key(
+            stage,
+            version=PIPELINE_VERSION,
+            inputs=inputs,
+            source=source_digest(modules),
+            settings={name: config.get(name) for name in settings}
+        )
+
+    def _set(self, stage: str, value: Any, reused: bool):
+        self.outputs[stage] = value
+        self.digests[stage] = value_digest(CODECS[stage][0](value) if stage in CODECS else value)
+        self.reused[stage] = reused
+
+    def _load(self, key: str, stage: str) -> Any:
+        value = self.store.get(key)
+        if value is not None and stage in CODECS:
+            try:
+                value = CODECS[stage][1](value, self.input_path)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring {stage} checkpoint: {e}")
+                value = None
+        return value
+
+    def _save(self, key: str, stage: str, value: Any):
+        if self.failures.get(stage):
+            print(f"Not checkpointing {stage}: {', '.join(self.failures[stage])} failed")
+            return
+        self.store.put(key, stage, CODECS[stage][0](value) if stage in CODECS else value)
+
+    def result(self, stage: str) -> Any:
+        if stage in self.outputs:
+            return self.outputs[stage]
+        if self._overlap is not None and stage in ('summarize', 'present'):
+            self._finish_overlap()
+            return self.outputs[stage]
+        fn, deps, _, _ = STAGES[stage]
+        key = self.key(stage)
+        value = self._load(key, stage)
+        with metrics.stage(stage, file=self.input_path, reused=value is not None):
+            if value is None:
+                args = [self.outputs[dep] for dep in deps] or [self.input_path]
+                with metrics.collect_failures(self.failures):
+                    value = fn(*args)
+                self._save(key, stage, value)
+                self._set(stage, value, False)
+            else:
+                self._set(stage, value, True)
+        return value
+
+    def start_overlapped(self) -> Any:
+        """
+        Produce the parse output like result('parse'), but when sectioning
+        has to run, start summarizing and extracting each section as soon as
+        it is reported instead of after the whole sectioning call. The
+        summarize and present outputs are collected by result().
+        """
+        if 'parse' in self.outputs:
+            return self.outputs['parse']
+        key = self.key('parse')
+        value = self.store.get(key)
+        if value is not None:
+            with metrics.stage('parse', file=self.input_path, reused=True):
+                self._set('parse', value, True)
+            return value
+
+        document = self.outputs['ingest']
+        # Section tasks inherit the collector when submitted, so their
+        # failures are recorded against summarize/present
+        with metrics.collect_failures(self.failures):
+            overlap = SectionPipeline(document_facts(document.facts), document.pages)
+            try:
+                with metrics.stage('parse', file=self.input_path, reused=False, overlapped=True):
+                    value = parse_sections(document, on_section=overlap.add)
+            except BaseException:
+                overlap.pool.shutdown(wait=False, cancel_futures=True)
+                raise
+        self._save(key, 'parse', value)
+        self._set('parse', value, False)
+        self._overlap = overlap
+        return value
+
+    def _finish_overlap(self):
+        overlap, self._overlap = self._overlap, None
+        with metrics.collect_failures(self.failures):
+            with metrics.stage('summarize_present', file=self.input_path, overlapped=True):
+                summary_dict, presentation_data = overlap.finish(self.outputs['parse'])
+        for stage, value in (('summarize', summary_dict), ('present', presentation_data)):
+            self._save(self.key(stage), stage, value)
+            self._set(stage, value, False)
+
+    def write_summary(self, summary_path: str, stream: bool = False, echo=None):
+        """
+        Format the executive summary from the summarize and parse outputs and
+        write it. With ``stream``, a summary that is not checkpointed yet is
+        written (and passed to ``echo``) as the model generates it.
+        """
+        if stream and 'summarize' not in self.outputs and self._overlap is None:
+            key = self.key('summarize')
+            summary_dict = self.store.get(key)
+            if summary_dict is None:
+                with metrics.collect_failures(self.failures):
+                    with metrics.stage('summarize', file=self.input_path, reused=False, streamed=True):
+                        with open(summary_path, 'w', encoding='utf-8') as f:
+                            summary_dict = stream_summary(self.outputs['parse'], f, echo)
+                self._save(key, 'summarize', summary_dict)
+                self._set('summarize', summary_dict, False)
+                return
+            self._set('summarize', summary_dict, True)
+        summary_dict = self.result('summarize')
+        parsed_data = self.result('parse')
+        with metrics.stage('write_summary', file=self.input_path):
+            formatted = format_summary(summary_dict, parsed_data)
+            with open(summary_path, 'w', encoding='utf-8') as f:
+                f.write(formatted)
+        if echo:
+            echo(formatted)
+
+    def render(self, ppt_path: str, data_path: str = None):
+        """Render the deck (always, so styling changes take effect) and optionally dump its data"""
+        presentation_data = self.result('present')
+        if data_path:
+            with open(data_path, 'w', encoding='utf-8') as f:
+                json.dump(presentation_data, f, indent=2)
+        with metrics.stage('render', file=self.input_path):
+            generate_ppt(presentation_data, ppt_path)
+
+
+def run_pipeline(input_path: str, summary_path: str, ppt_path: str, data_path: str = None,
+                 store=checkpoints) -> PipelineRun:
+    """Run ingest -> parse -> summarize -> present -> render for one file, reusing checkpoints"""
+    run = PipelineRun(input_path, store)
+    run.result('ingest')
+    run.start_overlapped()
+    run.write_summary(summary_path)
+    run.render(ppt_path, data_path)
+    return run
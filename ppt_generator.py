@@ -1,7 +1,18 @@
 from pptx import Presentation
 from pptx.util import Pt, Inches
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+import io
+import json
+import os
 import re
+import config
+
+# Optional .pptx whose masters/theme decks are built on. Its slide layouts
+# must follow the default order (title, ..., section header, ..., title only).
+PPT_TEMPLATE = config.get("PPT_TEMPLATE")
+RENDER_WORKERS = config.get_int("RENDER_WORKERS", min(4, os.cpu_count() or 1))
 
 TITLE_FONT_SIZE = 32
 SUBTITLE_FONT_SIZE = 24
@@ -43,8 +54,29 @@ def format_financial_metric(value):
 def format_percentage(value):
     return value if value else None
 
-def generate_ppt(document_data, output_path):
-    prs = Presentation()
+def load_template(template=None):
+    """Read a template file once so every deck can be opened from memory (None: the default template)"""
+    template = template or PPT_TEMPLATE
+    if not template or isinstance(template, bytes):
+        return template
+    with open(template, 'rb') as f:
+        return f.read()
+
+def new_presentation(template=None):
+    template = template or PPT_TEMPLATE
+    if isinstance(template, bytes):
+        return Presentation(io.BytesIO(template))
+    return Presentation(template)
+
+def generate_ppt(document_data, output_path=None, template=None):
+    """
+    Build the deck from presentation data (the contents of pptx_data.json).
+
+    ``output_path`` may be a path or a binary file object; without one the
+    deck is returned as bytes. ``template`` is a .pptx path or its bytes
+    (see load_template), defaulting to PPT_TEMPLATE or a blank deck.
+    """
+    prs = new_presentation(template)
 
     analysis = document_data.get('analysis', {})
     company_info = analysis.get('company_info', {})
@@ -150,4 +182,55 @@ def generate_ppt(document_data, output_path):
             p.text = "Competitive Position"; p.font.size = Pt(SUBTITLE_FONT_SIZE); p.font.bold = True
             add_bullet_point(content_tf.add_paragraph(), market_info['competition'])
 
-    prs.save(output_path)
\ No newline at end of file
+    if output_path is None:
+        buffer = io.BytesIO()
+        prs.save(buffer)
+        return buffer.getvalue()
+    prs.save(output_path)
+
+_worker_template = None
+
+def _init_render_worker(template):
+    global _worker_template
+    _worker_template = template
+
+def _render_job(job) -> Tuple[str, str, str]:
+    """Process pool worker: render one pptx_data.json to a deck, reporting errors instead of raising"""
+    data_path, output_path = job
+    try:
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        with open(data_path, 'r', encoding='utf-8') as f:
+            generate_ppt(json.load(f), output_path, _worker_template)
+    except Exception as e:
+        return data_path, 'failed', str(e)
+    return data_path, 'done', output_path
+
+def render_decks(jobs: List[Tuple[str, str]], template=None, workers: int = RENDER_WORKERS,
+                 on_result: Callable[[str, str, str], None] = None) -> Dict[str, int]:
+    """
+    Render ``(data_path, output_path)`` jobs from saved presentation JSON,
+    without touching the LLM. The template is read once and handed to each
+    worker process; more than one job is spread across ``workers``
+    processes. ``on_result(data_path, status, detail)`` is called as decks
+    finish.
+    """
+    global _worker_template
+    template = load_template(template)
+    counts = {'done': 0, 'failed': 0}
+    if workers <= 1 or len(jobs) <= 1:
+        _worker_template = template
+        results = map(_render_job, jobs)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(max_workers=min(workers, len(jobs)),
+                                   initializer=_init_render_worker, initargs=(template,))
+        results = pool.map(_render_job, jobs, chunksize=max(1, len(jobs) // (workers * 4)))
+    try:
+        for data_path, status, detail in results:
+            counts[status] += 1
+            if on_result:
+                on_result(data_path, status, detail)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return counts
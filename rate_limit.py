@@ -0,0 +1,150 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+import config
+from tokens import count_tokens
+
+INTERACTIVE = 0
+BATCH = 1
+
+LLM_RPM_LIMIT = config.get_int("LLM_RPM_LIMIT", 500)
+LLM_TPM_LIMIT = config.get_int("LLM_TPM_LIMIT", 30000)
+DEFAULT_COMPLETION_TOKENS = 1000
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+
+
+class TokenBucket:
+    """Bucket holding up to one minute of quota, refilled continuously"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until ``amount`` can be taken (requests larger than the bucket wait for a full one)"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float, now: float):
+        self._refill(now)
+        self.level -= min(amount, self.capacity)
+
+    def adjust(self, amount: float):
+        """Return unused quota (positive) or charge for overshoot (negative)"""
+        self.level = min(self.capacity, self.level + amount)
+
+
+class RateLimiter:
+    """
+    Admission control for LLM requests against RPM and TPM quotas.
+
+    Callers wait in a priority queue (INTERACTIVE before BATCH, FIFO within
+    a priority) and the head of the queue is admitted once both buckets
+    have room. A 429 pauses all admissions for the server's Retry-After.
+    """
+
+    def __init__(self, rpm: int = LLM_RPM_LIMIT, tpm: int = LLM_TPM_LIMIT):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.paused_until = 0.0
+        self._cond = threading.Condition()
+        self._queue = []
+        self._sequence = itertools.count()
+
+    def _wait_time(self, tokens: int) -> float:
+        now = time.monotonic()
+        return max(self.paused_until - now,
+                   self.requests.wait_time(1, now),
+                   self.tokens.wait_time(tokens, now))
+
+    def acquire(self, tokens: int, priority: int = INTERACTIVE):
+        """Block until a request of ``tokens`` estimated tokens may be sent"""
+        ticket = (priority, next(self._sequence))
+        with self._cond:
+            heapq.heappush(self._queue, ticket)
+            try:
+                while True:
+                    if self._queue[0] == ticket:
+                        delay = self._wait_time(tokens)
+                        if delay <= 0:
+                            now = time.monotonic()
+                            self.requests.take(1, now)
+                            self.tokens.take(tokens, now)
+                            heapq.heappop(self._queue)
+                            self._cond.notify_all()
+                            return
+                        self._cond.wait(delay)
+                    else:
+                        self._cond.wait()
+            except BaseException:
+                if ticket in self._queue:
+                    self._queue.remove(ticket)
+                    heapq.heapify(self._queue)
+                    self._cond.notify_all()
+                raise
+
+    def settle(self, estimated: int, actual: int):
+        """Correct the token bucket once the real usage is known"""
+        with self._cond:
+            self.tokens.adjust(estimated - actual)
+            self._cond.notify_all()
+
+    def pause(self, seconds: float):
+        with self._cond:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+def estimate_request_tokens(params: Dict[str, Any]) -> int:
+    """Estimate prompt plus completion tokens the way the TPM limit counts them"""
+    prompt = 0
+    for message in params.get("messages", []):
+        content = message.get("content") or ""
+        prompt += count_tokens(content if isinstance(content, str) else str(content))
+    completion = params.get("max_tokens") or params.get("max_completion_tokens") or DEFAULT_COMPLETION_TOKENS
+    return prompt + 4 * len(params.get("messages", [])) + completion
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Seconds the server asked us to wait, from Retry-After / retry-after-ms"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000.0
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+def backoff_delay(error: Exception, attempt: int) -> float:
+    """Honour Retry-After when given, otherwise full-jitter exponential backoff"""
+    delay = retry_after(error)
+    if delay is not None:
+        return delay + random.uniform(0, BACKOFF_BASE)
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+scheduler = RateLimiter()
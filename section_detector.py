@@ -0,0 +1,153 @@
+import hashlib
+import json
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Heading phrases per section (keyed by parsing.SECTION_HEADERS) with a
+# base confidence. Strong phrases are unambiguous on their own; weak ones
+# need a layout cue (all caps, numbering, top of page) to be trusted.
+HEADING_SYNONYMS = {
+    "Company Overview": {
+        "company overview": 0.8, "business overview": 0.8, "overview of the company": 0.8,
+        "company description": 0.8, "business description": 0.8, "about the company": 0.8,
+        "executive summary": 0.6, "the company": 0.5, "products and services": 0.5,
+        "management": 0.4, "management team": 0.5, "operations": 0.4, "history": 0.4,
+    },
+    "Financials": {
+        "financials": 0.8, "financial overview": 0.8, "financial summary": 0.8,
+        "summary financials": 0.8, "historical financial performance": 0.8, "financial performance": 0.8,
+        "financial information": 0.8, "historical financials": 0.8, "financial projections": 0.7,
+        "projections": 0.5, "income statement": 0.5, "balance sheet": 0.5, "capitalization": 0.4,
+    },
+    "Market Opportunity": {
+        "market opportunity": 0.8, "market overview": 0.8, "industry overview": 0.8,
+        "market analysis": 0.8, "industry analysis": 0.8, "competitive landscape": 0.7,
+        "market size": 0.6, "industry trends": 0.6, "competition": 0.5, "growth opportunities": 0.5,
+    },
+    "Risks": {
+        "risks": 0.8, "risk factors": 0.9, "key risks": 0.9, "investment risks": 0.9,
+        "investment considerations": 0.7, "risk considerations": 0.8, "certain considerations": 0.6,
+    },
+}
+
+HEURISTIC_MIN_CONFIDENCE = 0.6
+MAX_HEADING_CHARS = 80
+
+_NUMBERING = r"(?:(?:section|part|chapter)\s+)?(?:[ivxlc]+|\d+(?:\.\d+)*|[a-z])[.)]?\s+"
+_PHRASES = sorted(
+    ((phrase, section, score) for section, phrases in HEADING_SYNONYMS.items() for phrase, score in phrases.items()),
+    key=lambda item: -len(item[0])
+)
+_PHRASE_INFO = {phrase: (section, score) for phrase, section, score in _PHRASES}
+HEADING_RE = re.compile(
+    r"^\s*(?P<number>" + _NUMBERING + r")?(?P<phrase>"
+    + "|".join(re.escape(phrase) for phrase, _, _ in _PHRASES)
+    + r")\s*[:.\-–—]?\s*$",
+    re.IGNORECASE
+)
+# A numbered, capitalised heading that is not in the index still marks a
+# section boundary; un-numbered all-caps lines are usually sub-headings.
+UNKNOWN_HEADING_RE = re.compile(r"^\s*(?:(?:section|part|chapter)\s+)?(?:[IVXLC]+|\d+)[.)]?\s+(?:[A-Z][\w&,'/\-]*\s*){1,8}$")
+# Per-page segments cached in the page cache are only valid for these rules
+RULES_DIGEST = hashlib.sha256(
+    json.dumps([HEADING_SYNONYMS, HEADING_RE.pattern, UNKNOWN_HEADING_RE.pattern], sort_keys=True).encode("utf-8")
+).hexdigest()[:16]
+
+
+def classify_heading(line: str, top_of_page: bool = False, after_blank: bool = False) -> Tuple[Optional[str], float]:
+    """
+    Classify a single line as a section heading.
+
+    Returns ``(section, confidence)`` for a known heading, ``(None, 1.0)``
+    for a line that is clearly a heading of some other section, and
+    ``(None, 0.0)`` for body text.
+    """
+    stripped = line.strip()
+    if not stripped or len(stripped) > MAX_HEADING_CHARS:
+        return None, 0.0
+
+    match = HEADING_RE.match(stripped)
+    if match:
+        section, confidence = _PHRASE_INFO[match.group("phrase").lower()]
+        if match.group("phrase").isupper() or match.group("number"):
+            confidence += 0.2
+        if top_of_page or after_blank:
+            confidence += 0.1
+        return section, min(confidence, 1.0)
+
+    if UNKNOWN_HEADING_RE.match(stripped) and (top_of_page or after_blank):
+        return None, 1.0
+    return None, 0.0
+
+
+def page_segments(page: str, min_confidence: float = HEURISTIC_MIN_CONFIDENCE) -> List[List[Optional[str]]]:
+    """
+    Split one page into ``[label, text]`` segments at its headings. The
+    first segment's label is None (it continues whatever section the
+    previous page ended in); later labels are the section a heading opens,
+    or "" for a heading of some other section. Blank lines are dropped.
+    """
+    segments = [[None, []]]
+    top_of_page = True
+    after_blank = True
+    for line in page.splitlines():
+        if not line.strip():
+            after_blank = True
+            continue
+        section, confidence = classify_heading(line, top_of_page, after_blank)
+        top_of_page = False
+        after_blank = False
+        if section and confidence >= min_confidence:
+            segments.append([section, []])
+            continue
+        if section is None and confidence >= 1.0:
+            segments.append(["", []])
+        segments[-1][1].append(line)
+    return [[label, "\n".join(lines)] for label, lines in segments]
+
+
+def detect_sections(text: str = None, pages: List[str] = None,
+                    min_confidence: float = HEURISTIC_MIN_CONFIDENCE, cache=None) -> Tuple[Dict[str, str], str]:
+    """
+    Assign text to SECTION_HEADERS using heading and layout cues only.
+
+    Accepts either the full text or the page-indexed text from ingestion
+    (which enables the top-of-page cue). Returns ``(sections, ambiguous)``
+    where ``ambiguous`` is the text that could not be placed confidently:
+    anything before the first recognised heading and anything under a
+    heading that does not map to a known section.
+
+    With a page ``cache``, each page's segments are stored as an artifact
+    keyed by the hash of the page text (OCR can replace the text of a PDF
+    page, so its content hash is not enough), and a revised CIM only
+    re-scans the pages that changed.
+    """
+    if pages is None:
+        pages = [text or ""]
+
+    cached = {}
+    page_hashes = None
+    if cache is not None:
+        page_hashes = ["text-" + hashlib.sha256(page.encode("utf-8")).hexdigest() for page in pages]
+        artifact = f"sections:{min_confidence}:{RULES_DIGEST}"
+        cached = cache.get_artifacts(page_hashes, artifact)
+        fresh = {page_hash: page_segments(page, min_confidence)
+                 for page, page_hash in zip(pages, page_hashes) if page_hash not in cached}
+        if fresh:
+            cache.put_artifacts(artifact, fresh)
+        cached.update(fresh)
+
+    buckets = {header: [] for header in HEADING_SYNONYMS}
+    ambiguous = []
+    current = None
+
+    for index, page in enumerate(pages):
+        segments = cached.get(page_hashes[index]) if cached else None
+        for label, body in segments or page_segments(page, min_confidence):
+            if label is not None:
+                current = label or None
+            if body:
+                (buckets[current] if current else ambiguous).append(body)
+
+    sections = {header: "\n".join(lines).strip() for header, lines in buckets.items()}
+    return sections, "\n".join(ambiguous).strip()
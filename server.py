@@ -0,0 +1,383 @@
+"""
+Long-running HTTP service: accepts CIM uploads and runs them through the
+pipeline on a warm worker pool.
+
+    python main.py serve --port 8000 --workers 2 --queue-size 16
+
+    curl --data-binary @cim.pdf "http://127.0.0.1:8000/jobs?filename=cim.pdf"
+    curl http://127.0.0.1:8000/jobs/<id>
+    curl -o deck.pptx http://127.0.0.1:8000/jobs/<id>/deck
+
+Endpoints:
+    POST /jobs?filename=NAME       upload a .pdf/.txt/.md (raw body); 202 with the job,
+                                   503 + Retry-After when the queue is full
+    GET  /jobs                     all known jobs
+    GET  /jobs/<id>                status, current stage, error, artifact links
+    GET  /jobs/<id>/summary|deck|data
+                                   download an artifact once the job is done
+    GET  /health                   queue depth and worker count
+    GET  /metrics                  run metrics in the Prometheus text format
+
+Built on asyncio streams only. Jobs run in threads (the pipeline blocks on
+LLM calls) and share one process, so the OpenAI client, its connection
+pool, the SQLite caches and the in-memory page indexes stay warm between
+requests.
+"""
+import asyncio
+import json
+import math
+import os
+import secrets
+import shutil
+import time
+import urllib.parse
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+import config
+from batch import SUPPORTED_EXTENSIONS
+from metrics import metrics
+from pipeline import PipelineRun
+
+SERVER_HOST = config.get("SERVER_HOST", "127.0.0.1")
+SERVER_PORT = config.get_int("SERVER_PORT", 8000)
+SERVER_WORKERS = config.get_int("SERVER_WORKERS", 2)
+SERVER_QUEUE_SIZE = config.get_int("SERVER_QUEUE_SIZE", 16)
+SERVER_JOB_DIR = config.get("SERVER_JOB_DIR", os.path.join(".cim_cache", "jobs"))
+SERVER_MAX_UPLOAD_MB = config.get_int("SERVER_MAX_UPLOAD_MB", 100)
+SERVER_KEEP_JOBS = config.get_int("SERVER_KEEP_JOBS", 200)
+# Stages and LLM calls kept in detail for /metrics (totals are always kept)
+SERVER_METRICS_WINDOW = config.get_int("SERVER_METRICS_WINDOW", 1000)
+READ_TIMEOUT = 60
+CHUNK_BYTES = 1 << 16
+DEFAULT_RETRY_AFTER = 30
+
+ARTIFACTS = {
+    'summary': ('summary.md', 'text/markdown; charset=utf-8'),
+    'deck': ('deck.pptx', 'application/vnd.openxmlformats-officedocument.presentationml.presentation'),
+    'data': ('pptx_data.json', 'application/json'),
+}
+REASONS = {200: 'OK', 202: 'Accepted', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           409: 'Conflict', 411: 'Length Required', 413: 'Payload Too Large', 415: 'Unsupported Media Type',
+           500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+class Job:
+    """One uploaded CIM and its outputs, stored under its own directory"""
+
+    def __init__(self, job_id: str, filename: str, directory: str):
+        self.id = job_id
+        self.filename = filename
+        self.directory = directory
+        self.input_path = os.path.join(directory, filename)
+        self.status = 'queued'
+        self.stage = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+
+    def artifact_path(self, name: str) -> str:
+        return os.path.join(self.directory, ARTIFACTS[name][0])
+
+    def to_dict(self, position: Optional[int] = None) -> Dict[str, Any]:
+        data = {
+            'id': self.id,
+            'filename': self.filename,
+            'status': self.status,
+            'stage': self.stage,
+            'error': self.error,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+            'seconds': round(self.finished - self.started, 3) if self.finished and self.started else None,
+        }
+        if position is not None:
+            data['queue_position'] = position
+        if self.status == 'done':
+            data['artifacts'] = {name: f"/jobs/{self.id}/{name}" for name in ARTIFACTS}
+        return data
+
+
+def content_disposition(filename: str) -> str:
+    """Attachment header value: an ASCII fallback name plus the UTF-8 name per RFC 6266/5987"""
+    fallback = "".join(c if 32 <= ord(c) < 127 and c not in '"\\' else "_" for c in filename)
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{urllib.parse.quote(filename, safe='')}"
+
+
+def warm_up():
+    """Load the pipeline's heavy dependencies and the OpenAI client before the first request"""
+    import PyPDF2  # noqa: F401
+    import pptx  # noqa: F401
+    from llm import get_client
+    try:
+        get_client()
+    except Exception as e:
+        print(f"OpenAI client not ready: {e}")
+
+
+class JobServer:
+    """
+    asyncio HTTP front end over a bounded job queue.
+
+    Uploads are streamed to disk and queued; ``workers`` consumer tasks each
+    run one job at a time on a thread. Once ``queue_size`` jobs are waiting,
+    uploads are refused with 503 and a Retry-After estimated from recent job
+    durations, before the body is read. Only the newest ``keep_jobs``
+    finished jobs (and their files) are kept.
+    """
+
+    def __init__(self, job_dir: str = SERVER_JOB_DIR, workers: int = SERVER_WORKERS,
+                 queue_size: int = SERVER_QUEUE_SIZE, max_upload_mb: int = SERVER_MAX_UPLOAD_MB,
+                 keep_jobs: int = SERVER_KEEP_JOBS):
+        self.job_dir = job_dir
+        self.workers = max(1, workers)
+        self.queue_size = max(1, queue_size)
+        self.max_upload = max_upload_mb * 1024 * 1024
+        self.keep_jobs = keep_jobs
+        self.jobs: Dict[str, Job] = OrderedDict()
+        self.waiting = []
+        self.queue = None
+        self.pool = None
+        self.server = None
+        self._tasks = []
+        self._durations = []
+
+    async def start(self, host: str = SERVER_HOST, port: int = SERVER_PORT):
+        os.makedirs(self.job_dir, exist_ok=True)
+        metrics.set_max_records(SERVER_METRICS_WINDOW)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, warm_up)
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="cim-job")
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self.server = await asyncio.start_server(self._handle, host, port)
+        return self.server
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+        from llm import close
+        close()
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.queue.get()
+            try:
+                self.waiting.remove(job.id)
+                await loop.run_in_executor(self.pool, self._run_job, job)
+                if job.started and job.finished:
+                    self._durations = (self._durations + [job.finished - job.started])[-20:]
+                await self._prune()
+            finally:
+                self.queue.task_done()
+
+    @staticmethod
+    def _run_job(job: Job):
+        job.status = 'running'
+        job.started = time.time()
+        run = PipelineRun(job.input_path)
+        try:
+            job.stage = 'ingest'
+            run.result('ingest')
+            job.stage = 'parse'
+            run.start_overlapped()
+            job.stage = 'summarize'
+            run.write_summary(job.artifact_path('summary'))
+            job.stage = 'render'
+            run.render(job.artifact_path('deck'), job.artifact_path('data'))
+        except Exception as e:
+            print(f"Job {job.id} failed in {job.stage}: {e}")
+            job.status = 'failed'
+            job.error = str(e)
+        else:
+            job.status = 'done'
+            job.stage = None
+        finally:
+            job.finished = time.time()
+
+    async def _prune(self):
+        """Forget the oldest finished jobs beyond keep_jobs and delete their files on a thread"""
+        finished = [job for job in self.jobs.values() if job.status in ('done', 'failed')]
+        for job in finished[:max(0, len(finished) - self.keep_jobs)]:
+            del self.jobs[job.id]
+            await asyncio.to_thread(shutil.rmtree, job.directory, True)
+
+    def retry_after(self) -> int:
+        """Seconds until a queue slot is likely to free up"""
+        if not self._durations:
+            return DEFAULT_RETRY_AFTER
+        average = sum(self._durations) / len(self._durations)
+        return max(1, math.ceil(average * self.queue.qsize() / self.workers))
+
+    def position(self, job: Job) -> Optional[int]:
+        return self.waiting.index(job.id) + 1 if job.id in self.waiting else None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), READ_TIMEOUT)
+            request_line, *header_lines = head.decode('latin-1').split("\r\n")
+            method, target, _ = request_line.split(" ", 2)
+            headers = {}
+            for line in header_lines:
+                if ":" in line:
+                    name, value = line.split(":", 1)
+                    headers[name.strip().lower()] = value.strip()
+            url = urllib.parse.urlsplit(target)
+            await self._route(method, url.path.rstrip("/") or "/", urllib.parse.parse_qs(url.query),
+                              headers, reader, writer)
+        except ValueError as e:
+            try:
+                await self._send_json(writer, 400, {'error': f"malformed request: {e}"})
+            except ConnectionError:
+                pass
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ConnectionError):
+            pass
+        except Exception as e:
+            print(f"Request failed: {e}")
+            try:
+                await self._send_json(writer, 500, {'error': str(e)})
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+    async def _route(self, method, path, query, headers, reader, writer):
+        parts = path.strip("/").split("/")
+        if path == "/health" and method == "GET":
+            return await self._send_json(writer, 200, {
+                'workers': self.workers,
+                'queued': self.queue.qsize(),
+                'queue_size': self.queue_size,
+                'running': sum(1 for job in self.jobs.values() if job.status == 'running'),
+            })
+        if path == "/metrics" and method == "GET":
+            return await self._send(writer, 200, metrics.to_prometheus().encode('utf-8'),
+                                    'text/plain; version=0.0.4')
+        if parts[0] != "jobs":
+            return await self._send_json(writer, 404, {'error': 'not found'})
+        if len(parts) == 1:
+            if method == "POST":
+                return await self._submit(query, headers, reader, writer)
+            if method == "GET":
+                return await self._send_json(writer, 200, {
+                    'jobs': [job.to_dict(self.position(job)) for job in self.jobs.values()]
+                })
+            return await self._send_json(writer, 405, {'error': 'use GET or POST'})
+
+        job = self.jobs.get(parts[1])
+        if job is None:
+            return await self._send_json(writer, 404, {'error': 'unknown job'})
+        if method != "GET":
+            return await self._send_json(writer, 405, {'error': 'use GET'})
+        if len(parts) == 2:
+            return await self._send_json(writer, 200, job.to_dict(self.position(job)))
+        if len(parts) == 3 and parts[2] in ARTIFACTS:
+            if job.status != 'done':
+                return await self._send_json(writer, 409, {'error': f"job is {job.status}", 'status': job.status})
+            return await self._send_file(writer, job.artifact_path(parts[2]), ARTIFACTS[parts[2]][1],
+                                         f"{os.path.splitext(job.filename)[0]}-{ARTIFACTS[parts[2]][0]}")
+        return await self._send_json(writer, 404, {'error': 'not found'})
+
+    async def _submit(self, query, headers, reader, writer):
+        filename = os.path.basename((query.get('filename') or [headers.get('x-filename', '')])[0])
+        if not filename.lower().endswith(SUPPORTED_EXTENSIONS):
+            return await self._send_json(writer, 415, {'error': f"filename must end in {', '.join(SUPPORTED_EXTENSIONS)}"})
+        if 'content-length' not in headers:
+            return await self._send_json(writer, 411, {'error': 'Content-Length required'})
+        if not headers['content-length'].isdigit():
+            return await self._send_json(writer, 400, {'error': 'Content-Length must be a non-negative integer'})
+        length = int(headers['content-length'])
+        if length > self.max_upload:
+            return await self._send_json(writer, 413, {'error': f"upload larger than {self.max_upload} bytes"})
+        if self.queue.full():
+            return await self._send_busy(writer)
+        if headers.get('expect', '').lower() == '100-continue':
+            writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+            await writer.drain()
+
+        job_id = secrets.token_hex(8)
+        job = Job(job_id, filename, os.path.join(self.job_dir, job_id))
+        # File I/O runs on threads so a slow disk does not stall other requests
+        await asyncio.to_thread(os.makedirs, job.directory)
+        try:
+            remaining = length
+            f = await asyncio.to_thread(open, job.input_path, 'wb')
+            try:
+                while remaining:
+                    chunk = await asyncio.wait_for(reader.read(min(CHUNK_BYTES, remaining)), READ_TIMEOUT)
+                    if not chunk:
+                        raise asyncio.IncompleteReadError(b"", remaining)
+                    await asyncio.to_thread(f.write, chunk)
+                    remaining -= len(chunk)
+            finally:
+                await asyncio.to_thread(f.close)
+        except BaseException:
+            await asyncio.to_thread(shutil.rmtree, job.directory, True)
+            raise
+        # Other uploads may have filled the queue while this body was read
+        if self.queue.full():
+            await asyncio.to_thread(shutil.rmtree, job.directory, True)
+            return await self._send_busy(writer)
+        self.jobs[job_id] = job
+        self.waiting.append(job_id)
+        self.queue.put_nowait(job)
+        return await self._send_json(writer, 202, job.to_dict(self.position(job)),
+                                     {'Location': f"/jobs/{job_id}"})
+
+    async def _send_busy(self, writer):
+        retry_after = self.retry_after()
+        await self._send_json(writer, 503, {'error': 'queue is full', 'retry_after': retry_after},
+                              {'Retry-After': str(retry_after)})
+
+    async def _send(self, writer, status: int, body: bytes, content_type: str, extra: Dict[str, str] = None):
+        lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+                 f"Content-Type: {content_type}",
+                 f"Content-Length: {len(body)}",
+                 "Connection: close"]
+        lines += [f"{name}: {value}" for name, value in (extra or {}).items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1') + body)
+        await writer.drain()
+
+    async def _send_json(self, writer, status: int, payload: Any, extra: Dict[str, str] = None):
+        await self._send(writer, status, json.dumps(payload, indent=2).encode('utf-8'), 'application/json', extra)
+
+    async def _send_file(self, writer, path: str, content_type: str, download_name: str):
+        try:
+            f = await asyncio.to_thread(open, path, 'rb')
+        except FileNotFoundError:
+            return await self._send_json(writer, 404, {'error': 'artifact missing'})
+        try:
+            header = (f"HTTP/1.1 200 OK\r\nContent-Type: {content_type}\r\n"
+                      f"Content-Length: {os.fstat(f.fileno()).st_size}\r\n"
+                      f"Content-Disposition: {content_disposition(download_name)}\r\n"
+                      "Connection: close\r\n\r\n")
+            writer.write(header.encode('latin-1'))
+            while True:
+                chunk = await asyncio.to_thread(f.read, CHUNK_BYTES)
+                if not chunk:
+                    break
+                writer.write(chunk)
+                await writer.drain()
+        finally:
+            await asyncio.to_thread(f.close)
+
+
+async def serve(host: str = SERVER_HOST, port: int = SERVER_PORT, **options):
+    """Run a JobServer until cancelled"""
+    job_server = JobServer(**options)
+    server = await job_server.start(host, port)
+    print(f"Listening on http://{host}:{server.sockets[0].getsockname()[1]} "
+          f"({job_server.workers} workers, queue of {job_server.queue_size})")
+    try:
+        await server.serve_forever()
+    finally:
+        await job_server.close()
@@ -0,0 +1,28 @@
+import os
+import sqlite3
+import time
+from typing import Sequence
+
+
+def open_database(path: str, schema: Sequence[str], prune: Sequence[str] = (),
+                  max_age: float = None) -> sqlite3.Connection:
+    """
+    Open one of the on-disk stores, shared across threads (callers hold
+    their own lock). Creates the parent directory, switches to WAL so
+    readers and the writer do not block each other, runs the ``schema``
+    statements, then the ``prune`` statements with the expiry cutoff
+    (now minus ``max_age`` seconds) as their only parameter.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    for statement in schema:
+        conn.execute(statement)
+    if prune and max_age is not None:
+        expired = time.time() - max_age
+        for statement in prune:
+            conn.execute(statement, (expired,))
+    conn.commit()
+    return conn
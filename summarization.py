@@ -1,16 +1,31 @@
-import openai
-from typing import Dict, List, Any
-from dotenv import load_dotenv
-import os
+from typing import Dict, List, Any, Iterator, TextIO, Callable, Sequence, Tuple
+import config
+import queue
+from concurrent.futures import FIRST_COMPLETED, wait
 from parsing import SECTION_HEADERS
+from llm import stream_chat, ContextThreadPoolExecutor
+from metric_extraction import extract_metrics, is_confident
+from metrics import metrics
+from tokens import fit_prompt_text
+from page_index import index_for
+from near_duplicates import near_duplicates
 
-load_dotenv()
-client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+SUMMARY_CONCURRENCY = config.get_int("SUMMARY_CONCURRENCY", 4)
+SUMMARY_TITLE = "# Investment Memorandum Executive Summary"
+SUMMARY_HEADINGS = {
+    "Company Overview": "Business Overview & Value Proposition",
+    "Financials": "Financial Performance Analysis",
+    "Market Opportunity": "Market Opportunity & Competitive Position",
+    "Risks": "Investment Considerations & Risk Factors"
+}
+SUMMARY_FAILED = "Summary could not be generated for this section."
+SECTION_MISSING = "Information not available in the document."
 
-def summarize_text(section_name: str, section_text: str) -> str:
+def summary_request(section_name: str, section_text: str) -> Dict[str, Any]:
     """
-    Generate a professional investment-focused summary using the OpenAI API.
-    Each section type has specific formatting and focus points.
+    Chat completion arguments for an investment-focused summary of one
+    section. Each section type has specific formatting and focus points.
+    ``section_text`` goes into the prompt as given (fit it to the budget first).
     """
     section_prompts = {
         "Company Overview": """Analyze and summarize the following company overview for an investment memorandum. 
@@ -61,7 +76,7 @@ def summarize_text(section_name: str, section_text: str) -> str:
     base_prompt = section_prompts.get(section_name, "Summarize the following section professionally:")
     full_prompt = f"{base_prompt}\n\n{section_text}"
     
-    response = client.chat.completions.create(
+    return dict(
         model="gpt-4.1",
         messages=[
             {"role": "system", "content": "You are an expert investment analyst providing clear, concise, and professional summaries for investment memorandums."},
@@ -70,26 +85,144 @@ def summarize_text(section_name: str, section_text: str) -> str:
         temperature=0,
         max_tokens=500
     )
-    
-    return response.choices[0].message.content.strip()
 
-def summarize_sections(parsed_data: Dict[str, Any]) -> Dict[str, str]:
+def summarize_text(section_name: str, section_text: str) -> str:
+    """
+    Generate a professional investment-focused summary using the OpenAI API.
+    A section near-identical to one summarized before reuses or updates
+    that summary (see near_duplicates.py).
+    """
+    text = fit_prompt_text('section_summary', section_text)
+    content = near_duplicates.complete(f"summary:{section_name}", text, summary_request(section_name, text))
+    return content.strip()
+
+def summarize_text_stream(section_name: str, section_text: str) -> Iterator[str]:
+    """
+    Stream the summary of one section as it is generated. Leading and
+    trailing whitespace is dropped, so the joined output equals
+    summarize_text().
+    """
+    prompt_text = fit_prompt_text('section_summary', section_text)
+    kind, content, request = near_duplicates.prepare(f"summary:{section_name}", prompt_text,
+                                                     summary_request(section_name, prompt_text))
+    if content is not None:
+        near_duplicates.add(kind, prompt_text, content)
+        if content.strip():
+            yield content.strip()
+        return
+
+    received = []
+    pending = ""
+    started = False
+    for delta in stream_chat(**request):
+        received.append(delta)
+        if not started:
+            delta = delta.lstrip()
+            started = bool(delta)
+        pending += delta
+        # Hold back trailing whitespace until we know more text follows it
+        text = pending.rstrip()
+        if text:
+            yield text
+            pending = pending[len(text):]
+    near_duplicates.add(kind, prompt_text, "".join(received))
+
+def summarize_section(section: str, text: str) -> str:
+    """summarize_text() that logs a failure and returns a placeholder instead of raising"""
+    try:
+        return summarize_text(section, text)
+    except Exception as e:
+        print(f"Summary for {section} failed: {e}")
+        metrics.record_failure(f"summary:{section}")
+        return SUMMARY_FAILED
+
+def summarize_sections(parsed_data: Dict[str, Any], max_workers: int = SUMMARY_CONCURRENCY) -> Dict[str, str]:
     """
     Process each section of the CIM and generate professional summaries
     focused on investment relevance.
+
+    Section summaries are requested concurrently (at most ``max_workers``
+    at a time). The result always follows SECTION_HEADERS order, and a
+    failed call only affects its own section.
     """
     sections = parsed_data['sections']
+    pending = [s for s in SECTION_HEADERS if s in sections and sections[s].strip()]
+
+    def summarize_one(section):
+        return summarize_section(section, sections[section])
+
+    results = {}
+    if pending:
+        with ContextThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pending)))) as pool:
+            results = dict(zip(pending, pool.map(summarize_one, pending)))
+
     summary = {}
     for section in SECTION_HEADERS:
-        if section in sections and sections[section].strip():
-            summary[section] = summarize_text(section, sections[section])
-        else:
-            summary[section] = "Information not available in the document."
-    
+        summary[section] = results.get(section, SECTION_MISSING)
+
+    return summary
+
+def stream_summary(parsed_data: Dict[str, Any], out: TextIO, echo: Callable[[str], None] = None,
+                   max_workers: int = SUMMARY_CONCURRENCY) -> Dict[str, str]:
+    """
+    Summarize the sections and write the executive summary to ``out`` as
+    it is generated, in the same layout as format_summary().
+
+    Sections stream concurrently: the one being written goes straight
+    through and later ones are buffered until their turn, so the file stays
+    in SECTION_HEADERS order. ``echo`` (if given) receives the same text.
+    Returns the same dict as summarize_sections().
+    """
+    sections = parsed_data['sections']
+    pending = [s for s in SECTION_HEADERS if s in sections and sections[s].strip()]
+    streams = {section: queue.Queue() for section in pending}
+    done = object()
+
+    def produce(section):
+        streamed = False
+        try:
+            for delta in summarize_text_stream(section, sections[section]):
+                streamed = True
+                streams[section].put(delta)
+        except Exception as e:
+            print(f"Summary for {section} failed: {e}")
+            metrics.record_failure(f"summary:{section}")
+            streams[section].put(("\n\n" if streamed else "") + SUMMARY_FAILED)
+        finally:
+            streams[section].put(done)
+
+    def write(text):
+        out.write(text)
+        out.flush()
+        if echo:
+            echo(text)
+
+    summary = {}
+    with ContextThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pending) or 1))) as pool:
+        for section in pending:
+            pool.submit(produce, section)
+        write(SUMMARY_TITLE + "\n\n")
+        for section in SECTION_HEADERS:
+            write(f"## {SUMMARY_HEADINGS[section]}\n")
+            parts = []
+            if section in streams:
+                for delta in iter(streams[section].get, done):
+                    parts.append(delta)
+                    write(delta)
+            else:
+                parts.append(SECTION_MISSING)
+                write(SECTION_MISSING)
+            write("\n\n")
+            summary[section] = "".join(parts)
+
     return summary
 
 def extract_financial_metrics(financial_text: str) -> Dict[str, Any]:
-    """Extract structured financial metrics using AI analysis"""
+    """Extract structured financial metrics, skipping the AI call when the regex engine is confident"""
+    regex_metrics, confidence = extract_metrics(financial_text)
+    if is_confident(confidence):
+        return {key: regex_metrics[key] for key in ('revenue', 'revenue_growth', 'ebitda', 'ebitda_margin')}
+
     prompt = """Extract key financial metrics from the following text. Return them in this exact format:
     {
         "revenue": "latest annual revenue with unit (e.g., $100M)",
@@ -102,21 +235,22 @@ def extract_financial_metrics(financial_text: str) -> Dict[str, Any]:
     Text to analyze:
     """
     
-    response = client.chat.completions.create(
+    text = fit_prompt_text('financial_metrics', financial_text)
+    content = near_duplicates.complete('financial_metrics', text, dict(
         model="gpt-4.1",
         messages=[
             {"role": "system", "content": "You are a financial analyst extracting key metrics in a structured format."},
-            {"role": "user", "content": prompt + "\n" + financial_text}
+            {"role": "user", "content": prompt + "\n" + text}
         ],
         temperature=0,
         max_tokens=200
-    )
+    ))
     
     try:
         import json
-        metrics = json.loads(response.choices[0].message.content.strip())
-        return metrics
+        return json.loads(content.strip())
     except:
+        metrics.record_failure("extract:financial_metrics")
         return {}
 
 def extract_company_info(overview_text: str) -> Dict[str, Any]:
@@ -133,21 +267,23 @@ def extract_company_info(overview_text: str) -> Dict[str, Any]:
     Text to analyze:
     """
     
-    response = client.chat.completions.create(
+    text = fit_prompt_text('company_info', overview_text)
+    content = near_duplicates.complete('company_info', text, dict(
         model="gpt-4.1",
         messages=[
             {"role": "system", "content": "You are a business analyst extracting company information in a structured format."},
-            {"role": "user", "content": prompt + "\n" + overview_text}
+            {"role": "user", "content": prompt + "\n" + text}
         ],
         temperature=0,
         max_tokens=200
-    )
+    ))
     
     try:
         import json
-        info = json.loads(response.choices[0].message.content.strip())
+        info = json.loads(content.strip())
         return info
     except:
+        metrics.record_failure("extract:company_info")
         return {}
 
 def extract_market_info(market_text: str) -> Dict[str, Any]:
@@ -163,21 +299,23 @@ def extract_market_info(market_text: str) -> Dict[str, Any]:
     Text to analyze:
     """
     
-    response = client.chat.completions.create(
+    text = fit_prompt_text('market_info', market_text)
+    content = near_duplicates.complete('market_info', text, dict(
         model="gpt-4.1",
         messages=[
             {"role": "system", "content": "You are a market analyst extracting market information in a structured format."},
-            {"role": "user", "content": prompt + "\n" + market_text}
+            {"role": "user", "content": prompt + "\n" + text}
         ],
         temperature=0,
         max_tokens=200
-    )
+    ))
     
     try:
         import json
-        info = json.loads(response.choices[0].message.content.strip())
+        info = json.loads(content.strip())
         return info
     except:
+        metrics.record_failure("extract:market_info")
         return {}
 
 def extract_investment_highlights(all_sections_text: str) -> List[str]:
@@ -192,61 +330,227 @@ def extract_investment_highlights(all_sections_text: str) -> List[str]:
     Text to analyze:
     """
     
-    response = client.chat.completions.create(
+    text = fit_prompt_text('highlights', all_sections_text)
+    content = near_duplicates.complete('highlights', text, dict(
         model="gpt-4.1",
         messages=[
             {"role": "system", "content": "You are an investment banker creating compelling investment highlights."},
-            {"role": "user", "content": prompt + "\n" + all_sections_text}
+            {"role": "user", "content": prompt + "\n" + text}
         ],
         temperature=0,
         max_tokens=300
-    )
+    ))
     
-    highlights = response.choices[0].message.content.strip().split("\n")
+    highlights = content.strip().split("\n")
 
     highlights = [h.strip().lstrip("1234567890. ") for h in highlights if h.strip()]
     return highlights[:5]
 
-def process_for_presentation(parsed_data: Dict[str, Any]) -> Dict[str, Any]:
-    """Process all data needed for presentation generation"""
-    sections = parsed_data['sections']
-    presentation_data = {
+def run_task_graph(tasks: Dict[str, Any], max_workers: int = SUMMARY_CONCURRENCY) -> Dict[str, Any]:
+    """
+    Run a small dependency graph of blocking tasks on a thread pool.
+
+    ``tasks`` maps a name to ``(fn, deps, default)``. ``fn`` receives a dict
+    with the results of ``deps`` and is started as soon as all of them have
+    finished. A failing task is logged and replaced by ``default``.
+    """
+    results = {}
+    remaining = dict(tasks)
+    running = {}
+
+    with ContextThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        while remaining or running:
+            for name, (fn, deps, _) in list(remaining.items()):
+                if all(dep in results for dep in deps):
+                    running[pool.submit(fn, {dep: results[dep] for dep in deps})] = name
+                    del remaining[name]
+            if not running:
+                raise ValueError(f"Unresolvable task dependencies: {sorted(remaining)}")
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    print(f"{name} extraction failed: {e}")
+                    metrics.record_failure(f"extract:{name}")
+                    results[name] = tasks[name][2]
+
+    return results
+
+def document_facts(parsed_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Flatten facts carried over from ingestion into precomputed results"""
+    analysis = parsed_data.get('analysis') or {}
+    facts = {
+        'company_info': analysis.get('company_info'),
+        'market_info': analysis.get('market_info'),
+        'key_highlights': analysis.get('key_highlights'),
+        'financial_metrics': parsed_data.get('financial_metrics')
+    }
+    # Ingestion asks for null where a value is not found, so a dict of nulls is not a result
+    return {name: value for name, value in facts.items()
+            if (any(value.values()) if isinstance(value, dict) else value)}
+
+# presentation field -> (section it is extracted from, extractor, value on failure)
+SECTION_EXTRACTORS = {
+    'company_info': ('Company Overview', extract_company_info, {}),
+    'market_info': ('Market Opportunity', extract_market_info, {}),
+    'financial_metrics': ('Financials', extract_financial_metrics, {}),
+}
+# presentation field -> page index call site (see page_index.TOP_K)
+INDEX_SITES = {'company_info': 'company_info', 'market_info': 'market_info',
+               'financial_metrics': 'financial_metrics', 'key_highlights': 'highlights'}
+
+def uses_index(name: str, index) -> bool:
+    return index is not None and index.covers(INDEX_SITES[name])
+
+def extractor_text(name: str, sections: Dict[str, str], index) -> Tuple[str, List[int]]:
+    """
+    Text a presentation extractor is given, with its source page numbers:
+    the top-ranked pages when the page index narrows the document down,
+    otherwise its section (every section for the highlights).
+    """
+    if uses_index(name, index):
+        numbers = index.relevant_pages(INDEX_SITES[name])
+        return index.pages_text(numbers), numbers
+    if name == 'key_highlights':
+        return " ".join(sections.values()), []
+    return sections[SECTION_EXTRACTORS[name][0]], []
+
+def presentation_result(results: Dict[str, Any], sources: Dict[str, List[int]] = None) -> Dict[str, Any]:
+    result = {
         'analysis': {
-            'company_info': {},
-            'market_info': {},
-            'key_highlights': []
+            'company_info': results.get('company_info', {}),
+            'market_info': results.get('market_info', {}),
+            'key_highlights': results.get('key_highlights', [])
         },
-        'financial_metrics': {}
+        'financial_metrics': results.get('financial_metrics', {})
     }
-    
-    if 'Company Overview' in sections:
-        presentation_data['analysis']['company_info'] = extract_company_info(sections['Company Overview'])
-    
-    if 'Market Opportunity' in sections:
-        presentation_data['analysis']['market_info'] = extract_market_info(sections['Market Opportunity'])
-    
-    if 'Financials' in sections:
-        presentation_data['financial_metrics'] = extract_financial_metrics(sections['Financials'])
-    
-    all_text = " ".join(sections.values())
-    presentation_data['analysis']['key_highlights'] = extract_investment_highlights(all_text)
-    
-    return presentation_data
+    sources = {name: pages for name, pages in (sources or {}).items() if pages}
+    if sources:
+        result['sources'] = sources
+    return result
+
+def process_for_presentation(parsed_data: Dict[str, Any], precomputed: Dict[str, Any] = None,
+                             max_workers: int = SUMMARY_CONCURRENCY, pages: Sequence[str] = None) -> Dict[str, Any]:
+    """
+    Process all data needed for presentation generation.
+
+    The extractors run concurrently. Facts extracted during ingestion
+    (parsed_data['analysis'] and parsed_data['financial_metrics']) and any
+    non-empty result passed in ``precomputed`` (keyed by company_info,
+    market_info, financial_metrics or key_highlights) are reused and their
+    LLM calls are skipped. Given the document's ``pages`` (its PageView),
+    extractors read their top-ranked pages instead of whole sections; the
+    pages used are listed under 'sources'.
+    """
+    sections = parsed_data['sections']
+    precomputed = {**document_facts(parsed_data), **(precomputed or {})}
+    index = index_for(pages)
+
+    extractors = {name: (extractor, default) for name, (section, extractor, default) in SECTION_EXTRACTORS.items()
+                  if section in sections or uses_index(name, index)}
+    # The highlights prompt only reads the document text, so it has no
+    # dependency on the other extractors and runs alongside them.
+    extractors['key_highlights'] = (extract_investment_highlights, [])
+
+    tasks = {}
+    sources = {}
+    for name, (extractor, default) in extractors.items():
+        if precomputed.get(name):
+            continue
+        text, sources[name] = extractor_text(name, sections, index)
+        tasks[name] = ((lambda extractor, text: lambda _: extractor(text))(extractor, text), [], default)
+
+    results = {name: value for name, value in precomputed.items() if value}
+    results.update(run_task_graph(tasks, max_workers))
+
+    return presentation_result(results, sources)
+
+class SectionPipeline:
+    """
+    Starts summarization and presentation extraction for each section as
+    soon as sectioning reports it (pass ``add`` as parse_sections'
+    ``on_section``), so they overlap with the rest of the sectioning call.
+    Extractors that read from the page index (``pages``) do not need a
+    section at all and start immediately. ``finish`` waits for everything
+    and returns the same results as summarize_sections() and
+    process_for_presentation().
+    """
+
+    def __init__(self, precomputed: Dict[str, Any] = None, pages: List[str] = None,
+                 max_workers: int = SUMMARY_CONCURRENCY):
+        self.precomputed = {name: value for name, value in (precomputed or {}).items() if value}
+        self.index = index_for(pages)
+        self.pool = ContextThreadPoolExecutor(max_workers=max(1, max_workers))
+        self.summaries = {}
+        self.extractions = {}
+        self.sources = {}
+        extractors = {name: extractor for name, (_, extractor, _) in SECTION_EXTRACTORS.items()}
+        extractors['key_highlights'] = extract_investment_highlights
+        for name, extractor in extractors.items():
+            if uses_index(name, self.index) and not self.precomputed.get(name):
+                self._extract(name, extractor, {})
+
+    @staticmethod
+    def _attributed(stage, fn, *args):
+        with metrics.attribute(stage):
+            return fn(*args)
+
+    def _extract(self, name, extractor, sections):
+        text, self.sources[name] = extractor_text(name, sections, self.index)
+        self.extractions[name] = self.pool.submit(self._attributed, 'present', extractor, text)
+
+    def add(self, section: str, text: str):
+        if section in self.summaries:
+            return
+        self.summaries[section] = None
+        if text.strip():
+            self.summaries[section] = self.pool.submit(self._attributed, 'summarize', summarize_section, section, text)
+        for name, (source, extractor, _) in SECTION_EXTRACTORS.items():
+            if source == section and name not in self.extractions and not self.precomputed.get(name):
+                self._extract(name, extractor, {section: text})
+
+    def finish(self, parsed_data: Dict[str, Any]):
+        """Return ``(summary_dict, presentation_data)`` once every task is done"""
+        sections = parsed_data['sections']
+        for section in SECTION_HEADERS:
+            self.add(section, sections.get(section) or "")
+        if 'key_highlights' not in self.extractions and not self.precomputed.get('key_highlights'):
+            self._extract('key_highlights', extract_investment_highlights, sections)
+
+        try:
+            summary = {}
+            for section in SECTION_HEADERS:
+                future = self.summaries.get(section)
+                summary[section] = future.result() if future is not None else SECTION_MISSING
+
+            results = {**document_facts(parsed_data), **self.precomputed}
+            defaults = {name: default for name, (_, _, default) in SECTION_EXTRACTORS.items()}
+            defaults['key_highlights'] = []
+            for name, future in self.extractions.items():
+                source = SECTION_EXTRACTORS.get(name, (None,))[0]
+                if source is not None and source not in sections and not uses_index(name, self.index):
+                    self.sources.pop(name, None)
+                    continue
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    print(f"{name} extraction failed: {e}")
+                    metrics.record_failure(f"extract:{name}", stage='present')
+                    results[name] = defaults[name]
+        finally:
+            self.pool.shutdown(wait=True)
+
+        return summary, presentation_result(results, self.sources)
 
 def format_summary(summary_dict: Dict[str, str], parsed_data: Dict[str, Any]) -> str:
     """Format the investment memorandum summary in a professional markdown structure"""
-    md = "# Investment Memorandum Executive Summary\n\n"
-    
-    if "Company Overview" in summary_dict:
-        md += "## Business Overview & Value Proposition\n" + summary_dict["Company Overview"] + "\n\n"
-    
-    if "Financials" in summary_dict:
-        md += "## Financial Performance Analysis\n" + summary_dict["Financials"] + "\n\n"
-    
-    if "Market Opportunity" in summary_dict:
-        md += "## Market Opportunity & Competitive Position\n" + summary_dict["Market Opportunity"] + "\n\n"
+    md = SUMMARY_TITLE + "\n\n"
     
-    if "Risks" in summary_dict:
-        md += "## Investment Considerations & Risk Factors\n" + summary_dict["Risks"] + "\n\n"
+    for section, heading in SUMMARY_HEADINGS.items():
+        if section in summary_dict:
+            md += f"## {heading}\n" + summary_dict[section] + "\n\n"
     
-    return md
\ No newline at end of file
+    return md
@@ -0,0 +1,17 @@
+import os
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+# Stores are opened from settings read at import time; keep them out of .cim_cache
+_CACHE_DIR = tempfile.mkdtemp(prefix="cim-tests-")
+for name, filename in [('LLM_CACHE_PATH', 'llm_cache.sqlite3'), ('PAGE_CACHE_PATH', 'pages.sqlite3'),
+                       ('CHECKPOINT_PATH', 'checkpoints.sqlite3'), ('NEAR_DUP_PATH', 'near_duplicates.sqlite3')]:
+    os.environ[name] = os.path.join(_CACHE_DIR, filename)
+os.environ.setdefault('OPENAI_API_KEY', 'sk-test')
+# The mock server has no quota; keep the scheduler from pacing tests
+os.environ['LLM_RPM_LIMIT'] = str(10 ** 6)
+os.environ['LLM_TPM_LIMIT'] = str(10 ** 9)
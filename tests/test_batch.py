@@ -0,0 +1,37 @@
+import os
+
+from batch import discover_inputs, render_jobs
+
+
+def touch(root, *names):
+    for name in names:
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("x")
+
+
+def test_output_tree_and_outputs_are_not_inputs(tmp_path):
+    touch(tmp_path, "a.pdf", "sub/b.md", "a.summary.md", "out/sub/b.summary.md", "out/x.pdf", "notes.docx")
+    root, files = discover_inputs(str(tmp_path), exclude_dir=str(tmp_path / "out"))
+    assert root == str(tmp_path)
+    assert files == [str(tmp_path / "a.pdf"), str(tmp_path / "sub" / "b.md")]
+
+
+def test_output_dir_equal_to_source_excludes_nothing_but_outputs(tmp_path):
+    touch(tmp_path, "a.pdf", "a.summary.md")
+    assert discover_inputs(str(tmp_path), exclude_dir=str(tmp_path))[1] == [str(tmp_path / "a.pdf")]
+
+
+def test_glob_source_mirrors_against_its_fixed_prefix(tmp_path):
+    touch(tmp_path, "cims/2024/a.pdf", "cims/2024/b.txt")
+    root, files = discover_inputs(os.path.join(str(tmp_path), "cims", "**", "*.pdf"))
+    assert root == str(tmp_path / "cims") and files == [str(tmp_path / "cims" / "2024" / "a.pdf")]
+
+
+def test_render_jobs_pair_data_files_with_decks(tmp_path):
+    touch(tmp_path, "runs/pptx_data.json", "runs/deal.pptx_data.json")
+    jobs = render_jobs(str(tmp_path / "runs"), str(tmp_path / "decks"))
+    assert sorted(jobs) == [
+        (str(tmp_path / "runs" / "deal.pptx_data.json"), str(tmp_path / "decks" / "deal.pptx")),
+        (str(tmp_path / "runs" / "pptx_data.json"), str(tmp_path / "decks" / "deck.pptx")),
+    ]
@@ -0,0 +1,29 @@
+from json_stream import ObjectMemberStream
+
+
+def feed_all(parser, chunks):
+    members = []
+    for chunk in chunks:
+        members.extend(parser.feed(chunk))
+    return members
+
+
+def test_members_are_reported_as_their_values_close():
+    parser = ObjectMemberStream()
+    assert parser.feed('{"a": "one", "b"') == [('a', 'one')]
+    assert parser.feed(': {"x": [1, 2]}}') == [('b', {'x': [1, 2]})]
+
+
+def test_characters_split_across_chunks():
+    text = '```json\n{"Company Overview": "A, \\"quoted\\" {brace}", "Risks": ""}\n```'
+    members = feed_all(ObjectMemberStream(), list(text))
+    assert members == [('Company Overview', 'A, "quoted" {brace}'), ('Risks', '')]
+
+
+def test_input_after_the_object_is_ignored():
+    parser = ObjectMemberStream()
+    assert feed_all(parser, ['{"a": 1}', ', "b": 2}']) == [('a', 1)]
+
+
+def test_malformed_member_is_dropped():
+    assert feed_all(ObjectMemberStream(), ['{"a": nope, "b": 2}']) == [('b', 2)]
@@ -0,0 +1,56 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import llm
+from llm_cache import cache
+
+
+class FakeClient:
+    def __init__(self, chunks, started=None, release=None):
+        self.chat = self.completions = self
+        self.chunks, self.started, self.release = chunks, started, release
+
+    def create(self, **params):
+        def stream():
+            if self.started:
+                self.started.set()
+                self.release.wait(5)
+            yield from self.chunks
+        return stream()
+
+
+def chunk(text):
+    return SimpleNamespace(id='c1', usage=None, choices=[SimpleNamespace(finish_reason=None, delta=SimpleNamespace(content=text))])
+
+
+@pytest.fixture(autouse=True)
+def no_cache(monkeypatch):
+    monkeypatch.setattr(cache, 'bypass', True)
+
+
+def test_empty_stream_yields_nothing(monkeypatch):
+    monkeypatch.setattr(llm, 'get_client', lambda: FakeClient([]))
+    assert list(llm.stream_chat(model='m', messages=[{'role': 'user', 'content': 'hi'}])) == []
+
+
+def test_stream_holds_its_concurrency_slot_until_consumed(monkeypatch):
+    monkeypatch.setattr(llm, '_llm_slots', threading.BoundedSemaphore(1))
+    monkeypatch.setattr(llm, 'get_client', lambda: FakeClient([chunk("a"), chunk("b")]))
+    first = llm.stream_chat(model='m', messages=[{'role': 'user', 'content': 'one'}])
+    assert next(first) == "a"
+    assert not llm._llm_slots.acquire(blocking=False)
+    assert list(first) == ["b"]
+    assert llm._llm_slots.acquire(blocking=False)
+    llm._llm_slots.release()
+
+
+def test_abandoned_stream_releases_its_slot(monkeypatch):
+    monkeypatch.setattr(llm, '_llm_slots', threading.BoundedSemaphore(1))
+    monkeypatch.setattr(llm, 'get_client', lambda: FakeClient([chunk("a"), chunk("b")]))
+    stream = llm.stream_chat(model='m', messages=[{'role': 'user', 'content': 'one'}])
+    next(stream)
+    stream.close()
+    assert llm._llm_slots.acquire(blocking=False)
+    llm._llm_slots.release()
@@ -0,0 +1,63 @@
+from metric_extraction import extract_metrics, fill_missing, is_confident, parse_year, YEAR_RE, format_amount
+
+
+def test_clear_figures_are_extracted_with_high_confidence():
+    metrics, confidence = extract_metrics(
+        "Revenue was $120.5 million in FY2023. Revenue growth of 12.5% in FY2023. "
+        "Adjusted EBITDA was $30 million in FY2023, an EBITDA margin of 24.9%."
+    )
+    assert metrics['revenue'] == 'FY2023: $120.5M'
+    assert metrics['revenue_growth'] == 'FY2023: 12.5%'
+    assert metrics['ebitda'] == 'FY2023: $30M'
+    assert metrics['ebitda_margin'] == 'FY2023: 24.9%'
+    assert metrics['market_size'] is None
+    assert is_confident(confidence)
+
+
+def test_expense_lines_are_not_revenue():
+    metrics, confidence = extract_metrics(
+        "Sales and marketing expense was $12.5 million in FY2023.\n"
+        "Cost of sales was $40 million in FY2023.\n"
+    )
+    assert metrics['revenue'] is None
+    assert confidence['revenue'] == 0.0
+
+
+def test_revenue_line_beats_expense_and_regional_sales():
+    metrics, confidence = extract_metrics(
+        "Sales and marketing expense was $12.5 million in FY2023.\n"
+        "Revenue of $100M in FY2023, revenue growth of 10% in FY2023.\n"
+        "Sales growth in the Southwest region was 45% in FY2023.\n"
+    )
+    assert metrics['revenue'] == 'FY2023: $100M'
+    assert metrics['revenue_growth'] == 'FY2023: 10%'
+
+
+def test_bare_sales_is_never_confident_on_its_own():
+    metrics, confidence = extract_metrics("Net sales were $300 million in FY2023.")
+    assert metrics['revenue'] == 'FY2023: $300M'
+    assert confidence['revenue'] < 0.8
+
+
+def test_qualified_keyword_gets_no_year_bonus():
+    _, qualified = extract_metrics("The sales team closed $5 million of deals in FY2023.")
+    _, plain = extract_metrics("Net sales closed at $5 million of deals in FY2023.")
+    assert qualified['revenue'] < plain['revenue']
+
+
+def test_year_labels_are_normalised():
+    assert parse_year(YEAR_RE.search("FY23")) == "FY2023"
+    assert parse_year(YEAR_RE.search("fiscal 2022")) == "FY2022"
+    assert parse_year(YEAR_RE.search("2025E")) == "2025E"
+
+
+def test_amount_formatting():
+    assert format_amount(1.25e9) == "$1.25B"
+    assert format_amount(350e6) == "$350M"
+    assert format_amount(12500) == "$12,500"
+
+
+def test_fill_missing_only_uses_confident_values():
+    merged = fill_missing({'revenue': None, 'ebitda': '$1M'}, {'revenue': '$5M', 'ebitda': '$2M', 'ebitda_margin': '9%'},
+                          {'revenue': 0.9, 'ebitda': 0.9, 'ebitda_margin': 0.5})
+    assert merged == {'revenue': '$5M', 'ebitda': '$1M'}
@@ -0,0 +1,28 @@
+from metrics import RunMetrics
+
+
+def test_totals_survive_a_bounded_window():
+    metrics = RunMetrics(max_records=3)
+    for i in range(10):
+        with metrics.stage('parse'):
+            metrics.record_llm_call('gpt-4.1', 0.1 * (i + 1), prompt_tokens=10, completion_tokens=2)
+    metrics.record_llm_call('gpt-4.1', 0.5, cached=True)
+
+    assert len(metrics.stages) == 3 and len(metrics.llm_calls) == 3
+    report = metrics.report()
+    assert report['llm']['calls'] == 11 and report['llm']['upstream_calls'] == 10
+    assert report['llm']['by_stage']['parse']['prompt_tokens'] == 100
+    assert report['llm']['latency_p95'] == 1.0
+    assert 'cim_llm_call_seconds_count 10' in metrics.to_prometheus()
+
+
+def test_failures_are_collected_per_stage():
+    metrics = RunMetrics()
+    collected = {}
+    with metrics.collect_failures(collected):
+        with metrics.stage('summarize'):
+            metrics.record_failure('summary:Risks')
+        metrics.record_failure('extract:market_info', stage='present')
+    metrics.record_failure('outside')
+    assert collected == {'summarize': ['summary:Risks'], 'present': ['extract:market_info']}
+    assert metrics.report()['failures'] == {'summarize': 1, 'present': 1, 'unstaged': 1}
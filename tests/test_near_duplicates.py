@@ -0,0 +1,59 @@
+import pytest
+
+from near_duplicates import NearDuplicateIndex, band_keys, diff_units, jaccard, shingles, signature
+
+SECTION = " ".join(f"Sentence {i} describes the risk factors that apply to the business." for i in range(20))
+
+
+def request(text):
+    return {'model': 'gpt-4.1', 'messages': [{'role': 'user', 'content': "Summarize:\n" + text}]}
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = NearDuplicateIndex(path=str(tmp_path / "index.sqlite3"), bypass=False)
+    kind = index.make_kind('summary', SECTION, request(SECTION))
+    index.add(kind, SECTION, "stored answer with growth -5%")
+    return index
+
+
+def test_identical_shingle_sets_share_signature_and_bands():
+    a = shingles("The quick brown fox jumps over the lazy dog today")
+    b = shingles("the QUICK brown fox   jumps over the lazy dog today")
+    assert a == b and jaccard(a, b) == 1.0
+    assert signature(a) == signature(b)
+    assert band_keys(signature(a)) == band_keys(signature(b))
+
+
+def test_signature_agreement_tracks_jaccard():
+    a = shingles(SECTION)
+    b = shingles(SECTION.replace("Sentence 3 ", "Paragraph 3 "))
+    agreement = sum(x == y for x, y in zip(signature(a), signature(b))) / len(signature(a))
+    assert abs(agreement - jaccard(a, b)) < 0.25
+
+
+def test_diff_units_ignores_case_and_spacing_only():
+    assert diff_units("Revenue grew.\nMargins held.", "revenue   GREW.\nMargins held.") == ([], [])
+    assert diff_units("Growth was -5%.", "Growth was 5%.") == (["Growth was -5%."], ["Growth was 5%."])
+
+
+def test_case_and_spacing_changes_reuse_the_stored_answer(index):
+    text = SECTION.upper()
+    _, content, params = index.prepare('summary', text, request(text))
+    assert content == "stored answer with growth -5%" and params is None
+
+
+def test_sign_change_is_sent_as_an_update_not_reused(index):
+    text = SECTION.replace("Sentence 4 describes", "Sentence 4 (-5%) describes")
+    edited = text.replace("(-5%)", "(5%)")
+    index.add(index.make_kind('summary', text, request(text)), text, "answer for -5%")
+    _, content, params = index.prepare('summary', edited, request(edited))
+    assert content is None
+    prompt = params['messages'][-1]['content']
+    assert "answer for -5%" in prompt and "(5%)" in prompt and SECTION not in prompt
+
+
+def test_different_prompt_never_matches(index):
+    other = {**request(SECTION), 'model': 'another-model'}
+    _, content, params = index.prepare('summary', SECTION, other)
+    assert content is None and params is other
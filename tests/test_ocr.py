@@ -0,0 +1,48 @@
+import pytest
+
+import ocr
+from metrics import metrics
+from page_cache import PageCache
+
+
+def test_ocr_runs_once_per_distinct_page(tmp_path, monkeypatch):
+    calls = []
+
+    def fake_ocr(job):
+        calls.append(job[1])
+        return f"text of page {job[1]}"
+
+    monkeypatch.setattr(ocr, "_ocr_page", fake_ocr)
+    cache = PageCache(path=str(tmp_path / "pages.sqlite3"))
+    results = ocr.ocr_pages("scan.pdf", [0, 1, 2, 3], ["a", "b", "a", "c"], workers=1, cache=cache)
+    assert results == {0: "text of page 0", 1: "text of page 1", 2: "text of page 0", 3: "text of page 3"}
+    assert calls == [0, 1, 3]
+
+    calls.clear()
+    assert ocr.ocr_pages("other.pdf", [5], ["x", "x", "x", "x", "x", "b"], workers=1, cache=cache) == {5: "text of page 1"}
+    assert calls == []
+
+
+def test_needs_ocr():
+    assert ocr.needs_ocr("")
+    assert ocr.needs_ocr("(cid:12)(cid:13)(cid:14)(cid:15)(cid:16)(cid:17)(cid:18)")
+    assert not ocr.needs_ocr("The company provides industrial services across North America.")
+
+
+def test_missing_ocr_binaries_leave_pages_as_extracted(monkeypatch):
+    monkeypatch.setattr(ocr, "missing_ocr_tools", lambda: ["tesseract"])
+    monkeypatch.setattr(ocr, "ocr_pages", lambda *args, **kwargs: pytest.fail("OCR should not run"))
+    failures = {}
+    with metrics.collect_failures(failures):
+        assert ocr.fill_scanned_pages("scan.pdf", ["", "Real text on this page about the company."], ["a", "b"]) == \
+            ["", "Real text on this page about the company."]
+    assert failures == {}
+
+
+def test_missing_binary_is_detected(monkeypatch):
+    ocr.missing_ocr_tools.cache_clear()
+    monkeypatch.setattr(ocr.importlib.util, "find_spec", lambda name: None)
+    try:
+        assert ocr.missing_ocr_tools() == ["pdf2image", "pytesseract"]
+    finally:
+        ocr.missing_ocr_tools.cache_clear()
@@ -0,0 +1,65 @@
+from PyPDF2 import PdfReader
+
+from ingestion import extract_pages, iter_pages
+from page_cache import PageCache, page_content_hash
+
+
+def write_pdf(path, pages):
+    """Minimal PDF; each page is (XObject dict body, stream bytes) drawn with 'q /X0 Do Q'"""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for header, data in pages:
+        objects.append(f"<< {header} /Length {len(data)} >>\nstream\n{data}\nendstream")
+        xobject = len(objects)
+        objects.append("<< /Length 11 >>\nstream\nq /X0 Do Q\nendstream")
+        content = len(objects)
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /XObject << /X0 {xobject} 0 R >> >> /Contents {content} 0 R >>")
+        kids.append(len(objects))
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{kid} 0 R' for kid in kids)}] /Count {len(kids)} >>"
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode()
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    path.write_bytes(bytes(out))
+    return str(path)
+
+
+def form(text):
+    return ("/Type /XObject /Subtype /Form /BBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >>",
+            f"BT /F1 12 Tf 72 700 Td ({text}) Tj ET")
+
+
+def image(data):
+    return "/Type /XObject /Subtype /Image /Width 2 /Height 1 /ColorSpace /DeviceGray /BitsPerComponent 8", data
+
+
+def test_pages_drawn_through_xobjects_hash_by_what_they_draw(tmp_path):
+    a = write_pdf(tmp_path / "a.pdf", [form("Beta Inc risk factors"), image("ab")])
+    b = write_pdf(tmp_path / "b.pdf", [form("Gamma LLC overview"), image("cd"), image("ab")])
+    hashes_a = [page_content_hash(page) for page in PdfReader(a).pages]
+    hashes_b = [page_content_hash(page) for page in PdfReader(b).pages]
+    assert len(set(hashes_a + hashes_b[:2])) == 4
+    assert hashes_b[2] == hashes_a[1]
+
+
+def test_page_cache_does_not_serve_another_documents_text(tmp_path):
+    cache = PageCache(path=str(tmp_path / "pages.sqlite3"))
+    a = write_pdf(tmp_path / "a.pdf", [form("Beta Inc risk factors one"), form("Beta Inc risk factors two")])
+    b = write_pdf(tmp_path / "b.pdf", [form("Gamma LLC overview"), form("Gamma LLC financials")])
+    assert extract_pages(a, workers=1, cache=cache)[0] == ["Beta Inc risk factors one", "Beta Inc risk factors two"]
+    assert extract_pages(b, workers=1, cache=cache)[0] == ["Gamma LLC overview", "Gamma LLC financials"]
+
+
+def test_iter_pages_yields_every_page_once_across_workers(tmp_path):
+    cache = PageCache(path=str(tmp_path / "pages.sqlite3"))
+    pdf = write_pdf(tmp_path / "a.pdf", [form(f"Page {i} body") for i in range(5)])
+    seen = sorted((index, text) for index, _, text in iter_pages(pdf, workers=2, pages_per_task=2, cache=cache))
+    assert seen == [(i, f"Page {i} body") for i in range(5)]
+    assert extract_pages(pdf, workers=1, cache=cache)[0] == [f"Page {i} body" for i in range(5)]
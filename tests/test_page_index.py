@@ -0,0 +1,29 @@
+from document import Document
+from page_index import PageIndex, index_for
+import page_index
+
+
+PAGES = ["Company overview: Acme is headquartered in Ohio.", "Revenue grew to $40M and EBITDA margin was 20%.",
+         "The addressable market is $5B and growing.", "Risk factors include customer concentration.",
+         "Management team and history.", "Revenue by segment: industrial and medical."]
+
+
+def test_index_over_a_page_view_matches_a_list_and_reuses_postings(monkeypatch):
+    monkeypatch.setattr(page_index, "_postings_cache", page_index.OrderedDict())
+    document = Document.from_pages("cim.pdf", PAGES)
+    first = index_for(document.pages)
+    assert first.search(["revenue", "ebitda"], 2) == PageIndex(PAGES).search(["revenue", "ebitda"], 2)
+    assert first.pages_text([2]) == "[Page 2]\n" + PAGES[1]
+
+    again = index_for(Document.from_pages("copy.pdf", PAGES).pages)
+    assert again.postings is first.postings
+    assert all(isinstance(value, tuple) and len(value) == 2 for value in page_index._postings_cache.values())
+
+
+def test_postings_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(page_index, "_postings_cache", page_index.OrderedDict())
+    monkeypatch.setattr(page_index, "INDEX_CACHE_SIZE", 2)
+    for i in range(4):
+        index_for([f"page {i} one", f"page {i} two"])
+    assert len(page_index._postings_cache) == 2
+    assert index_for([]) is None
@@ -0,0 +1,97 @@
+from parsing import chunk_text
+from tokens import count_tokens
+
+
+def test_short_text_is_one_chunk():
+    assert chunk_text("line one\nline two\n", max_tokens=100, overlap_tokens=10) == ["line one\nline two\n"]
+
+
+def test_chunks_cover_the_text_with_overlap_on_line_boundaries():
+    lines = [f"line {i:03d} of the document\n" for i in range(200)]
+    text = "".join(lines)
+    chunks = chunk_text(text, max_tokens=200, overlap_tokens=20)
+
+    assert len(chunks) > 1
+    assert all(count_tokens(chunk) <= 200 for chunk in chunks)
+    assert all(chunk.endswith("\n") for chunk in chunks)
+    assert chunks[0].startswith(lines[0]) and chunks[-1].endswith(lines[-1])
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk.splitlines()[0] in previous
+    covered = set()
+    for chunk in chunks:
+        covered.update(chunk.splitlines())
+    assert covered == {line.rstrip("\n") for line in lines}
+
+
+def test_text_without_newlines_still_advances():
+    chunks = chunk_text("x" * 1000, max_tokens=50, overlap_tokens=10)
+    assert "".join(chunk[:1] for chunk in chunks)
+    assert chunks[-1].endswith("x") and len(chunks) > 1
+
+
+def fake_response(content, finish_reason="stop"):
+    from types import SimpleNamespace
+    return SimpleNamespace(choices=[SimpleNamespace(finish_reason=finish_reason, message=SimpleNamespace(content=content))])
+
+
+def test_single_pass_cut_off_at_the_completion_limit_falls_back_to_chunks(monkeypatch):
+    import json
+    import parsing
+
+    def fake_chat(**params):
+        if 'max_tokens' in params:
+            return fake_response('{"Company Overview": "Acme makes wid', "length")
+        return fake_response(json.dumps({"Company Overview": "Acme makes widgets.", "Risks": "Customer concentration."}))
+
+    monkeypatch.setattr(parsing, "chat", fake_chat)
+    sections = parsing.split_sections("Acme makes widgets.\nCustomer concentration.\n", chunked=False)
+    assert sections["Company Overview"] == "Acme makes widgets."
+    assert sections["Risks"] == "Customer concentration."
+
+
+def test_documents_larger_than_the_completion_budget_are_chunked(monkeypatch):
+    import parsing
+    monkeypatch.setattr(parsing, "SECTIONING_MAX_COMPLETION_TOKENS", 400)
+    monkeypatch.setattr(parsing, "split_sections_chunked", lambda text: "chunked")
+    monkeypatch.setattr(parsing, "split_sections_with_llm", lambda text, on_section=None: "single")
+    assert parsing.split_sections("word " * 100) == "single"
+    assert parsing.split_sections("word " * 400) == "chunked"
+
+
+def test_sections_reported_from_a_cut_off_stream_are_kept(tmp_path, monkeypatch):
+    import json
+    import parsing
+    from document import Document
+
+    reply = '{"Company Overview": "Acme makes widgets in Ohio.", "Financials": "Revenue was 10M.", "Market Opportu'
+    monkeypatch.setattr(parsing, "stream_chat", lambda **params: iter([reply[:40], reply[40:]]))
+    monkeypatch.setattr(parsing, "chat", lambda **params: fake_response(json.dumps({
+        "Company Overview": "Chunked overview.", "Market Opportunity": "Widgets are a $5B market.", "Risks": "Ohio."
+    })))
+    path = tmp_path / "cim.txt"
+    path.write_text("Acme makes widgets in Ohio. Revenue was 10M. Widgets are a $5B market.\n", encoding="utf-8")
+
+    reported = {}
+    parsed = parsing.parse_sections(Document.open_text(str(path)), on_section=reported.__setitem__)
+    assert parsed['sections'] == reported == {
+        "Company Overview": "Acme makes widgets in Ohio.", "Financials": "Revenue was 10M.",
+        "Market Opportunity": "Widgets are a $5B market.", "Risks": "Ohio."
+    }
+
+
+def test_rate_limiting_counts_tokens_like_the_budgets():
+    from rate_limit import estimate_request_tokens
+    text = "Revenue grew 12% to $40M in FY2023.\n" * 50
+    params = {'messages': [{'role': 'user', 'content': text}], 'max_tokens': 100}
+    assert estimate_request_tokens(params) == count_tokens(text) + 4 + 100
+
+
+def test_single_pass_asks_only_for_the_completion_its_text_can_need(monkeypatch):
+    import json
+    import parsing
+    requested = []
+    monkeypatch.setattr(parsing, "chat", lambda **params: requested.append(params['max_tokens']) or fake_response(json.dumps({})))
+    parsing.split_sections_with_llm("word " * 400)
+    parsing.split_sections_with_llm("word " * 40000)
+    assert requested == [count_tokens("word " * 400) * 4 // 3 + parsing.SECTIONING_COMPLETION_OVERHEAD,
+                         parsing.SECTIONING_MAX_COMPLETION_TOKENS]
@@ -0,0 +1,87 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+import llm  # noqa: E402
+from checkpoints import CheckpointStore  # noqa: E402
+from llm_cache import cache  # noqa: E402
+from near_duplicates import near_duplicates  # noqa: E402
+from pipeline import PipelineRun  # noqa: E402
+from summarization import SUMMARY_FAILED  # noqa: E402
+
+
+@pytest.fixture
+def mock_llm(monkeypatch):
+    from mock_openai import start_server
+    server = start_server(latency_ms=0)
+    monkeypatch.setenv('OPENAI_BASE_URL', server.base_url)
+    monkeypatch.setattr(llm, 'LLM_MAX_RETRIES', 0)
+    monkeypatch.setattr(cache, 'bypass', True)
+    monkeypatch.setattr(near_duplicates, 'bypass', True)
+    llm.close()
+    yield server
+    llm.close()
+    server.shutdown()
+
+
+@pytest.fixture
+def store(tmp_path):
+    return CheckpointStore(path=str(tmp_path / "checkpoints.sqlite3"))
+
+
+def run_all(path, store, tmp_path):
+    run = PipelineRun(path, store)
+    run.result('ingest')
+    run.start_overlapped()
+    run.write_summary(str(tmp_path / "summary.md"))
+    run.result('present')
+    return run
+
+
+def test_failed_stages_are_not_checkpointed(mock_llm, store, tmp_path):
+    from synthetic_cim import make_cim
+    path = make_cim(str(tmp_path / "cim.txt"), 6)
+
+    mock_llm.error_rate = 1.0
+    failed = run_all(path, store, tmp_path)
+    assert SUMMARY_FAILED in failed.outputs['summarize'].values()
+    assert failed.failures['summarize'] and failed.failures['present']
+
+    mock_llm.error_rate = 0.0
+    retried = run_all(path, store, tmp_path)
+    assert retried.reused == {'ingest': True, 'parse': True, 'summarize': False, 'present': False}
+    assert SUMMARY_FAILED not in retried.outputs['summarize'].values()
+
+    assert run_all(path, store, tmp_path).reused == {'ingest': True, 'parse': True, 'summarize': True, 'present': True}
+
+
+def test_text_checkpoint_is_reopened_from_the_run_input(store, tmp_path):
+    first, copy = tmp_path / "a.txt", tmp_path / "b.txt"
+    first.write_text("Company Overview\nAcme makes widgets.\fPage two", encoding="utf-8")
+    PipelineRun(str(first), store).result('ingest')
+    shutil.copy(first, copy)
+
+    first.write_text("edited", encoding="utf-8")
+    run = PipelineRun(str(copy), store)
+    document = run.result('ingest')
+    assert run.reused['ingest'] and document.path == str(copy)
+    assert document.pages[1] == "Page two"
+
+    first.unlink()
+    assert PipelineRun(str(copy), store).result('ingest').text.startswith("Company Overview")
+
+
+def test_present_reads_pages_from_the_ingested_document(mock_llm, store, tmp_path):
+    from synthetic_cim import make_cim
+    lines = open(make_cim(str(tmp_path / "cim.txt"), 6), encoding="utf-8").read().splitlines(keepends=True)
+    path = tmp_path / "paged.txt"
+    path.write_text("\f".join("".join(lines[i::8]) for i in range(8)), encoding="utf-8")
+
+    run = run_all(str(path), store, tmp_path)
+    assert 'pages' not in run.outputs['parse']
+    assert run.outputs['present']['sources']
+    assert run_all(str(path), store, tmp_path).outputs['present'] == run.outputs['present']
@@ -0,0 +1,50 @@
+from section_detector import classify_heading, detect_sections
+
+
+def test_numbered_and_capitalised_headings_are_confident():
+    assert classify_heading("1. Company Overview") == ("Company Overview", 1.0)
+    section, confidence = classify_heading("RISK FACTORS")
+    assert section == "Risks" and confidence == 1.0
+
+
+def test_body_text_and_unknown_headings():
+    assert classify_heading("The company sells widgets to hospitals.") == (None, 0.0)
+    assert classify_heading("5. Transaction Structure", after_blank=True) == (None, 1.0)
+
+
+def test_weak_phrase_needs_a_layout_cue():
+    _, bare = classify_heading("Management")
+    _, cued = classify_heading("MANAGEMENT", top_of_page=True)
+    assert bare < 0.6 <= cued
+
+
+def test_detect_sections_splits_on_headings_and_keeps_ambiguous_text():
+    pages = [
+        "Confidential\n\n1. Company Overview\nAcme makes widgets.\n",
+        "2. Financial Performance\nRevenue was $10M.\n\n3. Transaction Structure\nAn unrelated section.\n",
+        "RISK FACTORS\nCustomer concentration.\n",
+    ]
+    sections, ambiguous = detect_sections(pages=pages)
+    assert sections["Company Overview"] == "Acme makes widgets."
+    assert sections["Financials"] == "Revenue was $10M."
+    assert sections["Risks"] == "Customer concentration."
+    assert sections["Market Opportunity"] == ""
+    assert "Confidential" in ambiguous and "An unrelated section." in ambiguous
+
+
+def test_cached_page_segments_match_a_fresh_scan(tmp_path, monkeypatch):
+    import section_detector
+    from page_cache import PageCache
+
+    cache = PageCache(path=str(tmp_path / "pages.sqlite3"))
+    pages = ["Cover page\nProject Falcon", "1. Company Overview\nAcme makes widgets.",
+             "continued overview\n\n2. Financials\nRevenue grew.", "3. Transaction Structure\nTerms", "RISK FACTORS\nCustomer concentration."]
+    expected = detect_sections(pages=pages)
+    assert detect_sections(pages=pages, cache=cache) == expected
+
+    scanned = []
+    original = section_detector.page_segments
+    monkeypatch.setattr(section_detector, "page_segments", lambda page, *args: scanned.append(page) or original(page, *args))
+    revised = pages[:2] + ["continued overview\n\n2. Financials\nRevenue fell."] + pages[3:]
+    assert detect_sections(pages=revised, cache=cache) == detect_sections(pages=revised)
+    assert scanned[0] == revised[2] and len(scanned) == 1 + len(revised)
@@ -0,0 +1,129 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+import server
+from server import ARTIFACTS, JobServer, content_disposition
+
+
+def test_ascii_names_are_kept():
+    assert content_disposition("deal-deck.pptx") == "attachment; filename=\"deal-deck.pptx\"; filename*=UTF-8''deal-deck.pptx"
+
+
+def test_non_latin_and_quote_characters_are_encoded():
+    header = content_disposition('日本 "A".md')
+    header.encode('latin-1')
+    assert header == "attachment; filename=\"__ _A_.md\"; filename*=UTF-8''%E6%97%A5%E6%9C%AC%20%22A%22.md"
+
+
+async def request(port, method, path, body=b"", headers=None):
+    """Send one request and return (status, headers, body); the server closes each connection"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    headers = {'Content-Length': str(len(body)), **(headers or {})}
+    head = f"{method} {path} HTTP/1.1\r\nHost: test\r\n" + "".join(f"{k}: {v}\r\n" for k, v in headers.items())
+    writer.write(head.encode('latin-1') + b"\r\n" + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    status_line, *lines = head.decode('latin-1').split("\r\n")
+    return int(status_line.split(" ")[1]), dict(line.split(": ", 1) for line in lines), payload
+
+
+@pytest.fixture
+def release(monkeypatch):
+    """Jobs write their artifacts and finish once the returned event is set"""
+    event = threading.Event()
+
+    def run_job(job):
+        job.status = 'running'
+        job.started = time.time()
+        event.wait(10)
+        for name in ARTIFACTS:
+            with open(job.artifact_path(name), 'w', encoding='utf-8') as f:
+                f.write(f"{name} of {job.filename}")
+        job.status = 'done'
+        job.finished = time.time()
+
+    monkeypatch.setattr(server, 'warm_up', lambda: None)
+    monkeypatch.setattr(JobServer, '_run_job', staticmethod(run_job))
+    yield event
+    event.set()
+
+
+def run_server(tmp_path, scenario, **options):
+    async def main():
+        job_server = JobServer(job_dir=str(tmp_path / "jobs"), **options)
+        await job_server.start("127.0.0.1", 0)
+        try:
+            return await scenario(job_server, job_server.server.sockets[0].getsockname()[1])
+        finally:
+            await job_server.close()
+    return asyncio.run(main())
+
+
+async def wait_for_status(port, job_id, status):
+    for _ in range(200):
+        code, _, body = await request(port, "GET", f"/jobs/{job_id}")
+        job = json.loads(body)
+        if job['status'] == status:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job {job_id} never reached {status}")
+
+
+def test_upload_poll_and_download(tmp_path, release):
+    async def scenario(job_server, port):
+        status, headers, body = await request(port, "POST", "/jobs?filename=deal.txt", b"Revenue grew.")
+        assert status == 202
+        job = json.loads(body)
+        assert headers['Location'] == f"/jobs/{job['id']}"
+        with open(tmp_path / "jobs" / job['id'] / "deal.txt", 'rb') as f:
+            assert f.read() == b"Revenue grew."
+
+        status, _, body = await request(port, "GET", f"/jobs/{job['id']}/summary")
+        assert status == 409
+        release.set()
+        job = await wait_for_status(port, job['id'], 'done')
+        assert job['artifacts']['deck'] == f"/jobs/{job['id']}/deck"
+
+        status, headers, body = await request(port, "GET", job['artifacts']['summary'])
+        assert status == 200
+        assert body == b"summary of deal.txt"
+        assert headers['Content-Disposition'] == content_disposition("deal-summary.md")
+
+        status, _, body = await request(port, "GET", "/health")
+        assert status == 200
+        assert json.loads(body) == {'workers': 1, 'queued': 0, 'queue_size': 2, 'running': 0}
+
+    run_server(tmp_path, scenario, workers=1, queue_size=2)
+
+
+def test_full_queue_is_refused_with_retry_after(tmp_path, release):
+    async def scenario(job_server, port):
+        status, _, body = await request(port, "POST", "/jobs?filename=a.txt", b"a")
+        await wait_for_status(port, json.loads(body)['id'], 'running')
+        status, _, body = await request(port, "POST", "/jobs?filename=b.txt", b"b")
+        assert status == 202
+        assert json.loads(body)['queue_position'] == 1
+
+        status, headers, body = await request(port, "POST", "/jobs?filename=c.txt", b"c")
+        assert status == 503
+        assert int(headers['Retry-After']) == json.loads(body)['retry_after'] > 0
+        assert len(job_server.jobs) == 2
+
+    run_server(tmp_path, scenario, workers=1, queue_size=1)
+
+
+@pytest.mark.parametrize("length", ["abc", "-5", "+5", "1.5"])
+def test_invalid_content_length_is_rejected(tmp_path, release, length):
+    async def scenario(job_server, port):
+        status, _, body = await request(port, "POST", "/jobs?filename=a.txt", b"a", {'Content-Length': length})
+        assert status == 400
+        assert "Content-Length" in json.loads(body)['error']
+        assert job_server.jobs == {}
+
+    run_server(tmp_path, scenario)
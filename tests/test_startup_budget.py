@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+import startup_budget  # noqa: E402
+
+
+@pytest.mark.parametrize('command', startup_budget.COMMANDS, ids=lambda command: ' '.join(command) or 'main')
+def test_cli_help_does_not_import_pipeline_dependencies(command):
+    args = ['main.py'] + command + ['--help']
+    loaded = sorted(m for m in startup_budget.all_imported(args)
+                    if m.split('.')[0] in startup_budget.FORBIDDEN_MODULES)
+    assert loaded == []
+
+
+def test_cli_imports_stay_within_budget():
+    # Timing is noisy on shared machines; allow twice the budget before failing the suite
+    failures = [failure for failure in startup_budget.check(startup_budget.DEFAULT_BUDGET_MS * 2)
+                if 'exceeds' in failure]
+    assert failures == []
@@ -0,0 +1,210 @@
+import importlib.util
+import math
+import re
+import threading
+from collections import Counter
+from typing import List, Tuple
+
+import config
+
+# tiktoken is optional: with it token counts are exact for the gpt-4.1
+# encoding, without it they are estimated at CHARS_PER_TOKEN.
+TIKTOKEN_AVAILABLE = importlib.util.find_spec("tiktoken") is not None
+TOKEN_ENCODING = "o200k_base"
+CHARS_PER_TOKEN = 4
+
+# call site -> (default token budget, terms that make a paragraph relevant to it).
+# Override a budget with TOKEN_BUDGET_<SITE>, e.g. TOKEN_BUDGET_HIGHLIGHTS=4000.
+BUDGETS = {
+    'document_analysis': (12000, ['company', 'headquartered', 'founded', 'provider', 'customers', 'market',
+                                  'addressable', 'competitors', 'revenue', 'ebitda', 'margin', 'growth',
+                                  'leading', 'recurring', 'highlights']),
+    'financial_metrics': (6000, ['revenue', 'sales', 'ebitda', 'margin', 'growth', 'million', 'billion',
+                                 'fy', 'addressable', 'market', 'tam']),
+    'company_info': (3000, ['company', 'headquartered', 'headquarters', 'founded', 'located', 'industry',
+                            'sector', 'provider', 'leading', 'operates']),
+    'market_info': (4000, ['market', 'addressable', 'tam', 'growth', 'growing', 'competitors', 'competitive',
+                           'share', 'fragmented', 'industry']),
+    'highlights': (8000, ['leading', 'leader', 'growth', 'margin', 'recurring', 'customers', 'market',
+                          'revenue', 'ebitda', 'competitive', 'platform', 'retention']),
+    'section_summary': (8000, []),
+}
+
+BOILERPLATE_RE = re.compile(
+    r"^\s*(?:page\s+\d+(?:\s+of\s+\d+)?|\d+\s*(?:of|/)\s*\d+|"
+    r".*\b(?:strictly\s+)?(?:private\s+and\s+)?confidential\b.{0,60}|"
+    r".*\bnot\s+for\s+(?:distribution|circulation)\b.*)\s*$",
+    re.IGNORECASE
+)
+WORD_RE = re.compile(r"[a-z][a-z0-9]+")
+NUMBER_RE = re.compile(r"\d")
+REPEATED_LINE_MIN = 3
+MAX_REPEATED_LINE_CHARS = 120
+MIN_DEDUPE_LINE_CHARS = 30
+MAX_PARAGRAPH_CHARS = 1600
+
+_encoder = None
+_encoder_lock = threading.Lock()
+stats = {'calls': 0, 'trimmed': 0, 'tokens_in': 0, 'tokens_out': 0}
+
+
+def _get_encoder():
+    global _encoder
+    if _encoder is None:
+        with _encoder_lock:
+            if _encoder is None:
+                import tiktoken
+                _encoder = tiktoken.get_encoding(TOKEN_ENCODING)
+    return _encoder
+
+
+def count_tokens(text: str) -> int:
+    """Number of tokens ``text`` costs (estimated when tiktoken is not installed)"""
+    if not text:
+        return 0
+    if TIKTOKEN_AVAILABLE:
+        return len(_get_encoder().encode(text, disallowed_special=()))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def truncate_tokens(text: str, budget: int) -> str:
+    if budget <= 0:
+        return ""
+    if TIKTOKEN_AVAILABLE:
+        encoder = _get_encoder()
+        tokens = encoder.encode(text, disallowed_special=())
+        return text if len(tokens) <= budget else encoder.decode(tokens[:budget])
+    return text[:budget * CHARS_PER_TOKEN]
+
+
+def budget_for(site: str) -> int:
+    return config.get_int(f"TOKEN_BUDGET_{site.upper()}", BUDGETS[site][0])
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def strip_boilerplate(text: str) -> str:
+    """
+    Drop page furniture: page numbers, confidentiality notices and short
+    non-sentence lines repeated across the document (running headers and
+    footers).
+    """
+    lines = text.split("\n")
+    counts = Counter(_normalize(line) for line in lines
+                     if line.strip() and len(line) <= MAX_REPEATED_LINE_CHARS)
+    kept = []
+    for line in lines:
+        key = _normalize(line)
+        if key and len(line) <= MAX_REPEATED_LINE_CHARS:
+            if BOILERPLATE_RE.match(line):
+                continue
+            if counts[key] >= REPEATED_LINE_MIN and not key.endswith(('.', '!', '?', ':')):
+                continue
+        kept.append(line)
+    return "\n".join(kept)
+
+
+def split_paragraphs(text: str) -> List[str]:
+    """
+    Split on blank lines. Blocks longer than MAX_PARAGRAPH_CHARS (e.g. whole
+    pages extracted without blank lines) are cut into runs of whole lines.
+    """
+    paragraphs = []
+    for block in re.split(r"\n\s*\n", text):
+        block = block.strip()
+        if len(block) <= MAX_PARAGRAPH_CHARS:
+            if block:
+                paragraphs.append(block)
+            continue
+        run = []
+        size = 0
+        for line in block.split("\n"):
+            if run and size + len(line) > MAX_PARAGRAPH_CHARS:
+                paragraphs.append("\n".join(run))
+                run, size = [], 0
+            run.append(line)
+            size += len(line) + 1
+        if run:
+            paragraphs.append("\n".join(run))
+    return paragraphs
+
+
+def dedupe(paragraphs: List[str]) -> List[str]:
+    """Drop lines (of MIN_DEDUPE_LINE_CHARS or more) already seen earlier, and paragraphs left empty"""
+    seen = set()
+    unique = []
+    for paragraph in paragraphs:
+        lines = []
+        for line in paragraph.split("\n"):
+            key = _normalize(line)
+            if len(key) >= MIN_DEDUPE_LINE_CHARS:
+                if key in seen:
+                    continue
+                seen.add(key)
+            lines.append(line)
+        if any(line.strip() for line in lines):
+            unique.append("\n".join(lines))
+    return unique
+
+
+def rank(paragraphs: List[str], terms: List[str]) -> List[Tuple[float, int]]:
+    """
+    Score paragraphs by query-term hits (saturating per term, weighted by
+    how rare the term is across paragraphs) and figure density; earlier
+    paragraphs win ties. Returns ``(score, index)`` best first.
+    """
+    terms = set(terms)
+    words = [Counter(w for w in WORD_RE.findall(p.lower()) if w in terms) for p in paragraphs]
+    document_frequency = Counter(term for counter in words for term in counter)
+    total = len(paragraphs)
+    scored = []
+    for index, (paragraph, counter) in enumerate(zip(paragraphs, words)):
+        score = sum(math.log(1 + total / document_frequency[term]) * (1 + math.log(count))
+                    for term, count in counter.items())
+        score += min(1.0, len(NUMBER_RE.findall(paragraph)) / 20)
+        score -= index / (total * 10)
+        scored.append((score, index))
+    scored.sort(key=lambda item: (-item[0], item[1]))
+    return scored
+
+
+def fit_to_budget(text: str, budget: int, terms: List[str] = None) -> str:
+    """
+    Return ``text`` unchanged when it fits in ``budget`` tokens, otherwise
+    the most relevant paragraphs that fit: boilerplate is stripped,
+    duplicates removed, paragraphs ranked against ``terms`` and the best
+    kept in their original order.
+    """
+    stats['calls'] += 1
+    size = count_tokens(text)
+    stats['tokens_in'] += size
+    if size <= budget:
+        stats['tokens_out'] += size
+        return text
+
+    paragraphs = dedupe(split_paragraphs(strip_boilerplate(text)))
+    chosen = []
+    used = 0
+    for _, index in rank(paragraphs, terms or []):
+        cost = count_tokens(paragraphs[index]) + 1
+        if used + cost > budget:
+            if not chosen:
+                # A single paragraph larger than the whole budget: keep its start
+                chosen.append((index, truncate_tokens(paragraphs[index], budget)))
+                used = budget
+                break
+            continue
+        chosen.append((index, paragraphs[index]))
+        used += cost
+    result = "\n\n".join(paragraph for _, paragraph in sorted(chosen))
+
+    stats['trimmed'] += 1
+    stats['tokens_out'] += count_tokens(result)
+    return result
+
+
+def fit_prompt_text(site: str, text: str) -> str:
+    """fit_to_budget() with the budget and relevance terms configured for ``site``"""
+    return fit_to_budget(text, budget_for(site), BUDGETS[site][1])